@@ -30,7 +30,11 @@ Available Operations:
    • borrow_usdc: Borrow USDC against your CELO collateral
    • repay_usdc: Repay your borrowed USDC debt
 
-3. Session Management:
+3. Position and Market Data (no session needed):
+   • get_aave_position: View your supplied/borrowed assets, health factor and borrowing power
+   • get_aave_reserves: View reserve prices, LTVs and supply/borrow APYs
+
+4. Session Management:
    • create_aave_session: Create a secure session for Aave operations
    • add_aave_private_key: Add your private key to your session
    • clear_aave_session: Manually clear your session
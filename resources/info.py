@@ -20,9 +20,24 @@ This MCP server provides comprehensive tools for interacting with the Celo block
 * **get_celo_transactions**: View recent transactions for any address
   Example: "Show me the last 5 transactions for 0x456... on Alfajores"
 
+* **get_token_transfers**: Find ERC-20 transfers to or from an address from event logs, including transfers made through contracts
+  Example: "Show cUSD transfers received by 0x456... over the last 500,000 blocks"
+
+* **get_balance_history**: Balance time series for several addresses and tokens at past dates or blocks
+  Example: "Show daily cUSD balances of 0xabc... and 0xdef... for 2025"
+
 * **get_celo_token_list**: List all tokens held by any address
   Example: "What tokens does 0x789... hold on mainnet?"
 
+* **watch_celo_address**: Watch an address for new transactions and token transfers as blocks arrive
+  Example: "Watch 0x123... for incoming payments"
+
+* **get_recent_activity**: Read the activity recorded for a watched address (no block scanning)
+  Example: "What has 0x123... received since I started watching it?"
+
+* **unwatch_celo_address**: Stop watching an address
+  Example: "Stop watching 0x123..."
+
 ## 💸 Transaction Tools
 
 * **create_transaction_session**: Create a secure session for transactions
@@ -69,6 +84,12 @@ This MCP server provides comprehensive tools for interacting with the Celo block
 * **clear_aave_session**: Manually clear your Aave session
   Example: "Clear my Aave session"
 
+* **get_aave_position**: View supplied and borrowed assets, health factor and borrowing power
+  Example: "What's my Aave health factor for 0x123...?"
+
+* **get_aave_reserves**: View Aave reserve prices, LTVs and supply/borrow APYs
+  Example: "What are the current Aave borrow rates on Celo?"
+
 ## 📊 Dune Analytics Tools
 
 * **get_dune_data**: Fetch data from Dune Analytics queries
@@ -83,6 +104,14 @@ This MCP server provides comprehensive tools for interacting with the Celo block
 * **clear_dune_cache**: Clear cached Dune Analytics data
   Example: "Clear the Dune data cache"
 
+## 🩺 Diagnostics Tools
+
+* **get_rpc_stats**: Show RPC endpoint health (latency, errors, failover state) and response cache hit rates
+  Example: "How are the RPC endpoints performing?"
+
+* **get_server_metrics**: Show p50/p95/p99 latency, RPC calls, cache hits and errors per tool and RPC method
+  Example: "Which tools are slowest right now?"
+
 ## 📄 Information Resources
 
 * **info://server**: This general information (what you're reading now)
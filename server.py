@@ -4,6 +4,14 @@ from mcp.server.fastmcp import FastMCP
 # Create an MCP server with a name
 mcp = FastMCP("Celo Explorer")
 
+# Record latency, RPC usage and errors for every tool registered below
+from utils.metrics import instrument_tools
+instrument_tools(mcp)
+
+# Run tool handlers on a worker pool so blocking RPC calls don't stall other clients
+from utils.workers import run_tools_in_workers, set_max_workers, DEFAULT_MAX_WORKERS
+run_tools_in_workers(mcp)
+
 # Import and register tools and resources
 from resources.greeting import register_greeting_resources
 from resources.info import register_info_resources
@@ -16,6 +24,9 @@ from tools.aave_session import register_aave_session_tools
 from tools.aave_supply import register_aave_supply_tools
 from tools.aave_collateral import register_aave_collateral_tools
 from tools.aave_borrow import register_aave_borrow_tools
+from tools.aave_reader import register_aave_reader_tools
+from tools.celo_watcher import register_celo_watcher_tools
+from tools.diagnostics import register_diagnostics_tools
 
 # Register all tools and resources
 register_greeting_resources(mcp)
@@ -29,6 +40,23 @@ register_aave_session_tools(mcp)
 register_aave_supply_tools(mcp)
 register_aave_collateral_tools(mcp)
 register_aave_borrow_tools(mcp)
+register_aave_reader_tools(mcp)
+register_celo_watcher_tools(mcp)
+register_diagnostics_tools(mcp)
 
 if __name__ == "__main__":
-    mcp.run(transport='stdio')
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Celo Explorer MCP server")
+    parser.add_argument("--transport", default="stdio", choices=["stdio", "sse", "streamable-http"],
+                        help="stdio for a single desktop client; sse or streamable-http to serve many clients")
+    parser.add_argument("--host", default=mcp.settings.host, help="Bind address for the HTTP transports")
+    parser.add_argument("--port", type=int, default=mcp.settings.port, help="Port for the HTTP transports")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Tool calls run at once; further calls queue (default: CELO_MCP_MAX_WORKERS or 8)")
+    args = parser.parse_args()
+
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    set_max_workers(args.max_concurrency)
+    mcp.run(transport=args.transport)
\ No newline at end of file
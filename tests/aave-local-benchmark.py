@@ -0,0 +1,103 @@
+# Local write benchmark: Aave supply/collateral/borrow/repay/withdraw latency and batch throughput
+# against an in-process eth-tester chain with mock contracts (utils/local_chain.py) - no funds needed.
+#
+#   python tests/aave-local-benchmark.py --iterations 10 --accounts 4 --latency 0.02
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Benchmark the Aave write tools on a local mock chain')
+parser.add_argument('--iterations', type=int, default=10, help='Sequential flows to time per step')
+parser.add_argument('--accounts', type=int, default=4, help='Accounts running flows concurrently in the batch phase')
+parser.add_argument('--batch-rounds', type=int, default=3, help='Flows per account in the batch phase')
+parser.add_argument('--latency', type=float, default=0.0, help='Seconds of injected latency per RPC response')
+args = parser.parse_args()
+
+from utils.local_chain import LocalChain
+from utils.profiles import PROFILE_ENV, PROFILE_FILE_ENV, save_profile
+
+# The chain and profile have to exist before the Aave tools resolve their profile
+chain = LocalChain(port=0, accounts=max(1, args.accounts), latency=args.latency).start()
+os.environ[PROFILE_ENV] = 'local'
+os.environ[PROFILE_FILE_ENV] = save_profile(chain.profile(), tempfile.mktemp(suffix='.json'))
+os.environ['CELO_MCP_CACHE_DIR'] = tempfile.mkdtemp(prefix='celo-bench-')
+
+import server
+from utils.metrics import metrics
+
+TOOLS = server.mcp._tool_manager._tools
+
+# Each write tool clears its session afterwards, so every step gets a fresh one
+FLOW = [
+    ('supply_celo', {'amount': 1}, 2),
+    ('set_celo_collateral', {'use_as_collateral': True}, 1),
+    ('borrow_usdc', {'amount': 1}, 1),
+    ('repay_usdc', {'amount': 0}, 2),
+    ('withdraw_celo', {'amount': 0}, 1),
+]
+TXS_PER_FLOW = sum(txs for _, _, txs in FLOW)
+
+async def step(account, tool, kwargs):
+    session = json.loads(await TOOLS['create_aave_session'].fn(address=chain.addresses[account]))
+    await TOOLS['add_aave_private_key'].fn(session_id=session['session_id'], private_key=chain.keys[account])
+    result = json.loads(await TOOLS[tool].fn(session_id=session['session_id'], **kwargs))
+    if not result.get('success'):
+        raise RuntimeError(f"{tool} failed: {result.get('error')}")
+
+async def flow(account, samples=None):
+    for tool, kwargs, _ in FLOW:
+        started = time.perf_counter()
+        await step(account, tool, kwargs)
+        if samples is not None:
+            samples.setdefault(tool, []).append(time.perf_counter() - started)
+
+def percentile(ordered, p):
+    return ordered[math.ceil(len(ordered) * p) - 1] * 1000
+
+# Sequential: per-step latency
+samples = {}
+for _ in range(args.iterations):
+    asyncio.run(flow(0, samples))
+
+print(f"\nLocal chain {chain.url}, {args.latency * 1000:.0f}ms injected latency\n")
+print(f"{'step':<22}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+for tool, values in samples.items():
+    ordered = sorted(values)
+    print(f"{tool:<22}{len(ordered):>7}{percentile(ordered, 0.5):>10.1f}{percentile(ordered, 0.95):>10.1f}"
+          f"{ordered[-1] * 1000:>10.1f}")
+
+# Batch: every account runs flows concurrently, one thread (and event loop) per account
+errors = []
+
+def worker(account):
+    try:
+        for _ in range(args.batch_rounds):
+            asyncio.run(flow(account))
+    except Exception as e:
+        errors.append(e)
+
+started = time.perf_counter()
+threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.accounts)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - started
+
+flows = args.accounts * args.batch_rounds
+print(f"\nBatch: {flows} flows ({flows * TXS_PER_FLOW} transactions) over {args.accounts} accounts in {elapsed:.2f}s "
+      f"= {flows * TXS_PER_FLOW / elapsed:.1f} tx/s, {len(errors)} errors")
+for e in errors[:5]:
+    print(f"  {e}")
+
+rpc = metrics.snapshot()["rpc_methods"]
+print("\nRPC calls: " + ", ".join(f"{method} {row['calls']}" for method, row in sorted(rpc.items())))
+chain.stop()
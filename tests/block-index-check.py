@@ -0,0 +1,105 @@
+# Time range checks for the timestamp tools (tools/celo_reader.py) and their block index (utils/block_index.py),
+# against an in-memory chain whose recent blocks can be reorged:
+#   1. _parse_since accepts relative ages ('24h', '7D') and absolute times, including ISO 8601 with a 'Z' suffix
+#   2. block_at re-verifies non-final blocks: a reorg drops the stale records and lookups answer from the new chain;
+#      add() replaces a record whose hash changed
+#   3. the index file stays under its cap, is compacted, and reloads to the same records
+#
+#   python tests/block-index-check.py
+import os
+import sys
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Check time parsing and the block timestamp index')
+parser.add_argument('--blocks', type=int, default=5000, help='Blocks on the in-memory chain')
+args = parser.parse_args()
+
+from tools.celo_reader import _parse_since
+from utils.block_index import BlockTimestampIndex, _RECORD
+
+class Chain:
+    """Headers for blocks 0..head, 5 seconds apart; reorg() replaces the blocks from a number up."""
+
+    def __init__(self, head):
+        self.fork = 0
+        self.blocks = {}
+        self.reorg(0, head)
+        self.eth = self
+
+    def reorg(self, start, head, shift=0):
+        self.fork += 1
+        for number in range(start, head + 1):
+            self.blocks[number] = {'number': number, 'timestamp': 1_700_000_000 + 5 * number + shift,
+                                   'hash': bytes([self.fork]) + number.to_bytes(31, 'big')}
+        for number in [n for n in self.blocks if n > head]:
+            del self.blocks[number]
+
+    def get_block(self, number):
+        return self.blocks[number]
+
+    @property
+    def block_number(self):
+        return max(self.blocks)
+
+    def time_of(self, number):
+        return self.blocks[number]['timestamp']
+
+# 1. Absolute and relative times
+JAN_1 = 1735689600
+for value in ('2025-01-01T00:00:00Z', '2025-01-01T00:00:00+00:00', '2025-01-01',
+              ' 2025-01-01T01:00:00+01:00 ', str(JAN_1)):
+    assert _parse_since(value) == JAN_1, f"{value!r}: {_parse_since(value)} != {JAN_1}"
+    print(f"{value!r:<32} {_parse_since(value)}")
+now = int(datetime.now(timezone.utc).timestamp())
+for value, age in (('24h', 86400), ('7D', 7 * 86400), ('1.5h', 5400)):
+    assert abs(now - age - _parse_since(value)) <= 2, value
+    print(f"{value!r:<32} now - {age}")
+for value in ('yesterday', '24x', ''):
+    try:
+        _parse_since(value)
+    except ValueError:
+        continue
+    raise AssertionError(f"{value!r} was accepted")
+
+# 2. Reorgs
+path = os.path.join(tempfile.mkdtemp(prefix='celo-block-index-'), 'index.bin')
+chain = Chain(args.blocks)
+index = BlockTimestampIndex(path, finality_depth=64)
+head = chain.block_number
+for number in (100, head - 500, head - 30, head - 3):
+    assert index.block_at(chain, chain.time_of(number)) == number
+# The last 40 blocks are replaced by a fork whose blocks are 2 seconds later
+chain.reorg(head - 40, head, shift=2)
+target = chain.time_of(head - 30)
+assert index.block_at(chain, target) == head - 30, index.block_at(chain, target)
+assert index.reorgs >= 1
+for number in range(head - 40, head + 1):
+    assert index.block_hash(number) in (None, chain.get_block(number)['hash']), f"stale record for block {number}"
+print(f"reorg:           blocks {head - 40}-{head} re-verified, {len(index)} records kept")
+before = index.block_hash(head - 500)
+index.add(head - 500, chain.time_of(head - 500) + 1, b'\x09' * 32)
+assert index.block_hash(head - 500) == b'\x09' * 32 != before
+assert BlockTimestampIndex(path).block_hash(head - 500) == b'\x09' * 32
+print(f"add:             block {head - 500} hash replaced, and after a reload")
+
+# 3. Cap and compaction
+cap = 1000
+capped = BlockTimestampIndex(path, max_bytes=cap * _RECORD.size)
+for number in range(0, head + 1, 2):
+    capped.add(number, chain.time_of(number), chain.get_block(number)['hash'])
+assert len(capped) <= cap and capped.block_hash(head) == chain.get_block(head)['hash']
+for _ in range(3):
+    for number in range(head - 200, head + 1):
+        capped.add(number, chain.time_of(number), os.urandom(32))
+size = os.path.getsize(path)
+assert size <= 8 + (3 * cap + 1024) * _RECORD.size, size
+reloaded = BlockTimestampIndex(path, max_bytes=cap * _RECORD.size)
+assert len(reloaded) == len(capped) and reloaded.block_hash(head) == capped.block_hash(head)
+assert [reloaded.timestamp(chain, n) for n in range(head - 200, head + 1)] == [chain.time_of(n) for n in range(head - 200, head + 1)]
+print(f"cap:             {len(capped)} records (cap {cap}), file {size} bytes, reload matches")
+
+print('ok')
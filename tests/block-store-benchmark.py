@@ -0,0 +1,70 @@
+# Block store benchmark: the same get_celo_transactions scan against a local chain with injected latency
+# (utils/local_chain.py), run cold, again with the in-memory response cache cleared, and again in a fresh
+# process (a server restart). The repeat scans should be served from the on-disk store (utils/block_store.py).
+#
+#   python tests/block-store-benchmark.py --blocks 1000 --latency 0.02
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Measure repeat block scans served from the on-disk block store')
+parser.add_argument('--blocks', type=int, default=1000, help='Blocks to mine (one transaction each) and scan')
+parser.add_argument('--latency', type=float, default=0.02, help='Seconds of injected latency per RPC response')
+parser.add_argument('--finality-depth', type=int, default=10, help='CELO_MCP_FINALITY_DEPTH for the run')
+parser.add_argument('--scan-only', action='store_true', help=argparse.SUPPRESS)
+parser.add_argument('--address', help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+os.environ['CELO_MCP_FINALITY_DEPTH'] = str(args.finality_depth)
+os.environ.setdefault('CELO_MCP_CACHE_DIR', tempfile.mkdtemp(prefix='celo-blocks-'))
+
+def scan(label):
+    import server
+    from utils.block_store import all_block_store_stats
+    from utils.metrics import metrics
+
+    def rpc_calls():
+        return sum(row['calls'] - row.get('cache_hits', 0) for row in metrics.snapshot()['rpc_methods'].values())
+
+    tool = server.mcp._tool_manager._tools['get_celo_transactions']
+    before, started = rpc_calls(), time.perf_counter()
+    # An address with no transactions, so every block is scanned
+    result = json.loads(asyncio.run(tool.fn(address=args.address, blocks_to_scan=args.blocks, max_count=50)))
+    print(f"{label:<16} {time.perf_counter() - started:7.2f}s {rpc_calls() - before:6d} RPCs "
+          f"({result['blocks_scanned']} blocks)")
+    return all_block_store_stats()
+
+if args.scan_only:
+    scan('after restart')
+    sys.exit(0)
+
+from utils.local_chain import LocalChain
+from utils.rpc_replay import PROXY_ENV
+
+chain = LocalChain(port=0, accounts=2, latency=args.latency).start()
+w3 = chain.w3
+for i in range(args.blocks):
+    w3.eth.send_transaction({'from': w3.eth.accounts[0], 'to': chain.addresses[i % 2], 'value': i + 1})
+os.environ[PROXY_ENV] = chain.url
+args.address = w3.eth.account.create().address
+
+print(f"Scanning {args.blocks} blocks, {args.latency * 1000:.0f}ms per RPC, cache dir {os.environ['CELO_MCP_CACHE_DIR']}")
+scan('cold')
+from utils.rpc import _caches
+for cache in _caches.values():
+    cache.clear()
+stats = scan('warm, no memory')[0]
+
+subprocess.run([sys.executable, os.path.abspath(__file__), '--scan-only', '--address', args.address,
+                '--blocks', str(args.blocks), '--finality-depth', str(args.finality_depth)], check=True)
+
+print(f"\nstore: {stats['blocks']} blocks, {stats['records']} records in {stats['disk_bytes'] / 1024:.0f} KiB, "
+      f"{stats['codec']} x{stats['compression_ratio']} (dictionary: {stats['dictionary']})")
+chain.stop()
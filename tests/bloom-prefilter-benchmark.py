@@ -0,0 +1,84 @@
+# Bloom prefilter benchmark: get_celo_transactions for a quiet address on a local chain (utils/local_chain.py)
+# whose blocks are full of other accounts' transfers. Compares bytes on the wire, time and transactions found for
+#   1. bloom_prefilter=True on a fresh cache (headers + logsBloom only)
+#   2. the full scan (ground truth; records sender/recipient blooms of every block it downloads)
+#   3. bloom_prefilter=True again, now answered exactly from those blooms for already-seen blocks
+# The target makes token transfers (which log its address) and one plain native transfer, which logsBloom can't see.
+#
+#   python tests/bloom-prefilter-benchmark.py --blocks 500 --every 50 --noise 8
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Measure the logsBloom prefilter of get_celo_transactions')
+parser.add_argument('--blocks', type=int, default=500, help='Blocks to mine and scan (at most 1000)')
+parser.add_argument('--every', type=int, default=50, help='The target transacts in every Nth block')
+parser.add_argument('--noise', type=int, default=8, help='Transfers between other accounts per block (at most 9)')
+parser.add_argument('--latency', type=float, default=0.005, help='Seconds of injected latency per RPC response')
+args = parser.parse_args()
+
+# Count what crosses the wire: no on-disk block store
+os.environ['CELO_MCP_BLOCK_STORE_MB'] = '0'
+os.environ['CELO_MCP_CACHE_DIR'] = tempfile.mkdtemp(prefix='celo-bloom-')
+
+from eth_abi import encode
+
+from utils.local_chain import LocalChain
+from utils.multicall import function_selector
+from utils.rpc_replay import PROXY_ENV
+
+chain = LocalChain(port=0, accounts=2, latency=args.latency).start()
+w3, tester = chain.w3, chain.w3.provider.ethereum_tester
+target, other = chain.addresses
+token = chain.contracts['CELO_TOKEN']
+senders = w3.eth.accounts[1:1 + args.noise]
+tester.disable_auto_mine_transactions()
+for n in range(args.blocks):
+    for i, sender in enumerate(senders):
+        w3.eth.send_transaction({'from': sender, 'to': senders[(i + 1) % len(senders)], 'value': 1})
+    if n % args.every == 0:
+        if n == args.every:
+            # A plain native transfer: no log names the target
+            tx = {'to': other, 'value': 1}
+        else:
+            tx = {'to': token, 'data': function_selector('transfer(address,uint256)') + encode(['address', 'uint256'], [other, 1])}
+        tx.update({'from': target, 'gas': 100000, 'maxFeePerGas': 2 * 10**9, 'maxPriorityFeePerGas': 10**9,
+                   'nonce': w3.eth.get_transaction_count(target), 'chainId': w3.eth.chain_id})
+        w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx, chain.keys[0]).raw_transaction)
+    tester.mine_blocks(1)
+os.environ[PROXY_ENV] = chain.url
+
+import server
+from utils.metrics import metrics
+from utils.rpc import _caches
+
+tool = server.mcp._tool_manager._tools['get_celo_transactions']
+
+def wire_bytes():
+    return sum(row.get('bytes', 0) for row in metrics.snapshot()['rpc_methods'].values())
+
+def run(label, prefilter):
+    for cache in _caches.values():
+        cache.clear()
+    before, started = wire_bytes(), time.perf_counter()
+    result = json.loads(asyncio.run(tool.fn(address=target, blocks_to_scan=args.blocks, max_count=50,
+                                            bloom_prefilter=prefilter, timeout_seconds=600)))
+    elapsed = time.perf_counter() - started
+    stats = result.get('prefilter', {})
+    print(f"{label:<22} {elapsed:6.2f}s {(wire_bytes() - before) / 1024:9.0f} KiB  found {result['transactions_found']:3d}"
+          + (f"  (headers {stats['headers_fetched']}, from local blooms {stats['known_blocks']}, "
+             f"skipped {stats['skipped_blocks']})" if stats else ""))
+    return {tx['hash'] for tx in result['transactions']}
+
+print(f"{args.blocks} blocks, {args.noise} other transfers each; target active every {args.every} blocks")
+cold = run('prefilter, cold', True)
+full = run('full scan', False)
+warm = run('prefilter, warm', True)
+print(f"\nmissed vs full scan: cold {len(full - cold)}, warm {len(full - warm)}")
+chain.stop()
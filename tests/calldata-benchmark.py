@@ -0,0 +1,124 @@
+# Microbenchmark: calldata building throughput, web3 contract functions vs the precompiled registry
+# and the raw bytearray encoders, plus a randomized equivalence check of the raw encoders
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web3 import Web3
+from utils.contracts import ERC20_ABI, LENDING_POOL_ABI, contracts
+from utils import calldata
+
+parser = argparse.ArgumentParser(description='Measure calldata encoding throughput for ERC-20 and Aave calls')
+parser.add_argument('--iterations', type=int, default=20000, help='Number of calls to encode per case')
+parser.add_argument('--samples', type=int, default=2000, help='Random inputs per signature for the equivalence check')
+parser.add_argument('--seed', type=int, default=1, help='Random seed for the equivalence check')
+args = parser.parse_args()
+
+# Offline Web3 instance - encoding never touches the network
+web3 = Web3()
+
+TOKEN = "0x765DE816845861e75A25fCA122bb6898B8B1282a"
+POOL = "0x3E59A31363E2ad014dcbc521c4a0d5757d9f3402"
+USDC = "0xcebA9300f2b948710d2653dD7B07f33A8B32118C"
+RECIPIENT = "0x1111111111111111111111111111111111111111"
+
+CASES = [
+    ("erc20", ERC20_ABI, TOKEN, "transfer", (RECIPIENT, 10**18), calldata.encode_transfer),
+    ("erc20", ERC20_ABI, TOKEN, "balanceOf", (RECIPIENT,), calldata.encode_balance_of),
+    ("lending_pool", LENDING_POOL_ABI, POOL, "borrow", (USDC, 10**6, 2, 0, RECIPIENT), calldata.encode_borrow),
+    ("lending_pool", LENDING_POOL_ABI, POOL, "repay", (USDC, 10**6, 2, RECIPIENT), calldata.encode_repay),
+]
+
+# Raw encoders and generators of random arguments for the equivalence check
+UINT_EDGES = [0, 1, 2**128, 2**256 - 1]
+
+def rand_address(rng):
+    return Web3.to_checksum_address("0x" + rng.getrandbits(160).to_bytes(20, "big").hex())
+
+def rand_uint(rng, bits=256):
+    return rng.choice(UINT_EDGES + [rng.getrandbits(bits)] * 4) % (2**bits)
+
+EQUIVALENCE = [
+    ("erc20", "transfer", calldata.encode_transfer, lambda r: (rand_address(r), rand_uint(r))),
+    ("erc20", "balanceOf", calldata.encode_balance_of, lambda r: (rand_address(r),)),
+    ("erc20", "approve", calldata.encode_approve, lambda r: (rand_address(r), rand_uint(r))),
+    ("lending_pool", "supply", calldata.encode_supply, lambda r: (rand_address(r), rand_uint(r), rand_address(r), rand_uint(r, 16))),
+    ("lending_pool", "withdraw", calldata.encode_withdraw, lambda r: (rand_address(r), rand_uint(r), rand_address(r))),
+    ("lending_pool", "setUserUseReserveAsCollateral", calldata.encode_set_collateral, lambda r: (rand_address(r), r.random() < 0.5)),
+    ("lending_pool", "borrow", calldata.encode_borrow, lambda r: (rand_address(r), rand_uint(r), rand_uint(r), rand_uint(r, 16), rand_address(r))),
+    ("lending_pool", "repay", calldata.encode_repay, lambda r: (rand_address(r), rand_uint(r), rand_uint(r), rand_address(r))),
+]
+
+def check_equivalence(samples, seed):
+    """Compare raw encoders against eth_abi on random and edge-case inputs."""
+    rng = random.Random(seed)
+    for abi_name, fn_name, raw_encoder, gen in EQUIVALENCE:
+        reference = contracts.function(abi_name, fn_name)
+        for _ in range(samples):
+            fn_args = gen(rng)
+            expected = reference.encode(*fn_args)
+            assert bytes(raw_encoder(*fn_args)) == expected, f"{fn_name}{fn_args}"
+            # Writing into a dirty, larger preallocated buffer must give the same bytes
+            buf = bytearray(b"\xff" * (len(expected) + 8))
+            raw_encoder(*fn_args, buf=buf, offset=8)
+            assert bytes(buf[8:]) == expected, f"{fn_name}{fn_args} (preallocated)"
+
+    for _ in range(samples):
+        value = rand_uint(rng)
+        word = value.to_bytes(32, "big")
+        assert calldata.decode_uint256(word) == contracts.function("erc20", "balanceOf").decode(word) == value
+
+    print(f"Raw encoders match eth_abi on {samples} random inputs per signature ({len(EQUIVALENCE)} signatures)\n")
+
+check_equivalence(args.samples, args.seed)
+
+def bench(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<38} {iterations / elapsed:>12,.0f} calls/s  ({elapsed / iterations * 1e6:.2f} us/call)")
+
+print(f"Encoding {args.iterations} calls per case\n")
+
+for abi_name, abi, address, fn_name, fn_args, raw_encoder in CASES:
+    print(f"{abi_name}.{fn_name}")
+
+    # Make sure both paths produce identical calldata before timing them
+    expected = bytes.fromhex(web3.eth.contract(address=address, abi=abi).encode_abi(fn_name, args=list(fn_args))[2:])
+    assert contracts.encode(abi_name, fn_name, *fn_args) == expected, f"calldata mismatch for {fn_name}"
+
+    bench("web3 contract per call",
+          lambda: web3.eth.contract(address=address, abi=abi).encode_abi(fn_name, args=list(fn_args)),
+          args.iterations // 10)
+
+    contract = web3.eth.contract(address=address, abi=abi)
+    bench("web3 cached contract",
+          lambda: contract.encode_abi(fn_name, args=list(fn_args)),
+          args.iterations // 10)
+
+    precompiled = contracts.function(abi_name, fn_name)
+    bench("precompiled registry encoder",
+          lambda: precompiled.encode(*fn_args),
+          args.iterations)
+
+    bench("raw bytearray encoder",
+          lambda: raw_encoder(*fn_args),
+          args.iterations)
+
+    buf = bytearray(len(expected))
+    bench("raw encoder, preallocated buffer",
+          lambda: raw_encoder(*fn_args, buf=buf),
+          args.iterations)
+    print()
+
+owners = [rand_address(random.Random(i)) for i in range(1000)]
+start = time.perf_counter()
+for _ in range(max(args.iterations // 1000, 1)):
+    calldata.encode_balance_of_batch(owners)
+elapsed = time.perf_counter() - start
+print(f"balanceOf batch of 1000: {max(args.iterations // 1000, 1) * 1000 / elapsed:,.0f} calls/s")
@@ -0,0 +1,63 @@
+# Cancellation and deadline check against a local chain with injected RPC latency (utils/local_chain.py):
+#   1. a block scan with a short timeout_seconds returns partial results ("scanned N of M blocks")
+#   2. a cancelled scan frees its tool worker at once and sends no further RPCs
+#
+#   python tests/cancellation-check.py --latency 0.05 --blocks 1000
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Check deadline and cancellation handling of long-running tools')
+parser.add_argument('--latency', type=float, default=0.05, help='Seconds of injected latency per RPC response')
+parser.add_argument('--blocks', type=int, default=1000, help='Blocks to mine and scan')
+parser.add_argument('--timeout', type=float, default=1.0, help='timeout_seconds for the partial scan')
+parser.add_argument('--cancel-after', type=float, default=0.5, help='Seconds before the second scan is cancelled')
+args = parser.parse_args()
+
+from utils.local_chain import LocalChain
+from utils.rpc_replay import PROXY_ENV
+
+chain = LocalChain(port=0, accounts=1, latency=args.latency).start()
+chain.w3.provider.ethereum_tester.mine_blocks(args.blocks)
+# Send all reads to the local chain
+os.environ[PROXY_ENV] = chain.url
+os.environ['CELO_MCP_CACHE_DIR'] = tempfile.mkdtemp(prefix='celo-cancel-')
+
+import server
+from utils.metrics import metrics
+from utils.workers import set_max_workers
+
+# One worker, so a call stuck behind a cancelled one shows whether its slot was released
+set_max_workers(1)
+TOOLS = server.mcp._tool_manager._tools
+SCAN = {'address': chain.addresses[0], 'blocks_to_scan': args.blocks, 'max_count': 50}
+
+def rpc_calls():
+    return sum(row['calls'] - row.get('cache_hits', 0) for row in metrics.snapshot()['rpc_methods'].values())
+
+async def main():
+    started = time.perf_counter()
+    result = json.loads(await TOOLS['get_celo_transactions'].fn(timeout_seconds=args.timeout, **SCAN))
+    print(f"Deadline: returned after {time.perf_counter() - started:.2f}s with timeout_seconds={args.timeout}: "
+          f"{result.get('message', 'complete scan')}")
+
+    scan = asyncio.create_task(TOOLS['get_celo_transactions'].fn(timeout_seconds=600, **SCAN))
+    await asyncio.sleep(args.cancel_after)
+    scan.cancel()
+    cancelled_at = time.perf_counter()
+    sent_at_cancel = rpc_calls()
+    await TOOLS['get_rpc_stats'].fn()
+    waited = time.perf_counter() - cancelled_at
+    await asyncio.sleep(max(1.0, 10 * args.latency))
+    print(f"Cancel: next call got the worker after {waited * 1000:.0f}ms "
+          f"(one RPC is {args.latency * 1000:.0f}ms); RPCs completed after cancelling: {rpc_calls() - sent_at_cancel} "
+          "(at most the one in flight)")
+
+asyncio.run(main())
+chain.stop()
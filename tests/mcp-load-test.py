@@ -0,0 +1,221 @@
+# Load test: spawns server.py, speaks MCP to it over stdio or HTTP, and drives a weighted mix of tool calls
+# from concurrent simulated clients against the record/replay RPC and Dune stand-in (utils/rpc_replay.py).
+# Over stdio all clients share the one session; over sse/streamable-http each client opens its own.
+# Reports throughput, client-side latency percentiles per tool, and the server's own metrics
+# including event-loop lag.
+#
+#   1. Record the workload's responses once:
+#        python tests/mcp-load-test.py --record --cassette load.jsonl --address 0x...
+#   2. Drive load against the recording:
+#        python tests/mcp-load-test.py --cassette load.jsonl --address 0x... --clients 16 --duration 30 --latency 0.05
+#   3. Same load against one shared HTTP server:
+#        python tests/mcp-load-test.py --cassette load.jsonl --address 0x... --clients 16 --transport streamable-http
+#
+# A workload file (--workload) is JSON lines of {"tool": ..., "arguments": {...}, "weight": ...}.
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Drive concurrent MCP tool calls against a spawned server')
+parser.add_argument('--cassette', required=True, help='JSON lines file of recorded RPC and Dune responses')
+parser.add_argument('--record', action='store_true', help='Call every workload entry once against the real endpoints and record')
+parser.add_argument('--address', required=True, help='Celo address used by the default workload')
+parser.add_argument('--dune-query', type=int, default=3196876, help='Dune query id used by the default workload')
+parser.add_argument('--workload', default='', help='JSON lines workload file (default: built-in read mix)')
+parser.add_argument('--clients', type=int, default=8, help='Concurrent simulated clients')
+parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run')
+parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause between a client\'s calls (exponential)')
+parser.add_argument('--latency', type=float, default=0.05, help='Seconds of injected latency per upstream response')
+parser.add_argument('--jitter', type=float, default=0.02, help='Up to this many extra seconds per upstream response')
+parser.add_argument('--transport', default='stdio', choices=['stdio', 'sse', 'streamable-http'], help='MCP transport to drive')
+parser.add_argument('--port', type=int, default=0, help='Port for the HTTP transports (default: a free one)')
+parser.add_argument('--max-concurrency', type=int, default=0, help='Server tool worker count (default: server default)')
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--verbose', action='store_true', help='Show the server\'s stderr')
+args = parser.parse_args()
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from utils.metrics import LatencyHistogram, _is_error_result
+from utils.rpc_replay import PROXY_ENV, Cassette, ReplayServer
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server.py')
+
+DEFAULT_WORKLOAD = [
+    {"tool": "get_celo_balances", "arguments": {"address": args.address}, "weight": 30},
+    {"tool": "get_celo_token_list", "arguments": {"address": args.address}, "weight": 15},
+    {"tool": "get_celo_transactions", "arguments": {"address": args.address, "blocks_to_scan": 100}, "weight": 10},
+    {"tool": "get_aave_reserves", "arguments": {}, "weight": 10},
+    {"tool": "get_aave_position", "arguments": {"address": args.address}, "weight": 10},
+    {"tool": "get_dune_data", "arguments": {"query_id": args.dune_query, "limit": 10, "page": 1}, "weight": 15},
+    {"tool": "get_dune_summary", "arguments": {"query_id": args.dune_query}, "weight": 5},
+    {"tool": "get_rpc_stats", "arguments": {}, "weight": 5},
+]
+
+def load_workload():
+    if not args.workload:
+        return DEFAULT_WORKLOAD
+    with open(args.workload) as f:
+        return [dict({"arguments": {}, "weight": 1}, **json.loads(line)) for line in f if line.strip()]
+
+class ClientLoopLag:
+    """The driver's own loop lag, to tell a saturated driver from a slow server."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+
+    async def run(self, stop):
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            started = loop.time()
+            await asyncio.sleep(0.05)
+            self.histogram.record(max(0.0, loop.time() - started - 0.05))
+
+async def client(session, workload, stop, results, rng):
+    tools = [entry["tool"] for entry in workload]
+    weights = [entry["weight"] for entry in workload]
+    while not stop.is_set():
+        entry = workload[rng.choices(range(len(tools)), weights)[0]]
+        started = time.perf_counter()
+        try:
+            result = await session.call_tool(entry["tool"], entry["arguments"])
+            text = "".join(getattr(c, "text", "") for c in result.content)
+            error = result.isError or _is_error_result(text)
+        except Exception:
+            error = True
+        elapsed = time.perf_counter() - started
+        stats = results.setdefault(entry["tool"], {"latency": LatencyHistogram(), "errors": 0})
+        stats["latency"].record(elapsed)
+        stats["errors"] += int(error)
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def wait_for_port(port, proc, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"Server exited with code {proc.returncode}")
+        with contextlib.suppress(OSError):
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        await asyncio.sleep(0.1)
+    sys.exit(f"Server did not listen on port {port} within {timeout:.0f}s")
+
+@contextlib.asynccontextmanager
+async def open_session(params, errlog, url):
+    """One initialized MCP client session over the selected transport."""
+    if args.transport == 'stdio':
+        transport = stdio_client(params, errlog=errlog)
+    elif args.transport == 'sse':
+        transport = sse_client(url)
+    else:
+        transport = streamablehttp_client(url)
+    async with transport as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            yield session
+
+async def main():
+    workload = load_workload()
+    replay = ReplayServer(Cassette(args.cassette), 'record' if args.record else 'replay',
+                          latency=0.0 if args.record else args.latency,
+                          jitter=0.0 if args.record else args.jitter).start()
+    env = dict(os.environ)
+    env.update({
+        PROXY_ENV: replay.url,
+        'DUNE_BASE_URL': replay.url,
+        'DUNE_API_KEY': env.get('DUNE_API_KEY', 'replay'),
+        'CELO_MCP_CACHE_DIR': tempfile.mkdtemp(prefix='celo-load-'),
+    })
+    server_args = [SERVER]
+    if args.max_concurrency:
+        server_args += ['--max-concurrency', str(args.max_concurrency)]
+    params = StdioServerParameters(command=sys.executable, args=server_args, env=env)
+    errlog = sys.stderr if args.verbose else open(os.devnull, 'w')
+
+    url = proc = None
+    if args.transport != 'stdio':
+        port = args.port or free_port()
+        proc = subprocess.Popen([sys.executable, *server_args, '--transport', args.transport, '--port', str(port)],
+                                env=env, stdout=errlog, stderr=errlog)
+        await wait_for_port(port, proc)
+        url = f"http://127.0.0.1:{port}" + ('/sse' if args.transport == 'sse' else '/mcp')
+
+    try:
+        async with contextlib.AsyncExitStack() as stack:
+            session = await stack.enter_async_context(open_session(params, errlog, url))
+            available = {tool.name for tool in (await session.list_tools()).tools}
+            missing = [entry["tool"] for entry in workload if entry["tool"] not in available]
+            if missing:
+                sys.exit(f"Unknown tools in workload: {', '.join(missing)}")
+
+            if args.record:
+                for entry in workload:
+                    await session.call_tool(entry["tool"], entry["arguments"])
+                print(f"Recorded {len(replay.cassette)} responses to {args.cassette}")
+                replay.stop()
+                return
+
+            stop = asyncio.Event()
+            results = {}
+            lag = ClientLoopLag()
+            rng = random.Random(args.seed)
+            tasks = [asyncio.create_task(lag.run(stop))]
+            # stdio has one session; over HTTP every simulated client is its own MCP session
+            sessions = [session] * args.clients if args.transport == 'stdio' else [
+                await stack.enter_async_context(open_session(params, errlog, url)) for _ in range(args.clients)]
+            tasks += [asyncio.create_task(client(sessions[i], workload, stop, results, random.Random(rng.random())))
+                      for i in range(args.clients)]
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+
+            server_metrics = json.loads((await session.call_tool('get_server_metrics', {})).content[0].text)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    replay.stop()
+    total = sum(stats["latency"].count for stats in results.values())
+    errors = sum(stats["errors"] for stats in results.values())
+    print(f"\n{args.transport}: {args.clients} clients for {elapsed:.1f}s, upstream {args.latency * 1000:.0f}ms "
+          f"+{args.jitter * 1000:.0f}ms jitter, {replay.misses} replay misses")
+    print(f"throughput: {total / elapsed:.1f} calls/s ({total} calls, {errors} errors)\n")
+    print(f"{'tool':<26}{'calls':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in sorted(results.items()):
+        s = stats["latency"].summary()
+        print(f"{name:<26}{s['count']:>7}{stats['errors']:>8}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}"
+              f"{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+
+    server_lag = server_metrics.get("event_loop_lag", {})
+    client_lag = lag.histogram.summary()
+    print(f"\nserver event-loop lag: p50 {server_lag.get('p50_ms')}ms, p99 {server_lag.get('p99_ms')}ms, "
+          f"max {server_lag.get('max_ms')}ms")
+    print(f"driver event-loop lag: p50 {client_lag['p50_ms']}ms, p99 {client_lag['p99_ms']}ms, max {client_lag['max_ms']}ms")
+    print("\nServer-side tool latency (excludes MCP transport):")
+    for name, row in server_metrics.get("tools", {}).items():
+        print(f"  {name:<24} p50 {row['p50_ms']}ms  p95 {row['p95_ms']}ms  rpc/call "
+              f"{row['rpc_calls'] / max(1, row['calls']):.1f}")
+
+asyncio.run(main())
@@ -0,0 +1,99 @@
+# Rate-limit benchmark: many threads reading through a rate-limited proxy (utils/rpc_replay.py in record
+# mode, answering 429 + Retry-After above --rate) in front of a local chain (utils/local_chain.py).
+# Reports goodput against the server's limit, how many requests drew a 429, errors that reached callers,
+# and where the client's token bucket and AIMD concurrency limit settled.
+#
+# With --batch each read is a JSON-RPC batch of that many requests; batches larger than the token bucket
+# must still get through.
+#
+#   python tests/rate-limit-benchmark.py --rate 50 --threads 32 --duration 20
+#   python tests/rate-limit-benchmark.py --rate 50 --threads 4 --batch 100
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Measure RPC throughput against a rate-limiting endpoint')
+parser.add_argument('--rate', type=float, default=50.0, help='Server rate limit, requests/second')
+parser.add_argument('--burst', type=float, default=0.0, help='Server burst size (default: one second\'s worth)')
+parser.add_argument('--threads', type=int, default=32, help='Client threads issuing reads back to back')
+parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run')
+parser.add_argument('--latency', type=float, default=0.02, help='Seconds of latency per upstream response')
+parser.add_argument('--blocks', type=int, default=200, help='Blocks to mine; reads pick random blocks')
+parser.add_argument('--batch', type=int, default=0, help='Send reads as JSON-RPC batches of this size')
+args = parser.parse_args()
+
+from web3 import Web3
+
+from utils.local_chain import LocalChain
+from utils.rpc import MultiEndpointProvider, all_endpoint_stats
+from utils.rpc_replay import Cassette, ReplayServer, proxied_url
+
+chain = LocalChain(port=0, accounts=1).start()
+chain.w3.provider.ethereum_tester.mine_blocks(args.blocks)
+proxy = ReplayServer(Cassette(), 'record', latency=args.latency, rate_limit=args.rate, burst=args.burst).start()
+# No response cache: every read has to reach the endpoint
+w3 = Web3(MultiEndpointProvider([proxied_url(proxy.url, chain.url)], cache=False))
+latest = w3.eth.block_number
+
+ok = 0
+errors = []
+lock = threading.Lock()
+stop = threading.Event()
+samples = []
+
+def reader(seed):
+    global ok
+    rng = random.Random(seed)
+    while not stop.is_set():
+        try:
+            if args.batch:
+                with w3.batch_requests() as batch:
+                    for _ in range(args.batch):
+                        batch.add(w3.eth.get_balance(chain.addresses[0], rng.randint(0, latest)))
+                    done = len(batch.execute())
+            else:
+                w3.eth.get_balance(chain.addresses[0], rng.randint(0, latest))
+                done = 1
+            with lock:
+                ok += done
+        except Exception as e:
+            with lock:
+                errors.append(e)
+
+def sampler():
+    # Goodput per second, to show where the AIMD sawtooth settles
+    last = 0
+    while not stop.wait(1.0):
+        with lock:
+            samples.append(ok - last)
+            last = ok
+
+threads = [threading.Thread(target=reader, args=(i,), daemon=True) for i in range(args.threads)]
+threads.append(threading.Thread(target=sampler, daemon=True))
+started = time.perf_counter()
+for t in threads:
+    t.start()
+time.sleep(args.duration)
+stop.set()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - started
+
+sent = proxy.requests
+print(f"\nServer limit {args.rate:.0f} req/s, {args.threads} client threads"
+      + (f" sending batches of {args.batch}" if args.batch else "") + f", {elapsed:.1f}s")
+print(f"goodput: {ok / elapsed:.1f} req/s ({100 * ok / elapsed / args.rate:.0f}% of the limit)")
+print(f"429s: {proxy.rate_limited} of {sent} requests sent ({100 * proxy.rate_limited / max(1, sent):.1f}%)")
+print(f"errors seen by callers: {len(errors)}" + (f" (e.g. {errors[0]})" if errors else ""))
+print("goodput per second: " + " ".join(str(n) for n in samples))
+limiter = all_endpoint_stats()[0]["limiter"]
+print(f"client limiter: {limiter['rate_limit_rps']} req/s, concurrency {limiter['concurrency_limit']}, "
+      f"{limiter['throttled']} waits")
+
+proxy.stop()
+chain.stop()
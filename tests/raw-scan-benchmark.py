@@ -0,0 +1,108 @@
+# Raw block scan benchmark: client-side CPU and memory per scanned block for the get_celo_transactions scan,
+# w3.eth.get_block(n, True) (json + web3 formatting of every transaction) vs utils/raw_blocks.py (parse only,
+# format the header and matching transactions), with json and with orjson. Response bodies are synthetic,
+# shaped like a node's (hex quantities, lowercase addresses), and served from memory, so no network is timed.
+#
+#   python tests/raw-scan-benchmark.py --blocks 200 --txs 150 --every 10
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Measure per-block CPU and memory of raw vs web3-formatted block scans')
+parser.add_argument('--blocks', type=int, default=200, help='Blocks to scan')
+parser.add_argument('--txs', type=int, default=150, help='Transactions per block')
+parser.add_argument('--every', type=int, default=10, help='The target sends a transaction in every Nth block')
+parser.add_argument('--rounds', type=int, default=3, help='Timed passes per mode (best is reported)')
+args = parser.parse_args()
+
+from web3 import Web3
+from web3.providers import JSONBaseProvider
+
+from utils import raw_blocks
+from utils.raw_blocks import fetch_block
+
+rng = random.Random(7)
+def hexbytes(n):
+    return '0x' + rng.randbytes(n).hex()
+
+target = hexbytes(20)
+def transaction(number, index, sender):
+    # A CIP-64 (fee currency) transaction, the most common kind on Celo
+    return {'blockHash': None, 'blockNumber': hex(number), 'from': sender, 'gas': hex(rng.randrange(21000, 500000)),
+            'gasPrice': hex(rng.randrange(10**9, 10**11)), 'maxFeePerGas': hex(10**11), 'maxPriorityFeePerGas': hex(10**9),
+            'feeCurrency': hexbytes(20), 'hash': hexbytes(32), 'input': hexbytes(rng.choice((0, 68, 68, 260))),
+            'nonce': hex(rng.randrange(10**5)), 'to': hexbytes(20), 'transactionIndex': hex(index),
+            'value': hex(rng.randrange(10**20)), 'type': '0x7b', 'accessList': [], 'chainId': '0xa4ec',
+            'v': '0x1', 'r': hexbytes(32), 's': hexbytes(32), 'yParity': '0x1'}
+
+bodies = {}
+for number in range(1, args.blocks + 1):
+    block_hash = hexbytes(32)
+    txs = [transaction(number, i, target if i == 0 and number % args.every == 0 else hexbytes(20)) for i in range(args.txs)]
+    for tx in txs:
+        tx['blockHash'] = block_hash
+    block = {'baseFeePerGas': '0x5d21dba00', 'difficulty': '0x0', 'extraData': '0x', 'gasLimit': hex(30_000_000),
+             'gasUsed': hex(12_000_000), 'hash': block_hash, 'logsBloom': hexbytes(256), 'miner': hexbytes(20),
+             'mixHash': hexbytes(32), 'nonce': '0x0000000000000000', 'number': hex(number), 'parentHash': hexbytes(32),
+             'receiptsRoot': hexbytes(32), 'sha3Uncles': hexbytes(32), 'size': hex(60000), 'stateRoot': hexbytes(32),
+             'timestamp': hex(1_700_000_000 + number), 'transactions': txs, 'transactionsRoot': hexbytes(32),
+             'uncles': [], 'withdrawals': [], 'withdrawalsRoot': hexbytes(32)}
+    bodies[hex(number)] = json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': block}).encode()
+
+class Decoded(JSONBaseProvider):
+    """Answers from the prepared bodies, decoding them as HTTPProvider does."""
+
+    def make_request(self, method, params):
+        return self.decode_rpc_response(bodies[params[0]])
+
+class Raw(Decoded):
+    def make_raw_request(self, method, params):
+        return bodies[params[0]]
+
+def scan_web3(w3, number):
+    block = w3.eth.get_block(number, full_transactions=True)
+    matches = [tx for tx in block['transactions']
+               if (tx.get('from') or '').lower() == target or (tx.get('to') or '').lower() == target]
+    return block['timestamp'], [tx['hash'].hex() for tx in matches]
+
+def scan_raw(w3, number):
+    raw_block = fetch_block(w3, number)
+    block = raw_block.header()
+    matches = [raw_block.materialize(position) for position in raw_block.involving(target)]
+    return block['timestamp'], [tx['hash'].hex() for tx in matches]
+
+def run(label, scan, w3):
+    best = float('inf')
+    for _ in range(args.rounds):
+        started = time.process_time()
+        found = [scan(w3, number) for number in range(1, args.blocks + 1)]
+        best = min(best, time.process_time() - started)
+    # One more pass for memory: peak allocation while handling a single block
+    peak = 0
+    tracemalloc.start()
+    for number in range(1, args.blocks + 1, max(1, args.blocks // 20)):
+        tracemalloc.reset_peak()
+        scan(w3, number)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    print(f"{label:<24} {best / args.blocks * 1000:7.2f} ms/block  peak {peak / 1024:7.0f} KiB/block  "
+          f"{sum(len(hashes) for _, hashes in found)} matches")
+    return found
+
+size = sum(map(len, bodies.values())) / len(bodies)
+print(f"{args.blocks} blocks of {args.txs} transactions ({size / 1024:.0f} KiB each); target in every {args.every}th")
+expected = run('web3 get_block', scan_web3, Web3(Decoded()))
+orjson = raw_blocks.orjson
+raw_blocks.orjson = None
+assert run('raw, json', scan_raw, Web3(Raw())) == expected
+if orjson is not None:
+    raw_blocks.orjson = orjson
+    assert run('raw, orjson', scan_raw, Web3(Raw())) == expected
+else:
+    print('orjson is not installed')
@@ -0,0 +1,62 @@
+# Receipt fetching benchmark: get_celo_transactions over blocks holding several matching transactions each,
+# against a local chain (utils/local_chain.py) that does and doesn't answer eth_getBlockReceipts. Counts the
+# receipt RPCs per mode; before utils/receipts.py every match cost its own eth_getTransactionReceipt.
+#
+#   python tests/receipts-benchmark.py --blocks 20 --per-block 5 --latency 0.02
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Count receipt RPCs for block scans with several matches per block')
+parser.add_argument('--blocks', type=int, default=20, help='Blocks holding matching transactions')
+parser.add_argument('--per-block', type=int, default=5, help='Matching transactions per block (at most 10)')
+parser.add_argument('--latency', type=float, default=0.02, help='Seconds of injected latency per RPC response')
+parser.add_argument('--mode', choices=['block-receipts', 'batched'], help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+if args.mode is None:
+    for mode in ('block-receipts', 'batched'):
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode, '--blocks', str(args.blocks),
+                        '--per-block', str(args.per_block), '--latency', str(args.latency)], check=True)
+    sys.exit(0)
+
+# Receipts from the on-disk store would hide the RPCs being counted
+os.environ['CELO_MCP_BLOCK_STORE_MB'] = '0'
+os.environ['CELO_MCP_CACHE_DIR'] = tempfile.mkdtemp(prefix='celo-receipts-')
+
+from utils.local_chain import LocalChain
+from utils.rpc_replay import PROXY_ENV
+
+chain = LocalChain(port=0, accounts=2, latency=args.latency, block_receipts=args.mode == 'block-receipts').start()
+tester = chain.w3.provider.ethereum_tester
+tester.disable_auto_mine_transactions()
+for _ in range(args.blocks):
+    for i in range(args.per_block):
+        # One sender per transaction: eth-tester checks nonces against mined state only
+        chain.w3.eth.send_transaction({'from': chain.w3.eth.accounts[i], 'to': chain.addresses[1], 'value': i + 1})
+    tester.mine_blocks(1)
+os.environ[PROXY_ENV] = chain.url
+
+import server
+from utils.metrics import metrics
+
+matches = args.blocks * args.per_block
+started = time.perf_counter()
+tool = server.mcp._tool_manager._tools['get_celo_transactions']
+result = json.loads(asyncio.run(tool.fn(address=chain.addresses[1], blocks_to_scan=args.blocks, max_count=min(50, matches))))
+elapsed = time.perf_counter() - started
+
+methods = metrics.snapshot()['rpc_methods']
+calls = {m: methods.get(m, {}).get('calls', 0) - methods.get(m, {}).get('cache_hits', 0) for m in ('eth_getBlockReceipts', 'eth_getTransactionReceipt', 'batch')}
+statuses = {tx['status'] for tx in result['transactions']}
+print(f"{args.mode:<15} {result['transactions_found']} matches in {elapsed:.2f}s; receipt RPCs: "
+      f"{calls['eth_getBlockReceipts']} eth_getBlockReceipts, {calls['batch']} batches, "
+      f"{calls['eth_getTransactionReceipt']} eth_getTransactionReceipt; statuses {sorted(statuses)}")
+chain.stop()
@@ -0,0 +1,110 @@
+# Offline benchmark: runs the read tools, Dune tools and (optionally) an Aave supply/withdraw flow
+# against a record/replay server, so every optimization can be measured without a network.
+#
+#   1. Record once against the real endpoints:
+#        python tests/rpc-replay-benchmark.py --record --cassette bench.jsonl --address 0x...
+#   2. Replay as often as needed, with simulated network latency:
+#        python tests/rpc-replay-benchmark.py --cassette bench.jsonl --address 0x... --latency 0.08 --jitter 0.04
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Benchmark MCP tools against recorded RPC and Dune traffic')
+parser.add_argument('--cassette', required=True, help='JSON lines file of recorded responses')
+parser.add_argument('--record', action='store_true', help='Forward to the real endpoints and record (one iteration)')
+parser.add_argument('--address', required=True, help='Celo address used by the read tools')
+parser.add_argument('--network', default='mainnet', help='Network for the Celo read tools')
+parser.add_argument('--iterations', type=int, default=20, help='Calls per tool when replaying')
+parser.add_argument('--latency', type=float, default=0.05, help='Seconds of injected latency per response')
+parser.add_argument('--jitter', type=float, default=0.02, help='Up to this many extra seconds per response')
+parser.add_argument('--warm', action='store_true', help='Keep RPC and Dune caches between iterations')
+parser.add_argument('--dune-query', type=int, default=3196876, help='Dune query id for the Dune tools')
+parser.add_argument('--aave-key', default=os.environ.get('AAVE_BENCH_PRIVATE_KEY'),
+                    help='Private key for --address to include the Aave supply/withdraw flow')
+parser.add_argument('--tools', default='', help='Comma-separated subset of workloads to run')
+args = parser.parse_args()
+
+from utils.rpc_replay import PROXY_ENV, Cassette, ReplayServer
+
+# The server has to be up before the tools build their Web3 instances
+replay = ReplayServer(Cassette(args.cassette), 'record' if args.record else 'replay',
+                      latency=0.0 if args.record else args.latency,
+                      jitter=0.0 if args.record else args.jitter).start()
+os.environ[PROXY_ENV] = replay.url
+os.environ['DUNE_BASE_URL'] = replay.url
+os.environ.setdefault('DUNE_API_KEY', 'replay')
+# Keep the persistent block index out of the measurement
+os.environ['CELO_MCP_CACHE_DIR'] = tempfile.mkdtemp(prefix='celo-bench-')
+
+import server
+from utils.metrics import metrics
+from utils import rpc
+from tools import dune_analytics
+
+TOOLS = server.mcp._tool_manager._tools
+
+async def call(name, **kwargs):
+    return await TOOLS[name].fn(**kwargs)
+
+async def aave_flow():
+    session = json.loads(await call('create_aave_session', address=args.address))
+    await call('add_aave_private_key', session_id=session['session_id'], private_key=args.aave_key)
+    await call('supply_celo', session_id=session['session_id'], amount=0.001)
+    await call('withdraw_celo', session_id=session['session_id'], amount=0.001)
+    await call('clear_aave_session', session_id=session['session_id'])
+
+WORKLOADS = {
+    'get_celo_balances': lambda: call('get_celo_balances', address=args.address, network=args.network),
+    'get_celo_transactions': lambda: call('get_celo_transactions', address=args.address, blocks_to_scan=100,
+                                          network=args.network),
+    'get_celo_token_list': lambda: call('get_celo_token_list', address=args.address, network=args.network),
+    'get_dune_data': lambda: call('get_dune_data', query_id=args.dune_query, limit=10, page=1),
+    'get_dune_summary': lambda: call('get_dune_summary', query_id=args.dune_query),
+    'get_aave_reserves': lambda: call('get_aave_reserves'),
+    'get_aave_position': lambda: call('get_aave_position', address=args.address),
+}
+if args.aave_key:
+    WORKLOADS['aave_supply_withdraw'] = aave_flow
+
+selected = [name for name in args.tools.split(',') if name] or list(WORKLOADS)
+
+def reset_caches():
+    for cache in list(rpc._caches.values()):
+        cache.clear()
+    dune_analytics.QUERY_CACHE.clear()
+
+async def main():
+    iterations = 1 if args.record else args.iterations
+    wall = {}
+    for name in selected:
+        samples = []
+        for _ in range(iterations):
+            if not args.warm:
+                reset_caches()
+            started = time.perf_counter()
+            await WORKLOADS[name]()
+            samples.append(time.perf_counter() - started)
+        wall[name] = samples
+
+    mode = 'recorded' if args.record else f'replayed ({args.latency * 1000:.0f}ms +{args.jitter * 1000:.0f}ms jitter)'
+    print(f"\n{mode}: {replay.requests} HTTP requests, {replay.misses} replay misses, "
+          f"{len(replay.cassette)} responses in {args.cassette}\n")
+    print(f"{'workload':<24}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, samples in wall.items():
+        ordered = sorted(samples)
+        p50 = ordered[math.ceil(len(ordered) * 0.50) - 1] * 1000
+        p95 = ordered[math.ceil(len(ordered) * 0.95) - 1] * 1000
+        print(f"{name:<24}{len(samples):>7}{p50:>10.1f}{p95:>10.1f}{ordered[-1] * 1000:>10.1f}")
+
+    print('\nPer-tool and per-RPC-method breakdown:')
+    print(json.dumps(metrics.snapshot(), indent=2))
+    replay.stop()
+
+asyncio.run(main())
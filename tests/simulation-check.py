@@ -0,0 +1,102 @@
+# Pre-flight simulation check (utils/simulation.py) against a local chain (utils/local_chain.py) with mocks that
+# revert with Error(string), Panic(uint256) and an Aave custom error:
+#   1. simulate_transaction decodes each revert into its reason
+#   2. borrow_usdc and set_celo_collateral against each mock as the lending pool, and send_celo to a mock, return
+#      the "would fail" response without broadcasting (the sender's nonce and the chain head are unchanged)
+#
+#   python tests/simulation-check.py
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Check that write tools simulate and refuse reverting transactions')
+args = parser.parse_args()
+
+from eth_abi import encode
+from eth_utils import keccak
+
+from utils.local_chain import LocalChain, initcode
+from utils.profiles import PROFILE_ENV, PROFILE_FILE_ENV, save_profile
+from utils.rpc_replay import PROXY_ENV
+
+def reverter_runtime(revert_data: bytes) -> bytes:
+    """Runtime that reverts every call with `revert_data`, kept after its 15 bytes of code."""
+    size = len(revert_data).to_bytes(2, 'big')
+    # CODECOPY(0, 15, size); REVERT(0, size)
+    return b'\x61' + size + b'\x61\x00\x0f\x60\x00\x39' + b'\x61' + size + b'\x60\x00\xfd' + revert_data
+
+HEALTH_FACTOR = 'Health factor would fall below the liquidation threshold'
+REVERTS = {
+    'Error(string)': (bytes.fromhex('08c379a0') + encode(['string'], ['Insufficient allowance']), 'Insufficient allowance'),
+    'Error(string), Aave code': (bytes.fromhex('08c379a0') + encode(['string'], ['35']), f"{HEALTH_FACTOR} (Aave error 35)"),
+    'Panic(uint256)': (bytes.fromhex('4e487b71') + encode(['uint256'], [0x11]), 'Panic: arithmetic overflow or underflow'),
+    'Aave custom error': (keccak(text='HealthFactorLowerThanLiquidationThreshold()')[:4], HEALTH_FACTOR),
+}
+
+chain = LocalChain(port=0, accounts=1).start()
+w3 = chain.w3
+reverters = {}
+for name, (revert_data, _) in REVERTS.items():
+    tx_hash = w3.eth.send_transaction({'from': w3.eth.accounts[0], 'data': initcode(reverter_runtime(revert_data)), 'gas': 3_000_000})
+    reverters[name] = w3.eth.wait_for_transaction_receipt(tx_hash)['contractAddress']
+
+os.environ[PROFILE_ENV] = 'local'
+os.environ[PROFILE_FILE_ENV] = save_profile(chain.profile(), tempfile.mktemp(suffix='.json'))
+os.environ[PROXY_ENV] = chain.url
+os.environ['CELO_MCP_CACHE_DIR'] = tempfile.mkdtemp(prefix='celo-simulation-')
+
+import server
+from web3 import HTTPProvider, Web3
+
+from tools.aave_session import AAVE_CONTRACTS
+from utils.simulation import simulate_transaction
+
+TOOLS = server.mcp._tool_manager._tools
+address, key = chain.addresses[0], chain.keys[0]
+http = Web3(HTTPProvider(chain.url))
+
+# 1. Decoding, over JSON-RPC as from a node
+for name, (_, expected) in REVERTS.items():
+    reason = simulate_transaction(http, {'from': address, 'to': reverters[name], 'value': 1, 'gas': 100000})
+    assert reason == expected, f"{name}: {reason!r} != {expected!r}"
+    print(f"{name:<26} {reason}")
+assert simulate_transaction(http, {'from': address, 'to': chain.addresses[0], 'value': 1}) is None
+
+# 2. The write tools stop before signing
+def state():
+    return w3.eth.get_transaction_count(address), w3.eth.block_number
+
+async def send_celo(to):
+    session = json.loads(await TOOLS['create_transaction_session'].fn(address=address))
+    await TOOLS['add_private_key'].fn(session_id=session['session_id'], private_key=key)
+    return json.loads(await TOOLS['send_celo'].fn(session_id=session['session_id'], to_address=to, amount=0.001))
+
+async def aave(tool, **kwargs):
+    session = json.loads(await TOOLS['create_aave_session'].fn(address=address))
+    await TOOLS['add_aave_private_key'].fn(session_id=session['session_id'], private_key=key)
+    return json.loads(await TOOLS[tool].fn(session_id=session['session_id'], **kwargs))
+
+def check(label, call, expected):
+    before = state()
+    result = asyncio.run(call())
+    assert result['success'] is False and result['simulated'] is True, f"{label}: {result}"
+    assert result['error'].startswith(expected), f"{label}: {result['error']!r} != {expected!r}"
+    assert state() == before, f"{label} broadcast a transaction"
+    print(f"{label:<34} not sent: {result['error']}")
+
+for name, (_, expected) in REVERTS.items():
+    # The tools look the pool up on every call
+    AAVE_CONTRACTS['LENDING_POOL'] = reverters[name]
+    check(f"borrow_usdc ({name})", lambda: aave('borrow_usdc', amount=1), f"Borrow transaction would fail: {expected}")
+check('set_celo_collateral', lambda: aave('set_celo_collateral', use_as_collateral=False),
+      f"Set collateral transaction would fail: {HEALTH_FACTOR}")
+# A plain transfer's 21000 gas leaves nothing for the mock's code
+check('send_celo', lambda: send_celo(reverters['Error(string)']), 'Transaction would fail: Out of gas')
+
+chain.stop()
+print('ok')
@@ -0,0 +1,220 @@
+# Subscription buffer check (utils/subscriptions.py) against a local WebSocket JSON-RPC stand-in for a node:
+# eth_subscribe/eth_unsubscribe are answered by the stand-in, everything else is forwarded to a local chain
+# (utils/local_chain.py), and newHeads/logs notifications are pushed by the check itself.
+#   1. covers() is False while the caller's head is ahead of the last block the service processed
+#   2. a reorg (a `removed` log, or a head at or below the last one) drops the buffered entries of the old blocks
+#   3. after a reconnect the missed blocks are backfilled; entries evicted from a full buffer during that
+#      backfill (logs go in before blocks) make covers() False for their blocks
+#   4. watch() is answered while a slow head is still being processed
+#
+#   python tests/subscriptions-check.py --buffer 4
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Check the subscription buffers against a local WebSocket node')
+parser.add_argument('--buffer', type=int, default=4, help='Entries kept per watched address')
+parser.add_argument('--timeout', type=float, default=15.0, help='Seconds to wait for the service at each step')
+args = parser.parse_args()
+
+import requests
+from eth_abi import encode
+from web3 import HTTPProvider, Web3
+from websockets.asyncio.server import serve
+
+from utils.local_chain import LocalChain
+from utils.multicall import function_selector
+from utils.subscriptions import SubscriptionService
+
+chain = LocalChain(port=0, accounts=3).start()
+w3, tester = chain.w3, chain.w3.provider.ethereum_tester
+tester.disable_auto_mine_transactions()
+target, other, third = chain.addresses
+token = chain.contracts['CELO_TOKEN']
+
+def rpc(method, params):
+    return requests.post(chain.url, json={'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params}).json()['result']
+
+class SlowHTTPProvider(HTTPProvider):
+    """Block fetches take `delay` seconds."""
+    delay = 0.0
+
+    def make_request(self, method, params):
+        if method == 'eth_getBlockByNumber':
+            time.sleep(self.delay)
+        return super().make_request(method, params)
+
+def matches(log_filter, log):
+    """eth_getLogs topic matching: None is a wildcard, a list is any of."""
+    for i, wanted in enumerate(log_filter.get('topics') or []):
+        if wanted is None:
+            continue
+        options = [t.lower() for t in (wanted if isinstance(wanted, list) else [wanted])]
+        if i >= len(log['topics']) or log['topics'][i].lower() not in options:
+            return False
+    return True
+
+class NodeStandIn:
+    """Subscriptions are kept here; any other request goes to the local chain over HTTP."""
+
+    def __init__(self):
+        self.connections = {}
+        self._ids = itertools.count(1)
+
+    async def handler(self, ws):
+        subscriptions = self.connections[ws] = {}
+        try:
+            async for raw in ws:
+                request = json.loads(raw)
+                method, params = request['method'], request.get('params', [])
+                if method == 'eth_subscribe':
+                    result = hex(next(self._ids))
+                    subscriptions[result] = params
+                elif method == 'eth_unsubscribe':
+                    result = subscriptions.pop(params[0], None) is not None
+                else:
+                    result = await asyncio.to_thread(rpc, method, params)
+                await ws.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': result}))
+        finally:
+            self.connections.pop(ws, None)
+
+    async def notify(self, kind, result):
+        for ws, subscriptions in list(self.connections.items()):
+            for sub_id, params in list(subscriptions.items()):
+                if params[0] == kind and (kind != 'logs' or matches(params[1], result)):
+                    await ws.send(json.dumps({'jsonrpc': '2.0', 'method': 'eth_subscription',
+                                              'params': {'subscription': sub_id, 'result': result}}))
+
+    async def disconnect(self):
+        for ws in list(self.connections):
+            await ws.close()
+
+def send(index, to, data='0x', value=0):
+    sender = chain.addresses[index]
+    tx = {'from': sender, 'to': to, 'data': data, 'value': value, 'gas': 100000, 'maxFeePerGas': 2 * 10**9,
+          'maxPriorityFeePerGas': 10**9, 'nonce': w3.eth.get_transaction_count(sender, 'pending'), 'chainId': w3.eth.chain_id}
+    return '0x' + w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx, chain.keys[index]).raw_transaction).hex()
+
+def transfer(index, to):
+    return send(index, token, function_selector('transfer(address,uint256)') + encode(['address', 'uint256'], [to, 1]))
+
+def mine():
+    tester.mine_blocks(1)
+    return w3.eth.block_number
+
+def logs_in(number):
+    return rpc('eth_getLogs', [{'fromBlock': hex(number), 'toBlock': hex(number)}])
+
+async def until(condition, what):
+    deadline = time.monotonic() + args.timeout
+    while not condition():
+        assert time.monotonic() < deadline, f"timed out waiting for {what}"
+        await asyncio.sleep(0.02)
+
+def hashes(service, address, number):
+    return sorted(entry['hash'] for entry in service.recent_activity(address, args.buffer) if entry['block_number'] == number)
+
+async def main():
+    node = NodeStandIn()
+    async with serve(node.handler, '127.0.0.1', 0) as ws_server:
+        http = Web3(SlowHTTPProvider(chain.url))
+        service = SubscriptionService(f"ws://127.0.0.1:{ws_server.sockets[0].getsockname()[1]}", lambda: http,
+                                      buffer_size=args.buffer)
+
+        async def publish(number):
+            for log in logs_in(number):
+                await node.notify('logs', log)
+            await node.notify('newHeads', {'number': hex(number)})
+            await until(lambda: service.last_block == number, f"block {number}")
+
+        await service.watch(target)
+        service.start()
+        await until(lambda: service.connected and service.last_block is not None, 'the first connection')
+
+        # 1. The HTTP head runs ahead of the subscription
+        native = send(0, third, value=1)
+        n = mine()
+        assert not service.covers(target, n, n), 'block not yet seen over the subscription reported as covered'
+        await publish(n)
+        assert service.covers(target, n, n) and hashes(service, target, n) == [native]
+        print(f"head ahead:      block {n} covered only once its head arrived")
+
+        # 2a. A reorg announced by removed logs
+        snapshot = tester.take_snapshot()
+        token_tx = transfer(0, third)
+        n = mine()
+        await publish(n)
+        assert sorted(e['type'] for e in service.recent_activity(target) if e['block_number'] == n) == ['token_transfer', 'transaction']
+        orphaned = logs_in(n)
+        tester.revert_to_snapshot(snapshot)
+        replacement = send(0, third, value=2)
+        assert mine() == n
+        for log in orphaned:
+            await node.notify('logs', dict(log, removed=True))
+        await until(lambda: not hashes(service, target, n), f"entries of the reorged block {n} to be dropped")
+        assert not service.covers(target, n, n), 'reorged block still reported as covered'
+        await publish(n)
+        assert hashes(service, target, n) == [replacement], hashes(service, target, n)
+        assert token_tx not in hashes(service, target, n)
+        print(f"removed logs:    block {n} entries replaced ({token_tx[:10]} -> {replacement[:10]})")
+
+        # 2b. A reorg seen only as a head at or below the last one
+        snapshot = tester.take_snapshot()
+        first = send(0, third, value=3)
+        n = mine()
+        await publish(n)
+        assert hashes(service, target, n) == [first]
+        tester.revert_to_snapshot(snapshot)
+        second = send(0, third, value=4)
+        assert mine() == n
+        await node.notify('newHeads', {'number': hex(n)})
+        await until(lambda: hashes(service, target, n) == [second], f"block {n} to be reprocessed")
+        assert service.covers(target, n, n)
+        print(f"repeated head:   block {n} entries replaced ({first[:10]} -> {second[:10]})")
+
+        # 3. Missed blocks are backfilled on reconnect; a backfill that overflows the buffer leaves no false coverage
+        await service.watch(other)
+        reconnects = service.reconnects
+        await node.disconnect()
+        await until(lambda: service.reconnects > reconnects, 'the disconnect to be noticed')
+        missed = []
+        for _ in range(args.buffer + 2):
+            transfer(1, third)
+            missed.append(mine())
+        await until(lambda: service.connected and service.last_block == missed[-1], 'the reconnect backfill')
+        kept = [entry for entry in service.recent_activity(other, args.buffer)]
+        assert len(kept) == args.buffer and all(entry['block_number'] in missed for entry in kept)
+        assert service.evicted_through[other.lower()] == missed[-1]
+        assert not service.covers(other, missed[-1], missed[-1]), 'block with evicted entries reported as covered'
+        send(1, third, value=5)
+        n = mine()
+        await publish(n)
+        assert service.covers(other, n, n)
+        print(f"reconnect:       blocks {missed[0]}-{missed[-1]} backfilled, covered from {n} "
+              f"(evicted through {service.evicted_through[other.lower()]})")
+
+        # 4. Head processing runs apart from the read loop, which keeps answering requests
+        http.provider.delay = 2.0
+        send(0, third, value=6)
+        n = mine()
+        await node.notify('newHeads', {'number': hex(n)})
+        await asyncio.sleep(0.2)
+        started = time.monotonic()
+        await service.watch(w3.eth.account.create().address)
+        elapsed = time.monotonic() - started
+        assert elapsed < 1.0 and service.last_block < n, f"watch() took {elapsed:.2f}s behind the head"
+        await until(lambda: service.last_block == n, f"block {n}")
+        http.provider.delay = 0.0
+        print(f"slow head:       watch() answered in {elapsed * 1000:.0f}ms while block {n} was processed")
+
+        await service.stop()
+    chain.stop()
+    print('ok')
+
+asyncio.run(main())
@@ -1,7 +1,12 @@
 # tools/aave_borrow.py - Aave borrow and repay operations
 from mcp.server.fastmcp import FastMCP, Context
 from utils.helpers import format_json_response
-from tools.aave_session import aave_session, CELO_NETWORKS, AAVE_CONTRACTS, EXPLORER_URL, ERC20_ABI, LENDING_POOL_ABI
+from utils.simulation import simulation_failure
+from utils.contracts import contracts
+from utils.deadline import wait_for_receipt
+from utils.workers import client_key
+from tools.aave_session import aave_session, AAVE_NETWORK, AAVE_RPC_URL, AAVE_CONTRACTS, EXPLORER_URL
+from tools.aave_reader import available_to_borrow
 
 def register_aave_borrow_tools(mcp: FastMCP):
     """Register Aave borrow and repay tools with the MCP server."""
@@ -28,7 +33,7 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 3)
             
             # Get session data
-            session_data = aave_session.get_session_data(session_id)
+            session_data = aave_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -42,17 +47,17 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 })
             
             if ctx:
-                ctx.info(f"Connecting to Celo mainnet")
+                ctx.info(f"Connecting to Celo {AAVE_NETWORK}")
                 await ctx.report_progress(2, 3)
             
-            # Connect to Celo mainnet - Aave is only available on mainnet
-            rpc_url = CELO_NETWORKS["mainnet"]["alchemy"]
+            # Connect to the active profile's network (Celo mainnet unless CELO_MCP_PROFILE says otherwise)
+            rpc_url = AAVE_RPC_URL
             
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = contracts.get_web3(rpc_url)
             if not w3.is_connected():
                 return format_json_response({
                     "success": False,
-                    "error": f"Failed to connect to Celo mainnet at {rpc_url}"
+                    "error": f"Failed to connect to Celo {AAVE_NETWORK} at {rpc_url}"
                 })
             
             # Load account from private key
@@ -60,11 +65,23 @@ def register_aave_borrow_tools(mcp: FastMCP):
             address = account.address
             
             # Create lending pool contract instance
-            lending_pool = w3.eth.contract(address=AAVE_CONTRACTS["LENDING_POOL"], abi=LENDING_POOL_ABI)
+            lending_pool = contracts.get_contract(rpc_url, AAVE_CONTRACTS["LENDING_POOL"], "lending_pool")
             
             # Convert USDC amount to Wei (USDC has 6 decimals)
             amount_in_wei = int(amount * 10**6)
             
+            # Check borrowing power before sending anything
+            try:
+                available = available_to_borrow(w3, address, AAVE_CONTRACTS["USDC_TOKEN"])
+            except Exception:
+                available = None
+            
+            if available is not None and amount > available:
+                return format_json_response({
+                    "success": False,
+                    "error": f"Insufficient borrowing power. You can borrow up to {available:.6f} USDC, requested {amount} USDC"
+                })
+            
             if ctx:
                 ctx.info(f"Borrowing USDC from Aave")
                 await ctx.report_progress(3, 3)
@@ -84,13 +101,17 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, borrow_tx, "Borrow transaction")
+            if failure:
+                return failure
+            
             # Sign and send the borrow transaction
             signed_borrow_tx = w3.eth.account.sign_transaction(borrow_tx, session_data["private_key"])
             borrow_tx_hash = w3.eth.send_raw_transaction(signed_borrow_tx.raw_transaction)
             borrow_tx_hash_hex = borrow_tx_hash.hex()
             
             # Wait for the borrow transaction to be mined
-            borrow_receipt = w3.eth.wait_for_transaction_receipt(borrow_tx_hash)
+            borrow_receipt = wait_for_receipt(w3, borrow_tx_hash)
             
             # Clear the session for security
             aave_session.clear_session(session_id)
@@ -98,7 +119,7 @@ def register_aave_borrow_tools(mcp: FastMCP):
             if borrow_receipt['status'] == 1:
                 result = {
                     "success": True,
-                    "message": f"Successfully borrowed {amount} USDC from Aave on Celo mainnet!",
+                    "message": f"Successfully borrowed {amount} USDC from Aave on Celo {AAVE_NETWORK}!",
                     "transaction_hash": borrow_tx_hash_hex,
                     "explorer_url": f"{EXPLORER_URL}{borrow_tx_hash_hex}",
                     "amount": amount,
@@ -151,7 +172,7 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 5)
             
             # Get session data
-            session_data = aave_session.get_session_data(session_id)
+            session_data = aave_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -165,17 +186,17 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 })
             
             if ctx:
-                ctx.info(f"Connecting to Celo mainnet")
+                ctx.info(f"Connecting to Celo {AAVE_NETWORK}")
                 await ctx.report_progress(2, 5)
             
-            # Connect to Celo mainnet - Aave is only available on mainnet
-            rpc_url = CELO_NETWORKS["mainnet"]["alchemy"]
+            # Connect to the active profile's network (Celo mainnet unless CELO_MCP_PROFILE says otherwise)
+            rpc_url = AAVE_RPC_URL
             
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = contracts.get_web3(rpc_url)
             if not w3.is_connected():
                 return format_json_response({
                     "success": False,
-                    "error": f"Failed to connect to Celo mainnet at {rpc_url}"
+                    "error": f"Failed to connect to Celo {AAVE_NETWORK} at {rpc_url}"
                 })
             
             # Load account from private key
@@ -183,8 +204,8 @@ def register_aave_borrow_tools(mcp: FastMCP):
             address = account.address
             
             # Create contract instances
-            lending_pool = w3.eth.contract(address=AAVE_CONTRACTS["LENDING_POOL"], abi=LENDING_POOL_ABI)
-            usdc_token = w3.eth.contract(address=AAVE_CONTRACTS["USDC_TOKEN"], abi=ERC20_ABI)
+            lending_pool = contracts.get_contract(rpc_url, AAVE_CONTRACTS["LENDING_POOL"], "lending_pool")
+            usdc_token = contracts.get_contract(rpc_url, AAVE_CONTRACTS["USDC_TOKEN"], "erc20")
             
             if ctx:
                 ctx.info(f"Checking USDC balance")
@@ -198,7 +219,7 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 amount_in_wei = int(amount * 10**6)
             
             # Check USDC balance
-            usdc_balance = usdc_token.functions.balanceOf(address).call()
+            usdc_balance = contracts.call(w3, AAVE_CONTRACTS["USDC_TOKEN"], "erc20", "balanceOf", address)
             
             if amount_in_wei != 2**256 - 1 and usdc_balance < amount_in_wei:
                 return format_json_response({
@@ -222,13 +243,17 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, approve_tx, "USDC approval transaction")
+            if failure:
+                return failure
+            
             # Sign and send the approval transaction
             signed_approve_tx = w3.eth.account.sign_transaction(approve_tx, session_data["private_key"])
             approve_tx_hash = w3.eth.send_raw_transaction(signed_approve_tx.raw_transaction)
             approve_tx_hash_hex = approve_tx_hash.hex()
             
             # Wait for the approval transaction to be mined
-            approve_receipt = w3.eth.wait_for_transaction_receipt(approve_tx_hash)
+            approve_receipt = wait_for_receipt(w3, approve_tx_hash)
             
             if approve_receipt['status'] != 1:
                 # Clear the session for security
@@ -259,22 +284,26 @@ def register_aave_borrow_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, repay_tx, "Repay transaction")
+            if failure:
+                return failure
+            
             # Sign and send the repay transaction
             signed_repay_tx = w3.eth.account.sign_transaction(repay_tx, session_data["private_key"])
             repay_tx_hash = w3.eth.send_raw_transaction(signed_repay_tx.raw_transaction)
             repay_tx_hash_hex = repay_tx_hash.hex()
             
             # Wait for the repay transaction to be mined
-            repay_receipt = w3.eth.wait_for_transaction_receipt(repay_tx_hash)
+            repay_receipt = wait_for_receipt(w3, repay_tx_hash)
             
             # Clear the session for security
             aave_session.clear_session(session_id)
             
             if repay_receipt['status'] == 1:
                 if amount_in_wei == 2**256 - 1:
-                    message = "Successfully repaid all USDC to Aave on Celo mainnet!"
+                    message = f"Successfully repaid all USDC to Aave on Celo {AAVE_NETWORK}!"
                 else:
-                    message = f"Successfully repaid {amount} USDC to Aave on Celo mainnet!"
+                    message = f"Successfully repaid {amount} USDC to Aave on Celo {AAVE_NETWORK}!"
                 
                 result = {
                     "success": True,
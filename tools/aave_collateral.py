@@ -1,7 +1,11 @@
 # tools/aave_collateral.py - Aave collateral management operations
 from mcp.server.fastmcp import FastMCP, Context
 from utils.helpers import format_json_response
-from tools.aave_session import aave_session, CELO_NETWORKS, AAVE_CONTRACTS, EXPLORER_URL, LENDING_POOL_ABI
+from utils.simulation import simulation_failure
+from utils.contracts import contracts
+from utils.deadline import wait_for_receipt
+from utils.workers import client_key
+from tools.aave_session import aave_session, AAVE_NETWORK, AAVE_RPC_URL, AAVE_CONTRACTS, EXPLORER_URL
 
 def register_aave_collateral_tools(mcp: FastMCP):
     """Register Aave collateral management tools with the MCP server."""
@@ -28,7 +32,7 @@ def register_aave_collateral_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 3)
             
             # Get session data
-            session_data = aave_session.get_session_data(session_id)
+            session_data = aave_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -42,17 +46,17 @@ def register_aave_collateral_tools(mcp: FastMCP):
                 })
             
             if ctx:
-                ctx.info(f"Connecting to Celo mainnet")
+                ctx.info(f"Connecting to Celo {AAVE_NETWORK}")
                 await ctx.report_progress(2, 3)
             
-            # Connect to Celo mainnet - Aave is only available on mainnet
-            rpc_url = CELO_NETWORKS["mainnet"]["alchemy"]
+            # Connect to the active profile's network (Celo mainnet unless CELO_MCP_PROFILE says otherwise)
+            rpc_url = AAVE_RPC_URL
             
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = contracts.get_web3(rpc_url)
             if not w3.is_connected():
                 return format_json_response({
                     "success": False,
-                    "error": f"Failed to connect to Celo mainnet at {rpc_url}"
+                    "error": f"Failed to connect to Celo {AAVE_NETWORK} at {rpc_url}"
                 })
             
             # Load account from private key
@@ -60,7 +64,7 @@ def register_aave_collateral_tools(mcp: FastMCP):
             address = account.address
             
             # Create lending pool contract instance
-            lending_pool = w3.eth.contract(address=AAVE_CONTRACTS["LENDING_POOL"], abi=LENDING_POOL_ABI)
+            lending_pool = contracts.get_contract(rpc_url, AAVE_CONTRACTS["LENDING_POOL"], "lending_pool")
             
             if ctx:
                 ctx.info(f"Setting CELO collateral status")
@@ -78,13 +82,17 @@ def register_aave_collateral_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, set_collateral_tx, "Set collateral transaction")
+            if failure:
+                return failure
+            
             # Sign and send the set collateral transaction
             signed_set_collateral_tx = w3.eth.account.sign_transaction(set_collateral_tx, session_data["private_key"])
             set_collateral_tx_hash = w3.eth.send_raw_transaction(signed_set_collateral_tx.raw_transaction)
             set_collateral_tx_hash_hex = set_collateral_tx_hash.hex()
             
             # Wait for the set collateral transaction to be mined
-            set_collateral_receipt = w3.eth.wait_for_transaction_receipt(set_collateral_tx_hash)
+            set_collateral_receipt = wait_for_receipt(w3, set_collateral_tx_hash)
             
             # Clear the session for security
             aave_session.clear_session(session_id)
@@ -0,0 +1,415 @@
+# tools/aave_reader.py - Read-only Aave position and reserve data
+from mcp.server.fastmcp import FastMCP, Context
+from utils.helpers import format_json_response
+from utils.multicall import aggregate3, encode_call, function_selector
+from utils.contracts import contracts
+from utils.calldata import encode_balance_of, decode_uint256
+from tools.aave_session import AAVE_RPC_URL, AAVE_CONTRACTS
+from collections import OrderedDict
+import threading
+from typing import Dict, List, Optional
+
+# Selectors for the read-only Aave v3 functions used below
+SELECTORS = {
+    "getReservesList": function_selector("getReservesList()"),
+    "getReserveData": function_selector("getReserveData(address)"),
+    "getUserAccountData": function_selector("getUserAccountData(address)"),
+    "getUserConfiguration": function_selector("getUserConfiguration(address)"),
+    "ADDRESSES_PROVIDER": function_selector("ADDRESSES_PROVIDER()"),
+    "getPriceOracle": function_selector("getPriceOracle()"),
+    "getAssetsPrices": function_selector("getAssetsPrices(address[])"),
+    "BASE_CURRENCY_UNIT": function_selector("BASE_CURRENCY_UNIT()"),
+    "balanceOf": function_selector("balanceOf(address)"),
+    "symbol": function_selector("symbol()"),
+}
+
+# Pool.getReserveData return layout (ReserveDataLegacy in Aave v3.1+)
+RESERVE_DATA_TYPES = [
+    "(uint256)",  # configuration bitmap
+    "uint128",    # liquidityIndex
+    "uint128",    # currentLiquidityRate
+    "uint128",    # variableBorrowIndex
+    "uint128",    # currentVariableBorrowRate
+    "uint128",    # currentStableBorrowRate
+    "uint40",     # lastUpdateTimestamp
+    "uint16",     # id
+    "address",    # aTokenAddress
+    "address",    # stableDebtTokenAddress
+    "address",    # variableDebtTokenAddress
+    "address",    # interestRateStrategyAddress
+    "uint128",    # accruedToTreasury
+    "uint128",    # unbacked
+    "uint128",    # isolationModeTotalDebt
+]
+
+ACCOUNT_DATA_TYPES = ["uint256"] * 6
+
+RAY = 10**27
+SECONDS_PER_YEAR = 31536000
+MAX_SNAPSHOTS = 8
+
+# Static reserve metadata (token addresses, symbols, oracle) keyed by pool address.
+# These never change for a listed reserve, so they are fetched once per process.
+_RESERVE_METADATA: Dict[str, Dict] = {}
+
+# Reserve snapshots keyed by (pool address, block number), most recent last
+_RESERVE_SNAPSHOTS: "OrderedDict[tuple, Dict]" = OrderedDict()
+# Tools run on a thread pool; inserts, reorders and evictions must not interleave
+_snapshots_lock = threading.Lock()
+
+def _decode_config(config: int) -> Dict:
+    """Decode the Aave v3 ReserveConfiguration bitmap."""
+    return {
+        "ltv": config & 0xFFFF,
+        "liquidation_threshold": (config >> 16) & 0xFFFF,
+        "liquidation_bonus": (config >> 32) & 0xFFFF,
+        "decimals": (config >> 48) & 0xFF,
+        "active": bool((config >> 56) & 1),
+        "frozen": bool((config >> 57) & 1),
+        "borrowing_enabled": bool((config >> 58) & 1),
+        "paused": bool((config >> 60) & 1),
+    }
+
+def _rate_to_apy(rate_ray: int) -> float:
+    """Convert a per-year rate in ray units to a compounded-per-second APY (percent)."""
+    apr = rate_ray / RAY
+    return ((1 + apr / SECONDS_PER_YEAR) ** SECONDS_PER_YEAR - 1) * 100
+
+def get_reserve_metadata(w3, pool_address: str = AAVE_CONTRACTS["LENDING_POOL"]) -> Dict:
+    """Fetch (once) the reserve list, token addresses, symbols and the price oracle for a pool."""
+    from eth_abi import decode
+    from eth_utils import to_checksum_address
+
+    if pool_address in _RESERVE_METADATA:
+        return _RESERVE_METADATA[pool_address]
+
+    results = aggregate3(w3, [
+        (pool_address, SELECTORS["getReservesList"], False),
+        (pool_address, SELECTORS["ADDRESSES_PROVIDER"], False),
+    ])
+    assets = [to_checksum_address(a) for a in decode(["address[]"], results[0][1])[0]]
+    provider = decode(["address"], results[1][1])[0]
+
+    calls = [(provider, SELECTORS["getPriceOracle"], False)]
+    for asset in assets:
+        calls.append((pool_address, encode_call(SELECTORS["getReserveData"], ["address"], [asset]), False))
+        calls.append((asset, SELECTORS["symbol"], True))
+    results = aggregate3(w3, calls)
+
+    oracle = decode(["address"], results[0][1])[0]
+    base_unit = decode(["uint256"], aggregate3(w3, [(oracle, SELECTORS["BASE_CURRENCY_UNIT"], False)])[0][1])[0]
+
+    reserves = []
+    for i, asset in enumerate(assets):
+        reserve_data = decode(RESERVE_DATA_TYPES, results[1 + 2 * i][1])
+        symbol_ok, symbol_raw = results[2 + 2 * i]
+        try:
+            symbol = decode(["string"], symbol_raw)[0] if symbol_ok else asset[:10]
+        except Exception:
+            symbol = asset[:10]
+        reserves.append({
+            "asset": asset,
+            "symbol": symbol,
+            "id": reserve_data[7],
+            "a_token": to_checksum_address(reserve_data[8]),
+            "variable_debt_token": to_checksum_address(reserve_data[10]),
+        })
+
+    metadata = {
+        "pool": pool_address,
+        "oracle": oracle,
+        "base_currency_unit": base_unit,
+        "reserves": reserves,
+    }
+    _RESERVE_METADATA[pool_address] = metadata
+    return metadata
+
+def _reserve_calls(metadata: Dict) -> List[tuple]:
+    """Multicall entries for a reserve snapshot: one getReserveData per asset plus all prices."""
+    pool = metadata["pool"]
+    assets = [r["asset"] for r in metadata["reserves"]]
+    calls = [(pool, encode_call(SELECTORS["getReserveData"], ["address"], [a]), False) for a in assets]
+    calls.append((metadata["oracle"], encode_call(SELECTORS["getAssetsPrices"], ["address[]"], [assets]), False))
+    return calls
+
+def _decode_snapshot(metadata: Dict, results: List[tuple], block_number: int) -> Dict:
+    """Turn reserve snapshot multicall results into per-reserve parameters."""
+    from eth_abi import decode
+
+    count = len(metadata["reserves"])
+    prices = decode(["uint256[]"], results[count][1])[0]
+    reserves = []
+    for i, reserve in enumerate(metadata["reserves"]):
+        data = decode(RESERVE_DATA_TYPES, results[i][1])
+        config = _decode_config(data[0][0])
+        reserves.append({
+            **reserve,
+            **config,
+            "price": prices[i],
+            "liquidity_rate": data[2],
+            "variable_borrow_rate": data[4],
+        })
+    return {"block_number": block_number, "reserves": reserves}
+
+def _user_calls(metadata: Dict, user: str) -> List[tuple]:
+    """Multicall entries for a user's balances, collateral flags and on-chain account data."""
+    pool = metadata["pool"]
+    balance_call = bytes(encode_balance_of(user))
+    calls = []
+    for reserve in metadata["reserves"]:
+        calls.append((reserve["a_token"], balance_call, False))
+        calls.append((reserve["variable_debt_token"], balance_call, False))
+    calls.append((pool, encode_call(SELECTORS["getUserConfiguration"], ["address"], [user]), False))
+    calls.append((pool, encode_call(SELECTORS["getUserAccountData"], ["address"], [user]), False))
+    return calls
+
+def _cached_snapshot(pool_address: str, block_number: int) -> Optional[Dict]:
+    with _snapshots_lock:
+        return _RESERVE_SNAPSHOTS.get((pool_address, block_number))
+
+def _cache_snapshot(pool_address: str, snapshot: Dict) -> None:
+    key = (pool_address, snapshot["block_number"])
+    with _snapshots_lock:
+        _RESERVE_SNAPSHOTS[key] = snapshot
+        _RESERVE_SNAPSHOTS.move_to_end(key)
+        while len(_RESERVE_SNAPSHOTS) > MAX_SNAPSHOTS:
+            _RESERVE_SNAPSHOTS.popitem(last=False)
+
+def get_reserve_snapshot(w3, block_number: Optional[int] = None, pool_address: str = AAVE_CONTRACTS["LENDING_POOL"]) -> Dict:
+    """Get reserve parameters and prices at a block, served from the per-block cache when possible."""
+    metadata = get_reserve_metadata(w3, pool_address)
+    if block_number is None:
+        block_number = w3.eth.block_number
+
+    cached = _cached_snapshot(pool_address, block_number)
+    if cached:
+        return cached
+
+    snapshot = _decode_snapshot(metadata, aggregate3(w3, _reserve_calls(metadata), block_number), block_number)
+    _cache_snapshot(pool_address, snapshot)
+    return snapshot
+
+def compute_position(snapshot: Dict, base_unit: int, balances: Dict[str, tuple], user_config: int) -> Dict:
+    """
+    Compute collateral, debt, LTV, health factor and available borrows from a reserve
+    snapshot and a user's (supplied, borrowed) raw balances keyed by asset address.
+    """
+    total_collateral = 0.0
+    total_debt = 0.0
+    weighted_ltv = 0.0
+    weighted_threshold = 0.0
+    assets = []
+
+    for reserve in snapshot["reserves"]:
+        supplied, borrowed = balances.get(reserve["asset"], (0, 0))
+        if not supplied and not borrowed:
+            continue
+
+        unit = 10 ** reserve["decimals"]
+        price = reserve["price"] / base_unit
+        use_as_collateral = bool((user_config >> (reserve["id"] * 2 + 1)) & 1)
+        supplied_value = supplied / unit * price
+        borrowed_value = borrowed / unit * price
+
+        if use_as_collateral and reserve["liquidation_threshold"]:
+            total_collateral += supplied_value
+            weighted_ltv += supplied_value * reserve["ltv"]
+            weighted_threshold += supplied_value * reserve["liquidation_threshold"]
+        total_debt += borrowed_value
+
+        assets.append({
+            "symbol": reserve["symbol"],
+            "asset": reserve["asset"],
+            "supplied": supplied / unit,
+            "supplied_usd": round(supplied_value, 6),
+            "borrowed": borrowed / unit,
+            "borrowed_usd": round(borrowed_value, 6),
+            "used_as_collateral": use_as_collateral,
+        })
+
+    ltv = weighted_ltv / total_collateral / 10000 if total_collateral else 0.0
+    liquidation_threshold = weighted_threshold / total_collateral / 10000 if total_collateral else 0.0
+    health_factor = (total_collateral * liquidation_threshold / total_debt) if total_debt else None
+    available_borrows = max(total_collateral * ltv - total_debt, 0.0)
+
+    return {
+        "total_collateral_usd": round(total_collateral, 6),
+        "total_debt_usd": round(total_debt, 6),
+        "available_borrows_usd": round(available_borrows, 6),
+        "ltv": round(ltv * 100, 2),
+        "liquidation_threshold": round(liquidation_threshold * 100, 2),
+        "health_factor": round(health_factor, 4) if health_factor is not None else None,
+        "assets": assets,
+    }
+
+def get_user_position(w3, user: str, pool_address: str = AAVE_CONTRACTS["LENDING_POOL"]) -> Dict:
+    """
+    Fetch a user's Aave position with a single multicall.
+
+    The reserve snapshot for the current block is reused across users; when it is
+    not cached yet, reserve and user calls are merged into the same multicall.
+    """
+    from eth_abi import decode
+
+    metadata = get_reserve_metadata(w3, pool_address)
+    block_number = w3.eth.block_number
+    snapshot = _cached_snapshot(pool_address, block_number)
+
+    reserve_calls = [] if snapshot else _reserve_calls(metadata)
+    results = aggregate3(w3, reserve_calls + _user_calls(metadata, user), block_number)
+
+    if not snapshot:
+        snapshot = _decode_snapshot(metadata, results[:len(reserve_calls)], block_number)
+        _cache_snapshot(pool_address, snapshot)
+    results = results[len(reserve_calls):]
+
+    balances = {}
+    for i, reserve in enumerate(metadata["reserves"]):
+        supplied = decode_uint256(results[2 * i][1])
+        borrowed = decode_uint256(results[2 * i + 1][1])
+        balances[reserve["asset"]] = (supplied, borrowed)
+
+    count = len(metadata["reserves"])
+    user_config = decode(["(uint256)"], results[2 * count][1])[0][0]
+    account_data = decode(ACCOUNT_DATA_TYPES, results[2 * count + 1][1])
+
+    position = compute_position(snapshot, metadata["base_currency_unit"], balances, user_config)
+    position["address"] = user
+    position["block_number"] = block_number
+    position["onchain"] = {
+        "total_collateral_usd": account_data[0] / metadata["base_currency_unit"],
+        "total_debt_usd": account_data[1] / metadata["base_currency_unit"],
+        "available_borrows_usd": account_data[2] / metadata["base_currency_unit"],
+        "health_factor": account_data[5] / 10**18 if account_data[1] else None,
+    }
+    position["_balances"] = balances
+    position["_user_config"] = user_config
+    return position
+
+def find_reserve(snapshot: Dict, asset: str) -> Optional[Dict]:
+    """Look up a reserve in a snapshot by asset address."""
+    for reserve in snapshot["reserves"]:
+        if reserve["asset"].lower() == asset.lower():
+            return reserve
+    return None
+
+def available_to_borrow(w3, user: str, asset: str) -> Optional[float]:
+    """Amount of `asset` (in token units) the user can still borrow, or None if unknown."""
+    position = get_user_position(w3, user)
+    snapshot = get_reserve_snapshot(w3, position["block_number"])
+    reserve = find_reserve(snapshot, asset)
+    if not reserve or not reserve["price"]:
+        return None
+    base_unit = _RESERVE_METADATA[AAVE_CONTRACTS["LENDING_POOL"]]["base_currency_unit"]
+    return position["available_borrows_usd"] / (reserve["price"] / base_unit)
+
+def health_factor_after_withdraw(w3, user: str, asset: str, amount_raw: int) -> Dict:
+    """Return the supplied balance of `asset` and the projected health factor after withdrawing `amount_raw`."""
+    position = get_user_position(w3, user)
+    snapshot = get_reserve_snapshot(w3, position["block_number"])
+    balances = dict(position["_balances"])
+    supplied, borrowed = balances.get(asset, (0, 0))
+    withdrawn = supplied if amount_raw >= supplied else amount_raw
+    balances[asset] = (supplied - withdrawn, borrowed)
+    base_unit = _RESERVE_METADATA[AAVE_CONTRACTS["LENDING_POOL"]]["base_currency_unit"]
+    projected = compute_position(snapshot, base_unit, balances, position["_user_config"])
+    return {
+        "supplied_raw": supplied,
+        "health_factor": projected["health_factor"],
+    }
+
+def _public_position(position: Dict) -> Dict:
+    return {k: v for k, v in position.items() if not k.startswith("_")}
+
+def register_aave_reader_tools(mcp: FastMCP):
+    """Register read-only Aave tools with the MCP server."""
+
+    @mcp.tool()
+    async def get_aave_position(address: str, ctx: Context = None) -> str:
+        """
+        Get a user's Aave position: supplied and borrowed assets, health factor, LTV and borrowing power.
+        Note: Only available on Celo mainnet.
+
+        Parameters:
+        - address: The Celo wallet address
+
+        Returns:
+        - Position summary
+        """
+        try:
+            from web3 import Web3
+
+            try:
+                address = Web3.to_checksum_address(address)
+            except:
+                return format_json_response({
+                    "success": False,
+                    "error": f"Invalid address format: {address}"
+                })
+
+            if ctx:
+                ctx.info(f"Fetching Aave position for {address}")
+                await ctx.report_progress(1, 2)
+
+            w3 = contracts.get_web3(AAVE_RPC_URL)
+            position = get_user_position(w3, address)
+
+            if ctx:
+                await ctx.report_progress(2, 2)
+
+            return format_json_response({"success": True, **_public_position(position)})
+
+        except ImportError:
+            return "Web3 library not installed. Please install with: pip3 install web3"
+        except Exception as e:
+            return format_json_response({
+                "success": False,
+                "error": f"Error fetching Aave position: {str(e)}"
+            })
+
+    @mcp.tool()
+    async def get_aave_reserves(ctx: Context = None) -> str:
+        """
+        Get Aave reserve parameters on Celo: prices, LTV, liquidation thresholds and supply/borrow APYs.
+        Note: Only available on Celo mainnet.
+
+        Returns:
+        - Reserve list
+        """
+        try:
+            from web3 import Web3
+
+            if ctx:
+                ctx.info("Fetching Aave reserve data")
+
+            w3 = contracts.get_web3(AAVE_RPC_URL)
+            snapshot = get_reserve_snapshot(w3)
+            base_unit = _RESERVE_METADATA[AAVE_CONTRACTS["LENDING_POOL"]]["base_currency_unit"]
+
+            reserves = [{
+                "symbol": r["symbol"],
+                "asset": r["asset"],
+                "price_usd": r["price"] / base_unit,
+                "ltv": r["ltv"] / 100,
+                "liquidation_threshold": r["liquidation_threshold"] / 100,
+                "supply_apy": round(_rate_to_apy(r["liquidity_rate"]), 4),
+                "variable_borrow_apy": round(_rate_to_apy(r["variable_borrow_rate"]), 4),
+                "borrowing_enabled": r["borrowing_enabled"],
+                "frozen": r["frozen"],
+                "paused": r["paused"],
+            } for r in snapshot["reserves"]]
+
+            return format_json_response({
+                "success": True,
+                "block_number": snapshot["block_number"],
+                "reserve_count": len(reserves),
+                "reserves": reserves
+            })
+
+        except ImportError:
+            return "Web3 library not installed. Please install with: pip3 install web3"
+        except Exception as e:
+            return format_json_response({
+                "success": False,
+                "error": f"Error fetching Aave reserves: {str(e)}"
+            })
@@ -1,118 +1,26 @@
 # tools/aave_session.py - Aave session management
 from mcp.server.fastmcp import FastMCP, Context
 from utils.helpers import format_json_response
+from utils.workers import client_key
+from utils.contracts import ERC20_ABI, LENDING_POOL_ABI, contracts
+from utils.profiles import active_profile
+import secrets
 import time
 from typing import Dict, Optional
 
-# Celo network RPC endpoints
-CELO_NETWORKS = {
-    "mainnet": {
-        "public": "https://forno.celo.org",
-        "alchemy": "https://celo-mainnet.g.alchemy.com/v2/IJbweBVOnwnTeoaIg10-jGVFe8aPfaH5"
-    }
-}
+# Network and Aave deployment the Aave tools target (CELO_MCP_PROFILE; mainnet by default)
+PROFILE = active_profile()
+AAVE_NETWORK = PROFILE["name"]
+AAVE_RPC_URL = PROFILE["rpc_urls"][0]
 
-# Contract addresses - Aave only available on mainnet
-AAVE_CONTRACTS = {
-    "LENDING_POOL": "0x3E59A31363E2ad014dcbc521c4a0d5757d9f3402",  # Aave lending pool
-    "CELO_TOKEN": "0x471EcE3750Da237f93B8E339c536989b8978a438",    # CELO token address
-    "USDC_TOKEN": "0xcebA9300f2b948710d2653dD7B07f33A8B32118C",    # USDC token address
-}
+# On mainnet Alchemy is the primary and forno the fallback
+contracts.register_endpoints(PROFILE["rpc_urls"])
 
-# Explorer URL for transaction tracking
-EXPLORER_URL = "https://celoscan.io/tx/0x"
-
-# ABI for ERC20 tokens
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "payable": False,
-        "stateMutability": "view",
-        "type": "function"
-    },
-    {
-        "constant": False,
-        "inputs": [
-            {"name": "_spender", "type": "address"},
-            {"name": "_value", "type": "uint256"}
-        ],
-        "name": "approve",
-        "outputs": [{"name": "", "type": "bool"}],
-        "payable": False,
-        "stateMutability": "nonpayable",
-        "type": "function"
-    }
-]
+# Contract addresses for the active profile
+AAVE_CONTRACTS = PROFILE["aave"]
 
-# ABI for the LendingPool contract
-LENDING_POOL_ABI = [
-    # Supply function
-    {
-        "inputs": [
-            {"internalType": "address", "name": "asset", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-            {"internalType": "address", "name": "onBehalfOf", "type": "address"},
-            {"internalType": "uint16", "name": "referralCode", "type": "uint16"}
-        ],
-        "name": "supply",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function"
-    },
-    # Withdraw function
-    {
-        "inputs": [
-            {"internalType": "address", "name": "asset", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-            {"internalType": "address", "name": "to", "type": "address"}
-        ],
-        "name": "withdraw",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "nonpayable",
-        "type": "function"
-    },
-    # Set user use reserve as collateral function
-    {
-        "inputs": [
-            {"internalType": "address", "name": "asset", "type": "address"},
-            {"internalType": "bool", "name": "useAsCollateral", "type": "bool"}
-        ],
-        "name": "setUserUseReserveAsCollateral",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function"
-    },
-    # Borrow function
-    {
-        "inputs": [
-            {"internalType": "address", "name": "asset", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-            {"internalType": "uint256", "name": "interestRateMode", "type": "uint256"},
-            {"internalType": "uint16", "name": "referralCode", "type": "uint16"},
-            {"internalType": "address", "name": "onBehalfOf", "type": "address"}
-        ],
-        "name": "borrow",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function"
-    },
-    # Repay function
-    {
-        "inputs": [
-            {"internalType": "address", "name": "asset", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-            {"internalType": "uint256", "name": "interestRateMode", "type": "uint256"},
-            {"internalType": "address", "name": "onBehalfOf", "type": "address"}
-        ],
-        "name": "repay",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "nonpayable",
-        "type": "function"
-    }
-]
+# Explorer URL for transaction tracking
+EXPLORER_URL = PROFILE["explorer_tx_url"]
 
 # Secure session management for temporary private key storage
 class AaveTransactionSession:
@@ -122,58 +30,55 @@ class AaveTransactionSession:
         self.sessions: Dict[str, Dict] = {}
         self.timeout_seconds = timeout_seconds
     
-    def create_session(self, public_address: str) -> str:
-        """Create a new session for a public address, returns session ID"""
-        import hashlib
-        session_id = f"aave_{int(time.time())}_{hashlib.sha256(public_address.encode()).hexdigest()[:8]}"
+    def create_session(self, public_address: str, owner: str = "local") -> str:
+        """Create a new session for a public address, owned by one MCP client; returns session ID"""
+        # Unguessable, since a shared HTTP server holds sessions for many clients
+        session_id = f"aave_{secrets.token_urlsafe(16)}"
         self.sessions[session_id] = {
             "public_address": public_address,
             "created_at": time.time(),
-            "private_key": None
+            "private_key": None,
+            "owner": owner
         }
         return session_id
     
-    def add_private_key(self, session_id: str, private_key: str) -> bool:
+    def add_private_key(self, session_id: str, private_key: str, owner: str = "local") -> bool:
         """Add private key to an existing session"""
-        if session_id not in self.sessions:
-            return False
-        
-        # Check if session is still valid
-        if time.time() - self.sessions[session_id]["created_at"] > self.timeout_seconds:
-            self.clear_session(session_id)
+        session = self.get_session_data(session_id, owner)
+        if session is None:
             return False
             
         # Store private key in memory only
-        self.sessions[session_id]["private_key"] = private_key
+        session["private_key"] = private_key
         return True
     
-    def get_session_data(self, session_id: str) -> Optional[Dict]:
-        """Get session data if session is valid"""
-        if session_id not in self.sessions:
+    def get_session_data(self, session_id: str, owner: str = "local") -> Optional[Dict]:
+        """Get session data if session is valid and belongs to `owner`"""
+        session = self.sessions.get(session_id)
+        if session is None or session["owner"] != owner:
             return None
             
         # Check if session is still valid
-        if time.time() - self.sessions[session_id]["created_at"] > self.timeout_seconds:
+        if time.time() - session["created_at"] > self.timeout_seconds:
             self.clear_session(session_id)
             return None
             
-        return self.sessions[session_id]
+        return session
     
     def clear_session(self, session_id: str) -> None:
         """Explicitly clear session data"""
-        if session_id in self.sessions:
+        # Remove the session (tools now run on worker threads, so pop rather than check-then-delete)
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
             # Explicitly clear private key from memory
-            if self.sessions[session_id]["private_key"]:
-                self.sessions[session_id]["private_key"] = None
-            # Remove the session
-            del self.sessions[session_id]
+            session["private_key"] = None
     
     def clear_expired_sessions(self) -> None:
         """Clear all expired sessions"""
         current_time = time.time()
         expired_sessions = []
         
-        for session_id, session_data in self.sessions.items():
+        for session_id, session_data in list(self.sessions.items()):
             if current_time - session_data["created_at"] > self.timeout_seconds:
                 expired_sessions.append(session_id)
                 
@@ -213,7 +118,7 @@ def register_aave_session_tools(mcp: FastMCP):
                 ctx.info(f"Creating Aave session for address: {address}")
             
             # Create a new session
-            session_id = aave_session.create_session(address)
+            session_id = aave_session.create_session(address, client_key(ctx))
             
             result = {
                 "success": True,
@@ -256,7 +161,7 @@ def register_aave_session_tools(mcp: FastMCP):
                 private_key = f"0x{private_key}"
             
             # Add the private key to the session
-            if not aave_session.add_private_key(session_id, private_key):
+            if not aave_session.add_private_key(session_id, private_key, client_key(ctx)):
                 return format_json_response({
                     "success": False,
                     "error": "Invalid or expired session ID. Please create a new session."
@@ -292,7 +197,7 @@ def register_aave_session_tools(mcp: FastMCP):
                 ctx.info(f"Clearing Aave session: {session_id}")
             
             # Check if the session exists
-            session_data = aave_session.get_session_data(session_id)
+            session_data = aave_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
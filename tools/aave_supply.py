@@ -1,7 +1,12 @@
 # tools/aave_supply.py - Aave supply and withdraw operations
 from mcp.server.fastmcp import FastMCP, Context
 from utils.helpers import format_json_response
-from tools.aave_session import aave_session, CELO_NETWORKS, AAVE_CONTRACTS, EXPLORER_URL, ERC20_ABI, LENDING_POOL_ABI
+from utils.simulation import simulation_failure
+from utils.contracts import contracts
+from utils.deadline import wait_for_receipt
+from utils.workers import client_key
+from tools.aave_session import aave_session, AAVE_NETWORK, AAVE_RPC_URL, AAVE_CONTRACTS, EXPLORER_URL
+from tools.aave_reader import health_factor_after_withdraw
 
 def register_aave_supply_tools(mcp: FastMCP):
     """Register Aave supply and withdraw tools with the MCP server."""
@@ -28,7 +33,7 @@ def register_aave_supply_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 5)
             
             # Get session data
-            session_data = aave_session.get_session_data(session_id)
+            session_data = aave_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -42,17 +47,17 @@ def register_aave_supply_tools(mcp: FastMCP):
                 })
             
             if ctx:
-                ctx.info(f"Connecting to Celo mainnet")
+                ctx.info(f"Connecting to Celo {AAVE_NETWORK}")
                 await ctx.report_progress(2, 5)
             
-            # Connect to Celo mainnet - Aave is only available on mainnet
-            rpc_url = CELO_NETWORKS["mainnet"]["alchemy"]
+            # Connect to the active profile's network (Celo mainnet unless CELO_MCP_PROFILE says otherwise)
+            rpc_url = AAVE_RPC_URL
             
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = contracts.get_web3(rpc_url)
             if not w3.is_connected():
                 return format_json_response({
                     "success": False,
-                    "error": f"Failed to connect to Celo mainnet at {rpc_url}"
+                    "error": f"Failed to connect to Celo {AAVE_NETWORK} at {rpc_url}"
                 })
             
             # Load account from private key
@@ -67,11 +72,11 @@ def register_aave_supply_tools(mcp: FastMCP):
                 await ctx.report_progress(3, 5)
             
             # Create contract instances
-            celo_token = w3.eth.contract(address=AAVE_CONTRACTS["CELO_TOKEN"], abi=ERC20_ABI)
-            lending_pool = w3.eth.contract(address=AAVE_CONTRACTS["LENDING_POOL"], abi=LENDING_POOL_ABI)
+            celo_token = contracts.get_contract(rpc_url, AAVE_CONTRACTS["CELO_TOKEN"], "erc20")
+            lending_pool = contracts.get_contract(rpc_url, AAVE_CONTRACTS["LENDING_POOL"], "lending_pool")
             
             # Check token balance for the wrapped CELO
-            token_balance = celo_token.functions.balanceOf(address).call()
+            token_balance = contracts.call(w3, AAVE_CONTRACTS["CELO_TOKEN"], "erc20", "balanceOf", address)
             
             # Check if we have enough wrapped CELO
             if token_balance < amount_in_wei:
@@ -98,13 +103,17 @@ def register_aave_supply_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, approve_tx, "Approval transaction")
+            if failure:
+                return failure
+            
             # Sign and send the approval transaction
             signed_approve_tx = w3.eth.account.sign_transaction(approve_tx, session_data["private_key"])
             approve_tx_hash = w3.eth.send_raw_transaction(signed_approve_tx.raw_transaction)
             approve_tx_hash_hex = approve_tx_hash.hex()
             
             # Wait for the approval transaction to be mined
-            approve_receipt = w3.eth.wait_for_transaction_receipt(approve_tx_hash)
+            approve_receipt = wait_for_receipt(w3, approve_tx_hash)
             
             if approve_receipt['status'] != 1:
                 return format_json_response({
@@ -132,13 +141,17 @@ def register_aave_supply_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, supply_tx, "Supply transaction")
+            if failure:
+                return failure
+            
             # Sign and send the supply transaction
             signed_supply_tx = w3.eth.account.sign_transaction(supply_tx, session_data["private_key"])
             supply_tx_hash = w3.eth.send_raw_transaction(signed_supply_tx.raw_transaction)
             supply_tx_hash_hex = supply_tx_hash.hex()
             
             # Wait for the supply transaction to be mined
-            supply_receipt = w3.eth.wait_for_transaction_receipt(supply_tx_hash)
+            supply_receipt = wait_for_receipt(w3, supply_tx_hash)
             
             # Clear the session for security
             aave_session.clear_session(session_id)
@@ -146,7 +159,7 @@ def register_aave_supply_tools(mcp: FastMCP):
             if supply_receipt['status'] == 1:
                 result = {
                     "success": True,
-                    "message": f"Successfully supplied {amount} CELO to Aave on Celo mainnet! You received aCELO tokens in return, representing your deposit position.",
+                    "message": f"Successfully supplied {amount} CELO to Aave on Celo {AAVE_NETWORK}! You received aCELO tokens in return, representing your deposit position.",
                     "transaction_hash": supply_tx_hash_hex,
                     "explorer_url": f"{EXPLORER_URL}{supply_tx_hash_hex}",
                     "amount": amount,
@@ -196,7 +209,7 @@ def register_aave_supply_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 3)
             
             # Get session data
-            session_data = aave_session.get_session_data(session_id)
+            session_data = aave_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -210,17 +223,17 @@ def register_aave_supply_tools(mcp: FastMCP):
                 })
             
             if ctx:
-                ctx.info(f"Connecting to Celo mainnet and preparing withdrawal")
+                ctx.info(f"Connecting to Celo {AAVE_NETWORK} and preparing withdrawal")
                 await ctx.report_progress(2, 3)
             
-            # Connect to Celo mainnet - Aave is only available on mainnet
-            rpc_url = CELO_NETWORKS["mainnet"]["alchemy"]
+            # Connect to the active profile's network (Celo mainnet unless CELO_MCP_PROFILE says otherwise)
+            rpc_url = AAVE_RPC_URL
             
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = contracts.get_web3(rpc_url)
             if not w3.is_connected():
                 return format_json_response({
                     "success": False,
-                    "error": f"Failed to connect to Celo mainnet at {rpc_url}"
+                    "error": f"Failed to connect to Celo {AAVE_NETWORK} at {rpc_url}"
                 })
             
             # Load account from private key
@@ -228,7 +241,7 @@ def register_aave_supply_tools(mcp: FastMCP):
             address = account.address
             
             # Create lending pool contract instance
-            lending_pool = w3.eth.contract(address=AAVE_CONTRACTS["LENDING_POOL"], abi=LENDING_POOL_ABI)
+            lending_pool = contracts.get_contract(rpc_url, AAVE_CONTRACTS["LENDING_POOL"], "lending_pool")
             
             # For withdrawing all, use uint256 max value
             if amount == 0:
@@ -236,6 +249,29 @@ def register_aave_supply_tools(mcp: FastMCP):
             else:
                 amount_in_wei = w3.to_wei(amount, 'ether')
             
+            # Check the supplied balance and resulting health factor before sending anything
+            try:
+                projection = health_factor_after_withdraw(w3, address, AAVE_CONTRACTS["CELO_TOKEN"], amount_in_wei)
+            except Exception:
+                projection = None
+            
+            if projection:
+                if projection["supplied_raw"] == 0:
+                    return format_json_response({
+                        "success": False,
+                        "error": "No CELO supplied to Aave to withdraw"
+                    })
+                if amount != 0 and amount_in_wei > projection["supplied_raw"]:
+                    return format_json_response({
+                        "success": False,
+                        "error": f"Not enough CELO supplied. Have {w3.from_wei(projection['supplied_raw'], 'ether')} CELO in Aave, trying to withdraw {amount} CELO"
+                    })
+                if projection["health_factor"] is not None and projection["health_factor"] < 1:
+                    return format_json_response({
+                        "success": False,
+                        "error": f"Withdrawal would drop your health factor to {projection['health_factor']} and make the position liquidatable. Repay debt or withdraw less."
+                    })
+            
             if ctx:
                 ctx.info(f"Withdrawing CELO from Aave")
                 await ctx.report_progress(3, 3)
@@ -253,22 +289,26 @@ def register_aave_supply_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, withdraw_tx, "Withdrawal transaction")
+            if failure:
+                return failure
+            
             # Sign and send the withdraw transaction
             signed_withdraw_tx = w3.eth.account.sign_transaction(withdraw_tx, session_data["private_key"])
             withdraw_tx_hash = w3.eth.send_raw_transaction(signed_withdraw_tx.raw_transaction)
             withdraw_tx_hash_hex = withdraw_tx_hash.hex()
             
             # Wait for the withdrawal transaction to be mined
-            withdraw_receipt = w3.eth.wait_for_transaction_receipt(withdraw_tx_hash)
+            withdraw_receipt = wait_for_receipt(w3, withdraw_tx_hash)
             
             # Clear the session for security
             aave_session.clear_session(session_id)
             
             if withdraw_receipt['status'] == 1:
                 if amount == 0:
-                    message = "Successfully withdrew all CELO from Aave on Celo mainnet! Your aCELO tokens have been returned in exchange for CELO."
+                    message = f"Successfully withdrew all CELO from Aave on Celo {AAVE_NETWORK}! Your aCELO tokens have been returned in exchange for CELO."
                 else:
-                    message = f"Successfully withdrew {amount} CELO from Aave on Celo mainnet! Your aCELO tokens have been returned in exchange for CELO."
+                    message = f"Successfully withdrew {amount} CELO from Aave on Celo {AAVE_NETWORK}! Your aCELO tokens have been returned in exchange for CELO."
                 
                 result = {
                     "success": True,
@@ -1,20 +1,30 @@
 # tools/celo_reader.py - Celo blockchain read operations
 from mcp.server.fastmcp import FastMCP, Context
 from utils.helpers import format_json_response
-from datetime import datetime
-import json
-
-# Contract ABI for ERC-20 tokens
-ERC20_ABI = json.loads('''[
-    {"constant":true,"inputs":[{"name":"_owner","type":"address"}],"name":"balanceOf","outputs":[{"name":"balance","type":"uint256"}],"type":"function"},
-    {"constant":true,"inputs":[],"name":"symbol","outputs":[{"name":"","type":"string"}],"type":"function"},
-    {"constant":true,"inputs":[],"name":"decimals","outputs":[{"name":"","type":"uint8"}],"type":"function"}
-]''')
+from utils.contracts import ERC20_ABI, contracts
+from utils.subscriptions import find_subscription_service
+from utils.logs import get_transfer_logs, topic_address
+from utils.multicall import aggregate3, GET_ETH_BALANCE_SELECTOR, GET_CURRENT_BLOCK_TIMESTAMP_SELECTOR, MULTICALL3_ADDRESS
+from utils.calldata import encode_balance_of, decode_uint256, WORD
+from utils.block_index import get_block_index
+from utils.address_labels import get_address_labels
+from utils.receipts import get_receipts
+from utils.bloom import BloomPrefilter, get_address_blooms, transaction_bloom
+from utils.raw_blocks import fetch_block
+from utils.scan_state import decode_cursor, encode_cursor, scan_states
+from utils.metrics import propagate_context
+from utils.deadline import DEFAULT_TOOL_TIMEOUT, DeadlineExceeded, deadline
+from tools.celo_writer import CELO_NETWORKS
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
 
 # Network configurations
 NETWORKS = {
     "mainnet": {
         "rpc_url": "https://forno.celo.org",
+        "ws_url": "wss://forno.celo.org/ws",
         "block_explorer": "https://explorer.celo.org",
         "contracts": {
             "CELO": "0x471EcE3750Da237f93B8E339c536989b8978a438",
@@ -24,6 +34,7 @@ NETWORKS = {
     },
     "alfajores": {
         "rpc_url": "https://alfajores-forno.celo-testnet.org",
+        "ws_url": "wss://alfajores-forno.celo-testnet.org/ws",
         "block_explorer": "https://alfajores.celoscan.io",
         "contracts": {
             "CELO": "0xF194afDf50B03e69Bd7D057c1Aa9e10c9954E4C9",
@@ -33,6 +44,75 @@ NETWORKS = {
     }
 }
 
+_INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+def _parse_time(value: str) -> int:
+    """Unix seconds from a unix timestamp or an ISO 8601 date/datetime (UTC if no offset)."""
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def _parse_interval(value: str) -> int:
+    """Seconds from '1d', '6h', '30m', '1w' or a bare number of seconds."""
+    value = value.strip().lower()
+    if value[-1:] in _INTERVAL_UNITS:
+        return int(float(value[:-1]) * _INTERVAL_UNITS[value[-1]])
+    return int(value)
+
+def _parse_since(value: str) -> int:
+    """Unix seconds from an absolute time (see _parse_time) or a relative age such as '24h' or '7d'."""
+    value = value.strip()
+    # Units are matched case-insensitively; ISO strings keep their case ('T', 'Z')
+    age = value.lower()
+    if age[:-1].replace(".", "", 1).isdigit() and age[-1:] in _INTERVAL_UNITS:
+        return int(datetime.now(timezone.utc).timestamp()) - _parse_interval(age)
+    return _parse_time(value)
+
+def _balances_at_block(w3, block_number: int, addresses: List[str], tokens: List[Optional[str]]):
+    """
+    Balances of every (address, token) pair at one block, plus the block timestamp.
+
+    `tokens` holds ERC-20 addresses, or None for the native CELO balance. Uses a
+    single Multicall3 call; blocks before Multicall3 was deployed fall back to
+    individual calls.
+    """
+    calls = [(MULTICALL3_ADDRESS, GET_CURRENT_BLOCK_TIMESTAMP_SELECTOR, False)]
+    for address in addresses:
+        for token in tokens:
+            if token is None:
+                calls.append((MULTICALL3_ADDRESS, GET_ETH_BALANCE_SELECTOR + bytes(12) + bytes.fromhex(address[2:]), True))
+            else:
+                calls.append((token, bytes(encode_balance_of(address)), True))
+    try:
+        results = aggregate3(w3, calls, block_number)
+        timestamp = decode_uint256(results[0][1])
+        values = [decode_uint256(data) if ok and len(data) >= WORD else None for ok, data in results[1:]]
+        return timestamp, values
+    except DeadlineExceeded:
+        # Out of time or cancelled: stop rather than retry call by call
+        raise
+    except Exception:
+        pass
+
+    timestamp = w3.eth.get_block(block_number)["timestamp"]
+    values = []
+    for address in addresses:
+        for token in tokens:
+            try:
+                if token is None:
+                    values.append(w3.eth.get_balance(address, block_identifier=block_number))
+                else:
+                    values.append(contracts.call(w3, token, "erc20", "balanceOf", address, block_identifier=block_number))
+            except DeadlineExceeded:
+                raise
+            except Exception:
+                values.append(None)
+    return timestamp, values
+
 def register_celo_reader_tools(mcp: FastMCP):
     """Register all Celo read operation tools with the MCP server."""
     
@@ -61,7 +141,7 @@ def register_celo_reader_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 4)
             
             # Connect to Celo network
-            w3 = Web3(Web3.HTTPProvider(network_config["rpc_url"]))
+            w3 = contracts.get_web3(network_config["rpc_url"])
             
             # Validate address
             try:
@@ -87,24 +167,18 @@ def register_celo_reader_tools(mcp: FastMCP):
             
             # Get cUSD balance
             try:
-                cusd_contract = w3.eth.contract(
-                    address=Web3.to_checksum_address(network_config["contracts"]["CUSD"]),
-                    abi=ERC20_ABI
-                )
-                cusd_balance = cusd_contract.functions.balanceOf(address).call()
-                cusd_decimals = cusd_contract.functions.decimals().call()
+                cusd_address = network_config["contracts"]["CUSD"]
+                cusd_balance = contracts.call(w3, cusd_address, "erc20", "balanceOf", address)
+                cusd_decimals = contracts.call(w3, cusd_address, "erc20", "decimals")
                 result["cUSD"] = float(cusd_balance) / 10**cusd_decimals
             except Exception as e:
                 result["cUSD_error"] = str(e)
             
             # Get cEUR balance
             try:
-                ceur_contract = w3.eth.contract(
-                    address=Web3.to_checksum_address(network_config["contracts"]["CEUR"]),
-                    abi=ERC20_ABI
-                )
-                ceur_balance = ceur_contract.functions.balanceOf(address).call()
-                ceur_decimals = ceur_contract.functions.decimals().call()
+                ceur_address = network_config["contracts"]["CEUR"]
+                ceur_balance = contracts.call(w3, ceur_address, "erc20", "balanceOf", address)
+                ceur_decimals = contracts.call(w3, ceur_address, "erc20", "decimals")
                 result["cEUR"] = float(ceur_balance) / 10**ceur_decimals
             except Exception as e:
                 result["cEUR_error"] = str(e)
@@ -125,7 +199,7 @@ def register_celo_reader_tools(mcp: FastMCP):
             return f"Error checking balances: {str(e)}"
     
     @mcp.tool()
-    async def get_celo_transactions(address: str, blocks_to_scan: int = 100, max_count: int = 10, network: str = "mainnet", ctx: Context = None) -> str:
+    async def get_celo_transactions(address: str, blocks_to_scan: int = 100, max_count: int = 10, network: str = "mainnet", since: str = "", timeout_seconds: float = 60, bloom_prefilter: bool = False, cursor: str = "", ctx: Context = None) -> str:
         """
         Get recent transactions for a Celo address.
         
@@ -134,9 +208,19 @@ def register_celo_reader_tools(mcp: FastMCP):
         - blocks_to_scan: Number of recent blocks to scan (default: 100)
         - max_count: Maximum number of transactions to return (default: 10)
         - network: 'mainnet' or 'alfajores' (testnet)
+        - since: Only scan blocks after this time, as ISO 8601, unix seconds or a relative age like '24h' (replaces blocks_to_scan)
+        - timeout_seconds: Stop scanning after this long and return what was found so far (default: 60; must be
+          positive, and is capped at the server's tool timeout, CELO_MCP_TOOL_TIMEOUT)
+        - bloom_prefilter: Fetch headers first and download only blocks whose logsBloom (or an earlier download)
+          shows activity for the address. Much less data for quiet addresses, but can miss transactions that emit
+          no log naming the address, such as plain CELO transfers (default: false)
+        - cursor: next_cursor from an earlier call, to continue that scan exactly where it stopped; the block range,
+          since and bloom_prefilter come from the cursor and blocks_to_scan is ignored
         
         Returns:
-        - Recent transactions list
+        - Recent transactions list; each `to` is tagged with to_kind (eoa, contract or contract_creation)
+          and, for known Celo tokens and protocols, to_label and to_category
+        - next_cursor: pass as `cursor` for the next page of older transactions; null once the range is exhausted
         """
         try:
             from web3 import Web3
@@ -150,6 +234,12 @@ def register_celo_reader_tools(mcp: FastMCP):
             if max_count < 1 or max_count > 50:
                 return "max_count must be between 1 and 50"
             
+            # Also rejects NaN; a longer scan than the call itself may run is cut to the server's limit
+            if not timeout_seconds > 0:
+                return format_json_response({"success": False, "error": "timeout_seconds must be positive"})
+            if DEFAULT_TOOL_TIMEOUT > 0:
+                timeout_seconds = min(timeout_seconds, DEFAULT_TOOL_TIMEOUT)
+            
             network_config = NETWORKS[network.lower()]
             
             if ctx:
@@ -157,7 +247,7 @@ def register_celo_reader_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 3)
             
             # Connect to Celo network
-            w3 = Web3(Web3.HTTPProvider(network_config["rpc_url"]))
+            w3 = contracts.get_web3(network_config["rpc_url"])
             
             # Validate address
             try:
@@ -165,50 +255,168 @@ def register_celo_reader_tools(mcp: FastMCP):
             except:
                 return f"Invalid address format: {address}"
             
+            # A cursor continues an earlier scan of the same address (see utils/scan_state.py)
+            page = None
+            if cursor:
+                try:
+                    page = decode_cursor(cursor)
+                    if page["network"] != network.lower() or page["address"] != address.lower():
+                        return "Invalid cursor: it continues a scan of another address or network"
+                    missing = {"since", "prefilter", "index", "hash", "state"} - set(page)
+                    if missing:
+                        raise ValueError(f"missing {', '.join(sorted(missing))}")
+                    if not page["lowest"] <= page["block"] <= page["latest"] < page["lowest"] + 1000 or page["index"] < 0:
+                        raise ValueError("block range out of bounds")
+                except (KeyError, TypeError, ValueError) as e:
+                    return f"Invalid cursor: {e}"
+            
             # Get most recent block number
             try:
-                latest_block = w3.eth.block_number
+                since_block = None
+                if page is not None:
+                    latest_block, since_block = page["latest"], page["since"]
+                    top = page["block"]
+                    blocks_to_scan = top - page["lowest"] + 1
+                    bloom_prefilter = page["prefilter"]
+                else:
+                    latest_block = top = w3.eth.block_number
+                
+                # Resolve `since` to a block range through the persistent header index
+                if since and page is None:
+                    try:
+                        since_ts = _parse_since(since)
+                    except ValueError as e:
+                        return f"Invalid since value: {e}"
+                    since_block = get_block_index(network.lower()).block_at(w3, since_ts, latest_block) + 1
+                    blocks_to_scan = latest_block - since_block + 1
+                    if blocks_to_scan > 1000:
+                        return (f"since covers {blocks_to_scan} blocks; block scans are limited to 1000 blocks. "
+                                "Use get_token_transfers for longer ranges.")
+                    if blocks_to_scan < 1:
+                        blocks_to_scan = 0
                 
                 if ctx:
-                    ctx.info(f"Scanning the last {blocks_to_scan} blocks for transactions (current block: {latest_block})")
+                    if page is not None:
+                        ctx.info(f"Continuing the scan at block {top} ({blocks_to_scan} blocks left)")
+                    else:
+                        ctx.info(f"Scanning the last {blocks_to_scan} blocks for transactions (current block: {latest_block})")
                     await ctx.report_progress(2, 3)
                 
                 # Limit blocks to scan to what was requested
-                scan_blocks = min(blocks_to_scan, latest_block)
+                scan_blocks = min(blocks_to_scan, top)
                 
                 transactions = []
                 tx_count = 0
+                source = "block_scan"
+                
+                # Watched addresses are answered from the subscription buffer instead of scanning
+                watcher = find_subscription_service(network.lower())
+                if page is None and watcher and watcher.is_watched(address) and watcher.covers(address, latest_block - scan_blocks + 1, latest_block):
+                    source = "subscription"
+                    recorded = [e for e in watcher.recent_activity(address, watcher.buffer_size)
+                                if e["type"] == "transaction" and latest_block - scan_blocks < e["block_number"] <= latest_block]
+                    # One receipts call per block with activity
+                    by_block = {}
+                    for entry in recorded[:max_count]:
+                        by_block.setdefault(entry["block_number"], []).append(entry)
+                    receipts = {}
+                    for block_number, entries in by_block.items():
+                        fetched = get_receipts(w3, block_number, [entry["hash"] for entry in entries])
+                        receipts.update(zip((entry["hash"] for entry in entries), fetched))
+                    for entry in recorded[:max_count]:
+                        receipt = receipts.get(entry["hash"])
+                        if receipt is not None:
+                            tx_status = "Success" if receipt.get('status') == 1 else "Failed"
+                            gas_used = receipt.get('gasUsed', 0)
+                            created = receipt.get('contractAddress')
+                        else:
+                            tx_status = "Unknown"
+                            gas_used = None
+                            created = None
+                        transactions.append({
+                            "hash": entry["hash"],
+                            "block_number": entry["block_number"],
+                            "from": entry["from"],
+                            "to": entry["to"] or "Contract Creation",
+                            "contract_address": created,
+                            "value": float(w3.from_wei(int(entry["value_wei"]), "ether")),
+                            "timestamp": datetime.fromtimestamp(entry["timestamp"]).isoformat(),
+                            "gas_used": gas_used,
+                            "status": tx_status,
+                            "tx_explorer_url": f"{network_config['block_explorer']}/tx/{entry['hash']}"
+                        })
                 
-                # Loop through recent blocks
-                for block_num in range(latest_block, latest_block - scan_blocks, -1):
-                    if tx_count >= max_count:
-                        break
+                # Scanned headers feed the timestamp index for later time-range queries
+                block_index = get_block_index(network.lower())
+                # Senders/recipients of downloaded blocks, so later prefiltered scans can skip them exactly
+                address_blooms = get_address_blooms(network.lower())
+                # What the previous page left behind: its prefilter headers and a part-returned block
+                state = (scan_states.take(page["state"]) if page is not None else None) or {}
+                prefilter = state.get("prefilter")
+                if prefilter is None and bloom_prefilter and source == "block_scan":
+                    prefilter = BloomPrefilter(w3, address, top - scan_blocks + 1, address_blooms,
+                                               on_header=lambda h: block_index.add(h['number'], h['timestamp'], h.get('hash')))
+                
+                # Loop through recent blocks, stopping early (with partial results) at the time limit.
+                # `resume` is where a next page starts: (block, tx position, parsed block if kept, block hash)
+                blocks_done = 0
+                stopped = None
+                resume = None
+                # A subscription answer covers the whole range already (see covers()); nothing to scan or resume
+                blocks = range(top, top - scan_blocks, -1) if source == "block_scan" else range(0)
+                with deadline(timeout_seconds):
+                    for block_num in blocks:
+                        if tx_count >= max_count:
+                            resume = (block_num, 0, None, None)
+                            break
+                        # The previous page may have stopped partway through its last block
+                        start = page["index"] if page is not None and block_num == top else 0
+                        kept = state.get("block") if block_num == top else None
                     
-                    try:
-                        block = w3.eth.get_block(block_num, full_transactions=True)
+                        try:
+                            if prefilter is not None and not start and not prefilter.is_candidate(block_num):
+                                blocks_done += 1
+                                continue
+                            # Parsed without web3's per-transaction formatting; only matches are formatted
+                            raw_block = kept or fetch_block(w3, block_num)
+                            block = raw_block.header()
+                            if start and Web3.to_hex(block['hash']) != page["hash"]:
+                                # Reorged since the previous page: positions refer to another block
+                                start = 0
+                            block_index.add(block_num, block['timestamp'], block.get('hash'))
+                            address_blooms.add(block_num, block['hash'], transaction_bloom(raw_block.transactions))
+                            blocks_done += 1
                         
-                        for tx in block['transactions']:
-                            # Check if the transaction involves our address
-                            if (tx.get('from', '').lower() == address.lower() or 
-                                tx.get('to', '').lower() == address.lower()):
-                                
+                            # Transactions involving our address; receipts are fetched only for blocks with matches,
+                            # in one call per block (see utils/receipts.py)
+                            positions = raw_block.involving(address, start)
+                            if len(positions) > max_count - tx_count:
+                                # The rest of this block's matches go to the next page
+                                resume = (block_num, positions[max_count - tx_count], raw_block, Web3.to_hex(block['hash']))
+                                positions = positions[:max_count - tx_count]
+                            matches = [raw_block.materialize(position) for position in positions]
+                            receipts = get_receipts(w3, block_num, [tx['hash'] for tx in matches])
+                        
+                            for tx, receipt in zip(matches, receipts):
                                 tx_count += 1
                                 
                                 # Get transaction status
-                                try:
-                                    receipt = w3.eth.get_transaction_receipt(tx['hash'])
+                                if receipt is not None:
                                     tx_status = "Success" if receipt.get('status') == 1 else "Failed"
                                     gas_used = receipt.get('gasUsed', 0)
-                                except:
+                                    created = receipt.get('contractAddress')
+                                else:
                                     tx_status = "Unknown"
                                     gas_used = None
+                                    created = None
                                 
                                 # Format transaction data
                                 tx_data = {
                                     "hash": tx['hash'].hex(),
-                                    "block_number": tx['blockNumber'],
+                                    "block_number": block_num,
                                     "from": tx.get('from', 'Unknown'),
-                                    "to": tx.get('to', 'Contract Creation'),
+                                    "to": tx.get('to') or 'Contract Creation',
+                                    "contract_address": created,
                                     "value": float(w3.from_wei(tx.get('value', 0), "ether")),
                                     "timestamp": datetime.fromtimestamp(block['timestamp']).isoformat(),
                                     "gas_used": gas_used,
@@ -217,13 +425,36 @@ def register_celo_reader_tools(mcp: FastMCP):
                                 }
                                 
                                 transactions.append(tx_data)
-                                
-                                if tx_count >= max_count:
-                                    break
-                    except Exception as e:
-                        if ctx:
-                            ctx.info(f"Error processing block {block_num}: {e}")
+                            if resume is not None:
+                                break
+                        except DeadlineExceeded as e:
+                            stopped = e
+                            resume = (block_num, start, kept, page["hash"] if start else None)
+                            break
+                        except Exception as e:
+                            if ctx:
+                                ctx.info(f"Error processing block {block_num}: {e}")
+                            continue
+                
+                # Label counterparties in bulk: known protocols from the bundled table,
+                # EOA vs contract from the persistent cache or one batched eth_getCode
+                try:
+                    labels = get_address_labels(network.lower()).classify(
+                        w3, [tx["to"] for tx in transactions if tx["to"] != "Contract Creation"])
+                except Exception as e:
+                    labels = {}
+                    if ctx:
+                        ctx.info(f"Could not classify addresses: {e}")
+                for tx in transactions:
+                    if tx["to"] == "Contract Creation":
+                        tx["to_kind"] = "contract_creation"
                         continue
+                    tx.pop("contract_address")
+                    label = labels.get(tx["to"].lower(), {})
+                    tx["to_kind"] = label.get("kind", "unknown")
+                    if "name" in label:
+                        tx["to_label"] = label["name"]
+                        tx["to_category"] = label["category"]
                 
                 if ctx:
                     await ctx.report_progress(3, 3)
@@ -234,10 +465,31 @@ def register_celo_reader_tools(mcp: FastMCP):
                     "network": network,
                     "latest_block": latest_block,
                     "blocks_scanned": scan_blocks,
+                    "since_block": since_block,
+                    "source": source,
                     "transactions_found": len(transactions),
                     "transactions": transactions,
                     "block_explorer_url": f"{network_config['block_explorer']}/address/{address}"
                 }
+                if prefilter is not None:
+                    result["prefilter"] = prefilter.stats()
+                
+                # The cursor alone is enough to resume; the kept state only saves refetching
+                result["next_cursor"] = None
+                if resume is not None:
+                    resume_block, resume_index, kept, resume_hash = resume
+                    state_id = scan_states.put({"prefilter": prefilter, "block": kept}) \
+                        if prefilter is not None or kept is not None else None
+                    result["next_cursor"] = encode_cursor({
+                        "network": network.lower(), "address": address.lower(), "latest": latest_block,
+                        "since": since_block, "lowest": top - scan_blocks + 1, "prefilter": prefilter is not None,
+                        "block": resume_block, "index": resume_index, "hash": resume_hash, "state": state_id})
+                    result["blocks_scanned"] = blocks_done
+                if stopped is not None:
+                    result["blocks_scanned"] = blocks_done
+                    result["partial"] = True
+                    result["message"] = (f"{'Cancelled' if stopped.cancelled else 'Time limit reached'}: "
+                                         f"scanned {blocks_done} of {scan_blocks} blocks; pass next_cursor to continue")
                 
                 return format_json_response(result)
                 
@@ -249,6 +501,261 @@ def register_celo_reader_tools(mcp: FastMCP):
         except Exception as e:
             return f"Error getting transaction history: {str(e)}"
     
+    @mcp.tool()
+    async def get_token_transfers(address: str, blocks_to_scan: int = 100000, tokens: str = "", max_count: int = 50, network: str = "mainnet", ctx: Context = None) -> str:
+        """
+        Get ERC-20 token transfers sent or received by a Celo address, including transfers made through contracts.
+        
+        Parameters:
+        - address: The Celo wallet address
+        - blocks_to_scan: Number of recent blocks to search (default: 100000, max: 5000000)
+        - tokens: Comma-separated token symbols (CELO, CUSD, CEUR) or contract addresses; empty for all tokens
+        - max_count: Maximum number of transfers to return, newest first (default: 50)
+        - network: 'mainnet' or 'alfajores' (testnet)
+        
+        Returns:
+        - Token transfer list
+        """
+        try:
+            from web3 import Web3
+            
+            if network.lower() not in NETWORKS:
+                return f"Invalid network: {network}. Choose 'mainnet' or 'alfajores'."
+            
+            if blocks_to_scan < 1 or blocks_to_scan > 5000000:
+                return "blocks_to_scan must be between 1 and 5000000"
+            
+            if max_count < 1 or max_count > 500:
+                return "max_count must be between 1 and 500"
+            
+            network_config = NETWORKS[network.lower()]
+            w3 = contracts.get_web3(network_config["rpc_url"])
+            
+            # Validate address
+            try:
+                address = Web3.to_checksum_address(address)
+            except:
+                return f"Invalid address format: {address}"
+            
+            # Resolve token filter to contract addresses
+            symbols = {Web3.to_checksum_address(a): name for name, a in network_config["contracts"].items()}
+            token_addresses = []
+            for token in filter(None, (t.strip() for t in tokens.split(","))):
+                if token.upper() in network_config["contracts"]:
+                    token_addresses.append(Web3.to_checksum_address(network_config["contracts"][token.upper()]))
+                else:
+                    try:
+                        token_addresses.append(Web3.to_checksum_address(token))
+                    except:
+                        return f"Unknown token: {token}"
+            
+            latest_block = w3.eth.block_number
+            from_block = max(0, latest_block - blocks_to_scan + 1)
+            
+            if ctx:
+                ctx.info(f"Querying Transfer logs for blocks {from_block}-{latest_block}")
+                await ctx.report_progress(1, 3)
+            
+            stats = {}
+            logs = await asyncio.to_thread(get_transfer_logs, w3, address, from_block, latest_block,
+                                           token_addresses or None, stats=stats)
+            
+            if ctx:
+                await ctx.report_progress(2, 3)
+            
+            # Newest first; only the returned transfers need block timestamps
+            selected = logs[::-1][:max_count]
+            block_numbers = sorted({log["blockNumber"] for log in selected})
+            blocks = await asyncio.gather(*(asyncio.to_thread(w3.eth.get_block, n) for n in block_numbers))
+            timestamps = {n: b["timestamp"] for n, b in zip(block_numbers, blocks)}
+            
+            decimals = {}
+            transfers = []
+            for log in selected:
+                token = Web3.to_checksum_address(log["address"])
+                if token not in decimals:
+                    try:
+                        decimals[token] = contracts.call(w3, token, "erc20", "decimals")
+                    except Exception:
+                        decimals[token] = None
+                sender = Web3.to_checksum_address(topic_address(log["topics"][1]))
+                recipient = Web3.to_checksum_address(topic_address(log["topics"][2]))
+                raw_value = int.from_bytes(bytes(log["data"]), "big") if log["data"] else 0
+                tx_hash = "0x" + bytes(log["transactionHash"]).hex()
+                transfers.append({
+                    "hash": tx_hash,
+                    "block_number": log["blockNumber"],
+                    "timestamp": datetime.fromtimestamp(timestamps[log["blockNumber"]]).isoformat(),
+                    "token": symbols.get(token, token),
+                    "token_address": token,
+                    "direction": "self" if sender == recipient else ("out" if sender == address else "in"),
+                    "from": sender,
+                    "to": recipient,
+                    "value": raw_value / 10**decimals[token] if decimals[token] is not None else None,
+                    "value_raw": str(raw_value),
+                    "tx_explorer_url": f"{network_config['block_explorer']}/tx/{tx_hash}"
+                })
+            
+            if ctx:
+                await ctx.report_progress(3, 3)
+            
+            result = {
+                "address": address,
+                "network": network,
+                "from_block": from_block,
+                "to_block": latest_block,
+                "rpc_calls": stats.get("calls"),
+                "range_splits": stats.get("splits"),
+                "transfers_found": len(logs),
+                "transfers": transfers,
+                "block_explorer_url": f"{network_config['block_explorer']}/address/{address}"
+            }
+            
+            return format_json_response(result)
+            
+        except ImportError:
+            return "Web3 library not installed. Please install with: pip3 install web3"
+        except Exception as e:
+            return f"Error getting token transfers: {str(e)}"
+    
+    @mcp.tool()
+    async def get_balance_history(addresses: str, tokens: str = "CELO,CUSD,CEUR", from_time: str = "", to_time: str = "", interval: str = "1d",
+                                  from_block: int = 0, to_block: int = 0, block_step: int = 0, network: str = "mainnet", ctx: Context = None) -> str:
+        """
+        Get historical token balances for one or more addresses as a time series.
+        
+        Parameters:
+        - addresses: Comma-separated Celo addresses (up to 50)
+        - tokens: Comma-separated token symbols (CELO, CUSD, CEUR) or ERC-20 contract addresses
+        - from_time: Start time as ISO 8601 (e.g. '2025-01-01') or unix seconds; use either times or blocks
+        - to_time: End time (default: now)
+        - interval: Time between points, e.g. '1d', '6h', '1w' (default: '1d')
+        - from_block / to_block / block_step: Block range and step, used when from_time is empty
+        - network: 'mainnet' or 'alfajores' (testnet)
+        
+        Returns:
+        - Columnar series: one list of block numbers, one of timestamps and one balance list per address and token
+        """
+        try:
+            from web3 import Web3
+            
+            if network.lower() not in NETWORKS:
+                return f"Invalid network: {network}. Choose 'mainnet' or 'alfajores'."
+            
+            network_config = NETWORKS[network.lower()]
+            
+            # Validate addresses and tokens
+            try:
+                address_list = [Web3.to_checksum_address(a.strip()) for a in addresses.split(",") if a.strip()]
+            except:
+                return f"Invalid address format in: {addresses}"
+            if not address_list or len(address_list) > 50:
+                return "Provide between 1 and 50 addresses"
+            
+            token_symbols, token_addresses = [], []
+            for token in filter(None, (t.strip() for t in tokens.split(","))):
+                if token.upper() == "CELO":
+                    token_symbols.append("CELO")
+                    token_addresses.append(None)
+                elif token.upper() in network_config["contracts"]:
+                    token_symbols.append({"CUSD": "cUSD", "CEUR": "cEUR"}.get(token.upper(), token.upper()))
+                    token_addresses.append(Web3.to_checksum_address(network_config["contracts"][token.upper()]))
+                else:
+                    try:
+                        token_addresses.append(Web3.to_checksum_address(token))
+                        token_symbols.append(token_addresses[-1])
+                    except:
+                        return f"Unknown token: {token}"
+            if not token_addresses:
+                return "Provide at least one token"
+            
+            # Archive reads (historical balances) go to the Alchemy endpoint first; forno only keeps recent state
+            w3 = contracts.get_web3(CELO_NETWORKS[network.lower()]["alchemy"])
+            latest_block = w3.eth.block_number
+            index = get_block_index(network.lower())
+            
+            if ctx:
+                ctx.info("Resolving sample blocks")
+                await ctx.report_progress(1, 3)
+            
+            # Resolve the sample points to block numbers
+            if from_time:
+                try:
+                    start = _parse_time(from_time)
+                    end = _parse_time(to_time) if to_time else int(datetime.now(timezone.utc).timestamp())
+                    step = _parse_interval(interval)
+                except ValueError as e:
+                    return f"Invalid time range: {e}"
+                if step <= 0 or end < start:
+                    return "interval must be positive and to_time must not precede from_time"
+                targets = list(range(start, end + 1, step))
+                if len(targets) > 1000:
+                    return f"Too many points ({len(targets)}); use a larger interval (max 1000 points)"
+                blocks = await asyncio.to_thread(lambda: [index.block_at(w3, t, latest_block) for t in targets])
+            else:
+                end_block = to_block or latest_block
+                if from_block < 0 or end_block > latest_block or end_block < from_block or block_step < 0:
+                    return f"Invalid block range: {from_block}-{end_block} (latest block: {latest_block})"
+                step = block_step or max(1, (end_block - from_block) // 100)
+                blocks = list(range(from_block, end_block + 1, step))
+                if len(blocks) > 1000:
+                    return f"Too many points ({len(blocks)}); use a larger block_step (max 1000 points)"
+            
+            # Several timestamps can resolve to the same block; fetch each block once
+            unique_blocks = sorted(set(blocks))
+            
+            if ctx:
+                ctx.info(f"Fetching balances at {len(unique_blocks)} blocks")
+                await ctx.report_progress(2, 3)
+            
+            def fetch_all():
+                with ThreadPoolExecutor(max_workers=8) as pool:
+                    return dict(zip(unique_blocks, pool.map(
+                        propagate_context(lambda n: _balances_at_block(w3, n, address_list, token_addresses)), unique_blocks)))
+            snapshots = await asyncio.to_thread(fetch_all)
+            for number, (timestamp, _) in snapshots.items():
+                index.add(number, timestamp)
+            
+            # Token decimals (CELO is always 18)
+            decimals = []
+            for token in token_addresses:
+                try:
+                    decimals.append(18 if token is None else contracts.call(w3, token, "erc20", "decimals"))
+                except Exception:
+                    decimals.append(18)
+            
+            # Columnar output: one list per (address, token) aligned with `blocks`
+            series = {}
+            for a, address in enumerate(address_list):
+                series[address] = {}
+                for t, symbol in enumerate(token_symbols):
+                    column = a * len(token_addresses) + t
+                    series[address][symbol] = [
+                        None if snapshots[n][1][column] is None else snapshots[n][1][column] / 10**decimals[t]
+                        for n in blocks
+                    ]
+            
+            if ctx:
+                await ctx.report_progress(3, 3)
+            
+            result = {
+                "network": network,
+                "points": len(blocks),
+                "blocks": blocks,
+                "timestamps": [datetime.fromtimestamp(snapshots[n][0], timezone.utc).isoformat() for n in blocks],
+                "tokens": token_symbols,
+                "series": series,
+                "blocks_queried": len(unique_blocks),
+                "headers_indexed": len(index)
+            }
+            
+            return format_json_response(result)
+            
+        except ImportError:
+            return "Web3 library not installed. Please install with: pip3 install web3"
+        except Exception as e:
+            return f"Error getting balance history: {str(e)}"
+    
     @mcp.tool()
     async def get_celo_token_list(address: str, network: str = "mainnet", ctx: Context = None) -> str:
         """
@@ -274,7 +781,7 @@ def register_celo_reader_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 2)
             
             # Connect to Celo network
-            w3 = Web3(Web3.HTTPProvider(network_config["rpc_url"]))
+            w3 = contracts.get_web3(network_config["rpc_url"])
             
             # Validate address
             try:
@@ -305,13 +812,8 @@ def register_celo_reader_tools(mcp: FastMCP):
             # Get balances for each token
             for token_info in token_list:
                 try:
-                    token_contract = w3.eth.contract(
-                        address=Web3.to_checksum_address(token_info["address"]),
-                        abi=ERC20_ABI
-                    )
-                    
                     # Get balance
-                    balance = token_contract.functions.balanceOf(address).call()
+                    balance = contracts.call(w3, Web3.to_checksum_address(token_info["address"]), "erc20", "balanceOf", address)
                     # Convert to token units
                     balance_formatted = float(balance) / 10**token_info["decimals"]
                     
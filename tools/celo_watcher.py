@@ -0,0 +1,124 @@
+# tools/celo_watcher.py - Live address watching over WebSocket subscriptions
+from mcp.server.fastmcp import FastMCP, Context
+from utils.helpers import format_json_response
+from utils.subscriptions import get_subscription_service, find_subscription_service
+from tools.celo_reader import NETWORKS
+from utils.workers import on_main_loop
+
+def register_celo_watcher_tools(mcp: FastMCP):
+    """Register address watching tools with the MCP server.
+
+    These stay on the server event loop: the subscription services they start are long-lived tasks there.
+    """
+
+    @mcp.tool()
+    @on_main_loop
+    async def watch_celo_address(address: str, network: str = "mainnet", ctx: Context = None) -> str:
+        """
+        Start watching a Celo address for new transactions and token transfers.
+
+        Parameters:
+        - address: The Celo wallet address
+        - network: 'mainnet' or 'alfajores' (testnet)
+
+        Returns:
+        - Confirmation and subscription status
+        """
+        try:
+            from web3 import Web3
+            import websockets  # noqa: F401
+
+            if network.lower() not in NETWORKS:
+                return f"Invalid network: {network}. Choose 'mainnet' or 'alfajores'."
+
+            try:
+                address = Web3.to_checksum_address(address)
+            except:
+                return f"Invalid address format: {address}"
+
+            network_config = NETWORKS[network.lower()]
+            if ctx:
+                ctx.info(f"Subscribing to {network_config['ws_url']} for {address}")
+
+            service = get_subscription_service(network.lower(), network_config["ws_url"], network_config["rpc_url"])
+            await service.watch(address)
+
+            return format_json_response({
+                "success": True,
+                "address": address,
+                "network": network,
+                "message": "Address is being watched. Use get_recent_activity to read new activity.",
+                "subscription": service.stats()
+            })
+
+        except ImportError:
+            return "Web3 or websockets library not installed. Please install with: pip3 install web3 websockets"
+        except Exception as e:
+            return f"Error watching address: {str(e)}"
+
+    @mcp.tool()
+    @on_main_loop
+    async def unwatch_celo_address(address: str, network: str = "mainnet", ctx: Context = None) -> str:
+        """
+        Stop watching a Celo address.
+
+        Parameters:
+        - address: The Celo wallet address
+        - network: 'mainnet' or 'alfajores' (testnet)
+
+        Returns:
+        - Confirmation message
+        """
+        try:
+            service = find_subscription_service(network.lower())
+            if not service or not await service.unwatch(address):
+                return format_json_response({"success": False, "error": f"Address {address} is not being watched on {network}"})
+
+            if not service.activity:
+                await service.stop()
+
+            return format_json_response({"success": True, "message": f"Stopped watching {address} on {network}"})
+
+        except Exception as e:
+            return f"Error unwatching address: {str(e)}"
+
+    @mcp.tool()
+    @on_main_loop
+    async def get_recent_activity(address: str, limit: int = 20, network: str = "mainnet", ctx: Context = None) -> str:
+        """
+        Get recent activity recorded for a watched Celo address (no block scanning).
+
+        Parameters:
+        - address: A Celo address previously passed to watch_celo_address
+        - limit: Maximum number of entries to return (default: 20)
+        - network: 'mainnet' or 'alfajores' (testnet)
+
+        Returns:
+        - Recent transactions, token transfers and pending transactions, newest first
+        """
+        try:
+            service = find_subscription_service(network.lower())
+            if not service or not service.is_watched(address):
+                return format_json_response({
+                    "success": False,
+                    "error": f"Address {address} is not being watched on {network}. Call watch_celo_address first."
+                })
+
+            network_config = NETWORKS[network.lower()]
+            activity = [
+                dict(entry, tx_explorer_url=f"{network_config['block_explorer']}/tx/{entry['hash']}")
+                for entry in service.recent_activity(address, max(1, min(limit, service.buffer_size)))
+            ]
+
+            return format_json_response({
+                "address": address,
+                "network": network,
+                "watching_since_block": service.watch_started.get(address.lower()),
+                "activity_count": len(activity),
+                "activity": activity,
+                "pending": service.pending_activity(address),
+                "subscription": service.stats()
+            })
+
+        except Exception as e:
+            return f"Error getting recent activity: {str(e)}"
@@ -1,7 +1,10 @@
 # tools/celo_writer.py - Celo blockchain write operations
 from mcp.server.fastmcp import FastMCP, Context
 from utils.helpers import format_json_response
-import json
+from utils.workers import client_key
+from utils.simulation import simulation_failure
+from utils.contracts import ERC20_ABI, contracts
+import secrets
 import time
 from typing import Dict, Optional
 
@@ -17,6 +20,10 @@ CELO_NETWORKS = {
     }
 }
 
+# Public and Alchemy endpoints are interchangeable; use_alchemy only picks the primary
+for _endpoints in CELO_NETWORKS.values():
+    contracts.register_endpoints(list(_endpoints.values()))
+
 # Token addresses on different networks
 TOKEN_ADDRESSES = {
     "cUSD": {
@@ -29,31 +36,6 @@ TOKEN_ADDRESSES = {
     }
 }
 
-# Basic ERC-20 ABI for token transfers
-ERC20_ABI = [
-    {
-        "constant": False,
-        "inputs": [
-            {"name": "_to", "type": "address"},
-            {"name": "_value", "type": "uint256"}
-        ],
-        "name": "transfer",
-        "outputs": [{"name": "success", "type": "bool"}],
-        "payable": False,
-        "stateMutability": "nonpayable",
-        "type": "function"
-    },
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "payable": False,
-        "stateMutability": "view",
-        "type": "function"
-    }
-]
-
 # Secure session management for temporary private key storage
 class TransactionSession:
     """Manages a secure, time-limited transaction session"""
@@ -62,58 +44,55 @@ class TransactionSession:
         self.sessions: Dict[str, Dict] = {}
         self.timeout_seconds = timeout_seconds
     
-    def create_session(self, public_address: str) -> str:
-        """Create a new session for a public address, returns session ID"""
-        import hashlib
-        session_id = f"session_{int(time.time())}_{hashlib.sha256(public_address.encode()).hexdigest()[:8]}"
+    def create_session(self, public_address: str, owner: str = "local") -> str:
+        """Create a new session for a public address, owned by one MCP client; returns session ID"""
+        # Unguessable, since a shared HTTP server holds sessions for many clients
+        session_id = f"session_{secrets.token_urlsafe(16)}"
         self.sessions[session_id] = {
             "public_address": public_address,
             "created_at": time.time(),
-            "private_key": None
+            "private_key": None,
+            "owner": owner
         }
         return session_id
     
-    def add_private_key(self, session_id: str, private_key: str) -> bool:
+    def add_private_key(self, session_id: str, private_key: str, owner: str = "local") -> bool:
         """Add private key to an existing session"""
-        if session_id not in self.sessions:
-            return False
-        
-        # Check if session is still valid
-        if time.time() - self.sessions[session_id]["created_at"] > self.timeout_seconds:
-            self.clear_session(session_id)
+        session = self.get_session_data(session_id, owner)
+        if session is None:
             return False
             
         # Store private key in memory only
-        self.sessions[session_id]["private_key"] = private_key
+        session["private_key"] = private_key
         return True
     
-    def get_session_data(self, session_id: str) -> Optional[Dict]:
-        """Get session data if session is valid"""
-        if session_id not in self.sessions:
+    def get_session_data(self, session_id: str, owner: str = "local") -> Optional[Dict]:
+        """Get session data if session is valid and belongs to `owner`"""
+        session = self.sessions.get(session_id)
+        if session is None or session["owner"] != owner:
             return None
             
         # Check if session is still valid
-        if time.time() - self.sessions[session_id]["created_at"] > self.timeout_seconds:
+        if time.time() - session["created_at"] > self.timeout_seconds:
             self.clear_session(session_id)
             return None
             
-        return self.sessions[session_id]
+        return session
     
     def clear_session(self, session_id: str) -> None:
         """Explicitly clear session data"""
-        if session_id in self.sessions:
+        # Remove the session (tools now run on worker threads, so pop rather than check-then-delete)
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
             # Explicitly clear private key from memory
-            if self.sessions[session_id]["private_key"]:
-                self.sessions[session_id]["private_key"] = None
-            # Remove the session
-            del self.sessions[session_id]
+            session["private_key"] = None
     
     def clear_expired_sessions(self) -> None:
         """Clear all expired sessions"""
         current_time = time.time()
         expired_sessions = []
         
-        for session_id, session_data in self.sessions.items():
+        for session_id, session_data in list(self.sessions.items()):
             if current_time - session_data["created_at"] > self.timeout_seconds:
                 expired_sessions.append(session_id)
                 
@@ -150,7 +129,7 @@ def register_celo_writer_tools(mcp: FastMCP):
                 ctx.info(f"Creating session for address: {address}")
             
             # Create a new session
-            session_id = tx_session.create_session(address)
+            session_id = tx_session.create_session(address, client_key(ctx))
             
             result = {
                 "session_id": session_id,
@@ -189,7 +168,7 @@ def register_celo_writer_tools(mcp: FastMCP):
                 private_key = f"0x{private_key}"
             
             # Add the private key to the session
-            if not tx_session.add_private_key(session_id, private_key):
+            if not tx_session.add_private_key(session_id, private_key, client_key(ctx)):
                 return format_json_response({
                     "success": False,
                     "error": "Invalid or expired session ID. Please create a new session."
@@ -219,7 +198,7 @@ def register_celo_writer_tools(mcp: FastMCP):
         - to_address: Recipient's Celo address
         - amount: Amount of CELO to send
         - network: 'mainnet' or 'alfajores'
-        - use_alchemy: Whether to use Alchemy RPC instead of public RPC
+        - use_alchemy: Whether to send through Alchemy instead of the public RPC (reads fail over between both)
         
         Returns:
         - Transaction result
@@ -233,7 +212,7 @@ def register_celo_writer_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 5)
             
             # Get session data
-            session_data = tx_session.get_session_data(session_id)
+            session_data = tx_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -260,7 +239,7 @@ def register_celo_writer_tools(mcp: FastMCP):
             rpc_type = "alchemy" if use_alchemy else "public"
             rpc_url = CELO_NETWORKS[network][rpc_type]
             
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = contracts.get_web3(rpc_url)
             if not w3.is_connected():
                 return format_json_response({
                     "success": False,
@@ -319,6 +298,10 @@ def register_celo_writer_tools(mcp: FastMCP):
                 ctx.info(f"Signing and sending transaction")
                 await ctx.report_progress(4, 5)
             
+            failure = simulation_failure(w3, tx, "Transaction")
+            if failure:
+                return failure
+            
             # Sign the transaction
             signed_tx = w3.eth.account.sign_transaction(tx, session_data["private_key"])
             
@@ -373,7 +356,7 @@ def register_celo_writer_tools(mcp: FastMCP):
         - amount: Amount of tokens to send
         - token_type: 'cUSD' or 'cEUR'
         - network: 'mainnet' or 'alfajores'
-        - use_alchemy: Whether to use Alchemy RPC instead of public RPC
+        - use_alchemy: Whether to send through Alchemy instead of the public RPC (reads fail over between both)
         
         Returns:
         - Transaction result
@@ -387,7 +370,7 @@ def register_celo_writer_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 5)
             
             # Get session data
-            session_data = tx_session.get_session_data(session_id)
+            session_data = tx_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -420,7 +403,7 @@ def register_celo_writer_tools(mcp: FastMCP):
             rpc_type = "alchemy" if use_alchemy else "public"
             rpc_url = CELO_NETWORKS[network][rpc_type]
             
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = contracts.get_web3(rpc_url)
             if not w3.is_connected():
                 return format_json_response({
                     "success": False,
@@ -448,10 +431,10 @@ def register_celo_writer_tools(mcp: FastMCP):
                 await ctx.report_progress(3, 5)
             
             # Create contract instance
-            token_contract = w3.eth.contract(address=token_address, abi=ERC20_ABI)
+            token_contract = contracts.get_contract(rpc_url, token_address, "erc20")
             
             # Get token balance
-            token_balance = token_contract.functions.balanceOf(address).call()
+            token_balance = contracts.call(w3, token_address, "erc20", "balanceOf", address)
             token_balance_formatted = token_balance / 10**18  # Assuming 18 decimals for Celo tokens
             
             # Convert amount to token units (with 18 decimals)
@@ -486,6 +469,10 @@ def register_celo_writer_tools(mcp: FastMCP):
                 'chainId': w3.eth.chain_id
             })
             
+            failure = simulation_failure(w3, transfer_txn, "Token transfer")
+            if failure:
+                return failure
+            
             # Sign the transaction
             signed_tx = w3.eth.account.sign_transaction(transfer_txn, session_data["private_key"])
             
@@ -552,7 +539,7 @@ def register_celo_writer_tools(mcp: FastMCP):
                 await ctx.report_progress(1, 3)
             
             # Get session data
-            session_data = tx_session.get_session_data(session_id)
+            session_data = tx_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -622,7 +609,7 @@ def register_celo_writer_tools(mcp: FastMCP):
                 ctx.info(f"Clearing session: {session_id}")
             
             # Check if the session exists
-            session_data = tx_session.get_session_data(session_id)
+            session_data = tx_session.get_session_data(session_id, client_key(ctx))
             if not session_data:
                 return format_json_response({
                     "success": False,
@@ -0,0 +1,54 @@
+# tools/diagnostics.py - Server diagnostics (metrics, RPC endpoint health and cache statistics)
+from mcp.server.fastmcp import FastMCP, Context
+from utils.helpers import format_json_response, logging_stats
+from utils.metrics import metrics
+from utils.analytics import analytics_pool
+
+def register_diagnostics_tools(mcp: FastMCP):
+    """Register diagnostics tools with the MCP server."""
+
+    @mcp.tool()
+    async def get_rpc_stats(ctx: Context = None) -> str:
+        """
+        Get RPC endpoint health and response cache statistics.
+
+        Returns:
+        - Per-endpoint latency, error rate and circuit state, plus cache and on-disk block store hit rates
+        """
+        try:
+            from utils.rpc import all_endpoint_stats, all_cache_stats
+            from utils.block_store import all_block_store_stats
+
+            return format_json_response({
+                "endpoints": all_endpoint_stats(),
+                "caches": all_cache_stats(),
+                "block_stores": all_block_store_stats()
+            })
+
+        except ImportError:
+            return "Web3 library not installed. Please install with: pip3 install web3"
+        except Exception as e:
+            return f"Error getting RPC stats: {str(e)}"
+
+    @mcp.tool()
+    async def get_server_metrics(format: str = "json", ctx: Context = None) -> str:
+        """
+        Get latency percentiles, RPC usage and error counts per tool and per RPC method.
+        (For a periodic Prometheus text file, the operator sets CELO_MCP_METRICS_FILE.)
+
+        Parameters:
+        - format: 'json' or 'prometheus' (Prometheus text exposition format)
+
+        Returns:
+        - p50/p95/p99 latency, call, error, RPC and cache-hit counts, plus log drop counters
+        """
+        try:
+            if format not in ("json", "prometheus"):
+                return "format must be 'json' or 'prometheus'"
+
+            if format == "prometheus":
+                return metrics.prometheus()
+            return format_json_response(dict(metrics.snapshot(), logging=logging_stats(), analytics=analytics_pool.stats()))
+
+        except Exception as e:
+            return f"Error getting server metrics: {str(e)}"
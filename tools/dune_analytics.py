@@ -1,6 +1,7 @@
 # tools/dune_analytics.py - Dune Analytics data processing
 from mcp.server.fastmcp import FastMCP, Context
 from utils.helpers import format_json_response
+from utils.analytics import AnalyticsBusy, analytics_pool, drop_table, fetch_table, page_table, search_table, summarize_table
 import json
 import os
 import pandas as pd
@@ -55,32 +56,23 @@ def register_dune_analytics_tools(mcp: FastMCP):
             
             # Check if the query is already in cache
             cache_key = f"query_{query_id}"
-            if cache_key not in QUERY_CACHE:
+            if cache_key not in QUERY_CACHE or not os.path.exists(QUERY_CACHE[cache_key]["table_path"]):
                 if ctx:
                     ctx.info("Data not in cache, fetching from Dune Analytics...")
                     await ctx.report_progress(2, 4)
                 
-                # Initialize the Dune client
-                dune = DuneClient(api_key)
-                
-                # Fetch the latest result from the specified query
+                # A worker fetches the latest result and writes it as a table file; the server keeps only
+                # its path and shape (DUNE_BASE_URL can point the client at a local replay server)
                 try:
-                    query_result = dune.get_latest_result(query_id)
-                    
-                    # Convert to dataframe
-                    df = pd.DataFrame(query_result.result.rows)
-                    
-                    # Store in cache as a dictionary
-                    QUERY_CACHE[cache_key] = {
-                        "data": df.to_dict(orient="records"),
-                        "columns": list(df.columns),
-                        "total_rows": len(df),
-                        "query_id": query_id
-                    }
+                    QUERY_CACHE[cache_key] = await analytics_pool.run(
+                        fetch_table, cache_key, query_id, api_key,
+                        os.environ.get("DUNE_BASE_URL", "https://api.dune.com"))
                     
                     if ctx:
-                        ctx.info(f"Successfully retrieved {len(df)} rows from Dune")
+                        ctx.info(f"Successfully retrieved {QUERY_CACHE[cache_key]['total_rows']} rows from Dune")
                 
+                except AnalyticsBusy as e:
+                    return format_json_response({"error": str(e)})
                 except Exception as e:
                     return format_json_response({
                         "error": f"Failed to fetch data from Dune: {str(e)}"
@@ -108,7 +100,11 @@ def register_dune_analytics_tools(mcp: FastMCP):
                     "error": f"Page {page} exceeds available data. Max page is {(total_rows // limit) + 1}"
                 })
             
-            paginated_data = cached_data["data"][start_idx:end_idx]
+            # The page is read from the table file in a worker process
+            try:
+                paginated_data = await analytics_pool.run(page_table, cached_data["table_path"], start_idx, end_idx)
+            except AnalyticsBusy as e:
+                return format_json_response({"error": str(e)})
             
             # Calculate total pages
             total_pages = (total_rows + limit - 1) // limit  # Ceiling division
@@ -155,7 +151,6 @@ def register_dune_analytics_tools(mcp: FastMCP):
         """
         try:
             import os
-            import pandas as pd
             from dotenv import load_dotenv
             
             # Check if we need to import Dune client
@@ -189,32 +184,23 @@ def register_dune_analytics_tools(mcp: FastMCP):
             
             # Check if the query is already in cache
             cache_key = f"query_{query_id}"
-            if cache_key not in QUERY_CACHE:
+            if cache_key not in QUERY_CACHE or not os.path.exists(QUERY_CACHE[cache_key]["table_path"]):
                 if ctx:
                     ctx.info("Data not in cache, fetching from Dune Analytics...")
                     await ctx.report_progress(2, 4)
                 
-                # Initialize the Dune client
-                dune = DuneClient(api_key)
-                
-                # Fetch the latest result from the specified query
+                # A worker fetches the latest result and writes it as a table file; the server keeps only
+                # its path and shape (DUNE_BASE_URL can point the client at a local replay server)
                 try:
-                    query_result = dune.get_latest_result(query_id)
-                    
-                    # Convert to dataframe
-                    df = pd.DataFrame(query_result.result.rows)
-                    
-                    # Store in cache as a dictionary
-                    QUERY_CACHE[cache_key] = {
-                        "data": df.to_dict(orient="records"),
-                        "columns": list(df.columns),
-                        "total_rows": len(df),
-                        "query_id": query_id
-                    }
+                    QUERY_CACHE[cache_key] = await analytics_pool.run(
+                        fetch_table, cache_key, query_id, api_key,
+                        os.environ.get("DUNE_BASE_URL", "https://api.dune.com"))
                     
                     if ctx:
-                        ctx.info(f"Successfully retrieved {len(df)} rows from Dune")
+                        ctx.info(f"Successfully retrieved {QUERY_CACHE[cache_key]['total_rows']} rows from Dune")
                 
+                except AnalyticsBusy as e:
+                    return format_json_response({"error": str(e)})
                 except Exception as e:
                     return format_json_response({
                         "error": f"Failed to fetch data from Dune: {str(e)}"
@@ -232,22 +218,15 @@ def register_dune_analytics_tools(mcp: FastMCP):
                          (f" in column '{search_column}'" if search_column else " in all columns"))
                 await ctx.report_progress(3, 4)
             
-            # Convert data back to DataFrame for easier searching
-            df = pd.DataFrame(cached_data["data"])
-            
-            # Perform the search
-            if search_column and search_column in df.columns:
-                # Search in specific column
-                matches = df[df[search_column].astype(str).str.contains(search_value, case=False, na=False)]
-            else:
-                # Search in all columns
-                matches = df[df.astype(str).apply(lambda row: row.str.contains(search_value, case=False, na=False).any(), axis=1)]
-            
-            # Limit the results
-            limited_matches = matches.head(limit)
+            # Search in a worker process, which reads the table from a shared file
+            try:
+                found = await analytics_pool.run(
+                    search_table, cached_data["table_path"], search_column, search_value, limit)
+            except AnalyticsBusy as e:
+                return format_json_response({"error": str(e)})
             
             if ctx:
-                ctx.info(f"Found {len(matches)} matches, returning up to {limit}")
+                ctx.info(f"Found {found['total_matches']} matches, returning up to {limit}")
                 await ctx.report_progress(4, 4)
             
             # Prepare the response
@@ -257,10 +236,10 @@ def register_dune_analytics_tools(mcp: FastMCP):
                 "dune_link": f"https://dune.com/queries/{query_id}",
                 "search_column": search_column,
                 "search_value": search_value,
-                "total_matches": len(matches),
-                "showing": min(limit, len(matches)),
-                "columns": list(df.columns),
-                "data": limited_matches.to_dict(orient="records")
+                "total_matches": found["total_matches"],
+                "showing": min(limit, found["total_matches"]),
+                "columns": found["columns"],
+                "data": found["data"]
             }
             
             return format_json_response(result)
@@ -283,8 +262,6 @@ def register_dune_analytics_tools(mcp: FastMCP):
         """
         try:
             import os
-            import pandas as pd
-            import numpy as np
             from dotenv import load_dotenv
             
             # Check if we need to import Dune client
@@ -312,32 +289,23 @@ def register_dune_analytics_tools(mcp: FastMCP):
             
             # Check if the query is already in cache
             cache_key = f"query_{query_id}"
-            if cache_key not in QUERY_CACHE:
+            if cache_key not in QUERY_CACHE or not os.path.exists(QUERY_CACHE[cache_key]["table_path"]):
                 if ctx:
                     ctx.info("Data not in cache, fetching from Dune Analytics...")
                     await ctx.report_progress(2, 4)
                 
-                # Initialize the Dune client
-                dune = DuneClient(api_key)
-                
-                # Fetch the latest result from the specified query
+                # A worker fetches the latest result and writes it as a table file; the server keeps only
+                # its path and shape (DUNE_BASE_URL can point the client at a local replay server)
                 try:
-                    query_result = dune.get_latest_result(query_id)
-                    
-                    # Convert to dataframe
-                    df = pd.DataFrame(query_result.result.rows)
-                    
-                    # Store in cache as a dictionary
-                    QUERY_CACHE[cache_key] = {
-                        "data": df.to_dict(orient="records"),
-                        "columns": list(df.columns),
-                        "total_rows": len(df),
-                        "query_id": query_id
-                    }
+                    QUERY_CACHE[cache_key] = await analytics_pool.run(
+                        fetch_table, cache_key, query_id, api_key,
+                        os.environ.get("DUNE_BASE_URL", "https://api.dune.com"))
                     
                     if ctx:
-                        ctx.info(f"Successfully retrieved {len(df)} rows from Dune")
+                        ctx.info(f"Successfully retrieved {QUERY_CACHE[cache_key]['total_rows']} rows from Dune")
                 
+                except AnalyticsBusy as e:
+                    return format_json_response({"error": str(e)})
                 except Exception as e:
                     return format_json_response({
                         "error": f"Failed to fetch data from Dune: {str(e)}"
@@ -354,47 +322,11 @@ def register_dune_analytics_tools(mcp: FastMCP):
                 ctx.info("Calculating summary statistics")
                 await ctx.report_progress(3, 4)
             
-            # Convert data back to DataFrame for analysis
-            df = pd.DataFrame(cached_data["data"])
-            
-            # Generate summary statistics
-            summary = {
-                "query_id": query_id,
-                "dune_link": f"https://dune.com/queries/{query_id}",
-                "row_count": len(df),
-                "column_count": len(df.columns),
-                "columns": list(df.columns),
-                "column_stats": {}
-            }
-            
-            # Calculate column statistics
-            for column in df.columns:
-                col_data = df[column]
-                col_stats = {
-                    "type": str(col_data.dtype),
-                    "null_count": col_data.isna().sum(),
-                    "null_percentage": round(col_data.isna().mean() * 100, 2)
-                }
-                
-                # Add numeric stats if applicable
-                if pd.api.types.is_numeric_dtype(col_data):
-                    col_stats.update({
-                        "min": col_data.min() if not col_data.isna().all() else None,
-                        "max": col_data.max() if not col_data.isna().all() else None,
-                        "mean": col_data.mean() if not col_data.isna().all() else None,
-                        "median": col_data.median() if not col_data.isna().all() else None
-                    })
-                
-                # Add string stats if applicable
-                elif pd.api.types.is_string_dtype(col_data) or pd.api.types.is_object_dtype(col_data):
-                    # Convert to string to handle mixed types
-                    str_col = col_data.astype(str)
-                    col_stats.update({
-                        "unique_count": str_col.nunique(),
-                        "most_common": str_col.value_counts().head(3).to_dict()
-                    })
-                
-                summary["column_stats"][column] = col_stats
+            # Compute the statistics in a worker process, which reads the table from a shared file
+            try:
+                summary = await analytics_pool.run(summarize_table, cached_data["table_path"], query_id)
+            except AnalyticsBusy as e:
+                return format_json_response({"error": str(e)})
             
             if ctx:
                 ctx.info("Summary statistics generated")
@@ -427,7 +359,7 @@ def register_dune_analytics_tools(mcp: FastMCP):
                 # Clear specific query
                 cache_key = f"query_{query_id}"
                 if cache_key in QUERY_CACHE:
-                    del QUERY_CACHE[cache_key]
+                    drop_table(QUERY_CACHE.pop(cache_key))
                     return format_json_response({
                         "success": True,
                         "message": f"Cache cleared for query {query_id}"
@@ -440,6 +372,8 @@ def register_dune_analytics_tools(mcp: FastMCP):
             else:
                 # Clear all queries
                 query_count = len(QUERY_CACHE)
+                for cached_data in QUERY_CACHE.values():
+                    drop_table(cached_data)
                 QUERY_CACHE.clear()
                 return format_json_response({
                     "success": True,
@@ -0,0 +1,192 @@
+# utils/address_labels.py - Persistent address classification (EOA vs contract) and known Celo protocol labels
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from utils.deadline import DeadlineExceeded
+from utils.helpers import get_cache_dir, logger
+
+# Known tokens and protocol contracts per network, shipped with the server
+BUNDLED_LABELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "address_labels.json")
+
+# eth_getCode lookups per JSON-RPC batch
+CODE_BATCH_SIZE = 100
+# An address without code can get some later (CREATE2 deployments, EIP-7702 delegation), so EOAs are rechecked
+EOA_RECHECK_AFTER = 86400
+# EIP-7702 delegation designator: an EOA whose code points at a contract
+_DELEGATION_PREFIX = bytes.fromhex("ef0100")
+
+_bundled: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+
+def _bundled_labels(network: str) -> Dict[str, Dict[str, Any]]:
+    global _bundled
+    if _bundled is None:
+        try:
+            with open(BUNDLED_LABELS) as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Bundled address labels unavailable: {e}")
+            raw = {}
+        _bundled = {net: {address.lower(): label for address, label in labels.items()}
+                    for net, labels in raw.items()}
+    return _bundled.get(network, {})
+
+class AddressLabels:
+    """
+    Labels for the addresses of one network: known protocol and token contracts
+    from the bundled table, and EOA vs contract for everything else.
+
+    Unknown addresses are classified with eth_getCode, sent as one JSON-RPC
+    batch per CODE_BATCH_SIZE addresses, and the answers are kept in a JSON
+    file in the cache directory. Contracts are kept for good; EOAs are
+    rechecked after EOA_RECHECK_AFTER seconds.
+    """
+
+    def __init__(self, network: str, path: Optional[str] = None):
+        self.network = network
+        self.path = path
+        self._known = _bundled_labels(network)
+        # lowercase address -> "contract" or "eoa", and when each EOA was checked
+        self._kinds: Dict[str, str] = {}
+        self._eoa_checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.code_lookups = 0
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    # ----- persistence -----
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Address label cache {self.path} is unreadable, starting a new one: {e}")
+            return
+        for address in data.get("contracts", []):
+            self._kinds[address] = "contract"
+        for address, checked in data.get("eoas", {}).items():
+            self._kinds[address] = "eoa"
+            self._eoa_checked[address] = checked
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "contracts": sorted(a for a, kind in self._kinds.items() if kind == "contract"),
+                "eoas": dict(self._eoa_checked)
+            }
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save address labels to {self.path}: {e}")
+
+    # ----- lookups -----
+
+    def _cached(self, address: str, now: float) -> Optional[Dict[str, Any]]:
+        """Label for a lowercase address without any RPC, or None if it has to be looked up."""
+        known = self._known.get(address)
+        if known is not None:
+            return dict(known, kind="contract")
+        kind = self._kinds.get(address)
+        if kind == "contract" or (kind == "eoa" and now - self._eoa_checked.get(address, 0) < EOA_RECHECK_AFTER):
+            return {"kind": kind}
+        return None
+
+    def _fetch_codes(self, w3, addresses: list) -> Dict[str, bytes]:
+        """Code of each address at the latest block, batched; one call per address if the endpoint refuses batches."""
+        from web3 import Web3
+
+        codes: Dict[str, bytes] = {}
+        for start in range(0, len(addresses), CODE_BATCH_SIZE):
+            chunk = addresses[start:start + CODE_BATCH_SIZE]
+            try:
+                with w3.batch_requests() as batch:
+                    for address in chunk:
+                        batch.add(w3.eth.get_code(Web3.to_checksum_address(address)))
+                    results = batch.execute()
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.debug(f"Batched eth_getCode failed ({e}); looking up {len(chunk)} addresses one by one")
+                results = [w3.eth.get_code(Web3.to_checksum_address(address)) for address in chunk]
+            self.code_lookups += len(chunk)
+            codes.update(zip(chunk, (bytes(code) for code in results)))
+        return codes
+
+    def classify(self, w3, addresses: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Label every address, keyed by lowercase address: {"kind": "contract" | "eoa", ...}
+        plus name/category (and symbol or protocol) for known contracts, or
+        "delegated": True for an EOA with an EIP-7702 delegation.
+
+        Only addresses not already cached cost an RPC, and those share batched requests.
+        """
+        now = time.time()
+        labels: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        with self._lock:
+            for address in {a.lower() for a in addresses if a}:
+                label = self._cached(address, now)
+                if label is None:
+                    missing.append(address)
+                else:
+                    labels[address] = label
+
+        if missing:
+            codes = self._fetch_codes(w3, missing)
+            with self._lock:
+                for address, code in codes.items():
+                    delegated = len(code) == 23 and code.startswith(_DELEGATION_PREFIX)
+                    if code and not delegated:
+                        self._kinds[address] = "contract"
+                        self._eoa_checked.pop(address, None)
+                        labels[address] = {"kind": "contract"}
+                    else:
+                        self._kinds[address] = "eoa"
+                        self._eoa_checked[address] = now
+                        labels[address] = {"kind": "eoa", "delegated": True} if delegated else {"kind": "eoa"}
+            self._save()
+        return labels
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            contracts = sum(1 for kind in self._kinds.values() if kind == "contract")
+            return {
+                "network": self.network,
+                "known_labels": len(self._known),
+                "cached_contracts": contracts,
+                "cached_eoas": len(self._kinds) - contracts,
+                "code_lookups": self.code_lookups
+            }
+
+# One label set per network, shared by every tool
+_labels: Dict[str, AddressLabels] = {}
+_labels_lock = threading.Lock()
+
+def get_address_labels(network: str) -> AddressLabels:
+    """Persistent address labels for a network, stored in the cache directory."""
+    labels = _labels.get(network)
+    if labels is None:
+        with _labels_lock:
+            labels = _labels.get(network)
+            if labels is None:
+                try:
+                    path = os.path.join(get_cache_dir(), f"address_labels_{network}.json")
+                except OSError as e:
+                    logger.warning(f"Address labels for {network} are not persistent: {e}")
+                    path = None
+                labels = AddressLabels(network, path)
+                _labels[network] = labels
+    return labels
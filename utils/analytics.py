@@ -0,0 +1,253 @@
+# utils/analytics.py - Process pool for CPU-heavy Dune analytics over shared on-disk tables
+import asyncio
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.helpers import get_cache_dir, logger
+
+# Tables are handed to workers as Arrow IPC files (memory-mapped) when pyarrow is available, else pickles
+try:
+    import pyarrow as pa
+    TABLE_FORMAT = "arrow"
+except ImportError:
+    pa = None
+    TABLE_FORMAT = "pickle"
+
+ANALYTICS_WORKERS = int(os.environ.get("CELO_MCP_ANALYTICS_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Running plus queued tasks; beyond this, calls are turned away instead of piling up
+ANALYTICS_MAX_PENDING = int(os.environ.get("CELO_MCP_ANALYTICS_MAX_PENDING", str(ANALYTICS_WORKERS * 4)))
+
+class AnalyticsBusy(Exception):
+    """The analytics pool already has its maximum number of pending tasks."""
+
+# --- Server side: table files ---
+
+def drop_table(cached_data: Dict) -> None:
+    """Remove the table file of a QUERY_CACHE entry being evicted."""
+    path = cached_data.get("table_path")
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# --- Worker side (runs in the pool's processes) ---
+
+# Tables recently loaded by this worker, keyed by path and invalidated by mtime
+_TABLES: "OrderedDict[str, tuple]" = OrderedDict()
+_TABLES_KEPT = 4
+
+def _keep_table(path: str, mtime: int, df) -> None:
+    _TABLES[path] = (mtime, df)
+    _TABLES.move_to_end(path)
+    while len(_TABLES) > _TABLES_KEPT:
+        _TABLES.popitem(last=False)
+
+def _write_table(name: str, df) -> str:
+    directory = os.path.join(get_cache_dir(), "dune_tables")
+    os.makedirs(directory, exist_ok=True)
+
+    table = None
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type columns Arrow can't represent; pickle this table instead
+            logger.debug(f"Table {name} not representable in Arrow, using pickle")
+
+    path = os.path.join(directory, f"{name}.{'arrow' if table is not None else 'pickle'}")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if table is not None:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+    return path
+
+def build_table(name: str, rows: List[Dict], query_id: int) -> Dict[str, Any]:
+    """Write rows as the table file `name`; returns the QUERY_CACHE entry for it (path and shape, no rows)."""
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    path = _write_table(name, df)
+    # The next task on this worker is likely a summary or search of the same table
+    _keep_table(path, os.stat(path).st_mtime_ns, df)
+    return {"table_path": path, "columns": list(df.columns), "total_rows": len(df), "query_id": query_id}
+
+def fetch_table(name: str, query_id: int, api_key: str, base_url: str) -> Dict[str, Any]:
+    """
+    Fetch a query's latest result from Dune and build its table file, all in
+    the worker: the rows are parsed, framed and written without passing
+    through the server, which keeps only the returned entry.
+    """
+    from dune_client.client import DuneClient
+
+    rows = DuneClient(api_key, base_url=base_url).get_latest_result(query_id).result.rows
+    return build_table(name, rows, query_id)
+
+def _read_table(path: str):
+    mtime = os.stat(path).st_mtime_ns
+    cached = _TABLES.get(path)
+    if cached and cached[0] == mtime:
+        _TABLES.move_to_end(path)
+        return cached[1]
+
+    if path.endswith(".arrow"):
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            df = pa.ipc.open_file(source).read_all().to_pandas()
+    else:
+        import pandas as pd
+        df = pd.read_pickle(path)
+
+    _keep_table(path, mtime, df)
+    return df
+
+def _native(value: Any) -> Any:
+    """numpy scalars to plain Python, so results serialize as JSON."""
+    return value.item() if hasattr(value, "item") else value
+
+def page_table(path: str, start: int, end: int) -> List[Dict]:
+    """Rows [start, end) for get_dune_data."""
+    return _read_table(path).iloc[start:end].to_dict(orient="records")
+
+def summarize_table(path: str, query_id: int) -> Dict[str, Any]:
+    """Column statistics for get_dune_summary."""
+    import pandas as pd
+
+    df = _read_table(path)
+    summary = {
+        "query_id": query_id,
+        "dune_link": f"https://dune.com/queries/{query_id}",
+        "row_count": len(df),
+        "column_count": len(df.columns),
+        "columns": list(df.columns),
+        "column_stats": {}
+    }
+
+    for column in df.columns:
+        col_data = df[column]
+        all_null = col_data.isna().all()
+        col_stats = {
+            "type": str(col_data.dtype),
+            "null_count": _native(col_data.isna().sum()),
+            "null_percentage": round(_native(col_data.isna().mean()) * 100, 2) if len(df) else 0.0
+        }
+
+        if pd.api.types.is_numeric_dtype(col_data):
+            col_stats.update({
+                "min": None if all_null else _native(col_data.min()),
+                "max": None if all_null else _native(col_data.max()),
+                "mean": None if all_null else _native(col_data.mean()),
+                "median": None if all_null else _native(col_data.median())
+            })
+        elif pd.api.types.is_string_dtype(col_data) or pd.api.types.is_object_dtype(col_data):
+            # Convert to string to handle mixed types
+            str_col = col_data.astype(str)
+            col_stats.update({
+                "unique_count": _native(str_col.nunique()),
+                "most_common": {k: _native(v) for k, v in str_col.value_counts().head(3).items()}
+            })
+
+        summary["column_stats"][column] = col_stats
+
+    return summary
+
+def search_table(path: str, search_column: Optional[str], search_value: str, limit: int) -> Dict[str, Any]:
+    """Case-insensitive substring search for search_dune_data, in one column or all of them."""
+    df = _read_table(path)
+    if search_column and search_column in df.columns:
+        matches = df[df[search_column].astype(str).str.contains(search_value, case=False, na=False)]
+    else:
+        matches = df[df.astype(str).apply(lambda row: row.str.contains(search_value, case=False, na=False).any(), axis=1)]
+
+    return {
+        "total_matches": len(matches),
+        "columns": list(df.columns),
+        "data": matches.head(limit).to_dict(orient="records")
+    }
+
+# --- Pool ---
+
+class AnalyticsPool:
+    """
+    Runs analytics functions in worker processes so pandas work never holds the
+    server's GIL or event loop.
+
+    Tables never pass through the server: a worker fetches a query's result
+    and writes it as a table file (fetch_table), and later tasks receive that
+    file's path rather than the table itself. At most
+    max_pending tasks are admitted; further calls raise AnalyticsBusy at once.
+    Cancelling the awaiting call (client went away) drops a task that is still
+    queued; one already running finishes and its result is discarded.
+    """
+
+    def __init__(self, workers: int = ANALYTICS_WORKERS, max_pending: int = ANALYTICS_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn rather than fork: the server has live threads (logging, tool workers) a fork would copy mid-state
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _done(self, future) -> None:
+        with self._lock:
+            self.pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in a worker process and return its result."""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise AnalyticsBusy(f"Analytics workers are busy ({self.pending} tasks pending); try again shortly")
+            self.pending += 1
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except Exception:
+                self.pending -= 1
+                raise
+        future.add_done_callback(self._done)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancel():
+                with self._lock:
+                    self.cancelled += 1
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for the next call
+            logger.error("Analytics worker process died, restarting the pool")
+            with self._lock:
+                self._executor = None
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "table_format": TABLE_FORMAT
+            }
+
+analytics_pool = AnalyticsPool()
@@ -0,0 +1,306 @@
+# utils/block_index.py - Persistent block header index (number, timestamp, hash) for timestamp <-> block resolution
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Optional
+
+from utils.block_store import FINALITY_DEPTH
+from utils.helpers import get_cache_dir, logger
+
+# Size cap in MiB of each network's block index file (about 21,000 blocks per MiB; half that again in memory)
+BLOCK_INDEX_MB = int(os.environ.get("CELO_MCP_BLOCK_INDEX_MB", "32"))
+
+# File layout: 8-byte header, then fixed 48-byte records appended in arrival order
+_MAGIC = b"CBIX\x01\x00\x00\x00"
+_RECORD = struct.Struct("<QQ32s")  # number, timestamp, block hash (zeros when unknown)
+_NO_HASH = bytes(32)
+
+class BlockTimestampIndex:
+    """
+    Sorted index of block headers seen so far on one chain, optionally backed by a file.
+
+    Records are appended to the file as they are learned and the file is read
+    back through mmap on startup, so the index survives restarts. Lookups use
+    in-memory sorted arrays: O(log n) for known blocks, and interpolation search
+    between the tightest known bounds for unknown ones (Celo's steady block time
+    means most timestamps resolve in two or three header fetches).
+
+    Blocks within `finality_depth` of the head are fetched again when looked
+    up and checked against their stored hash; on a mismatch (a reorg) the
+    records from that block up are discarded. At most `max_bytes` worth of
+    records are kept, the highest numbers first; the file is rewritten with
+    only the live records after an eviction, or once superseded records
+    outnumber them.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = BLOCK_INDEX_MB * 2**20,
+                 finality_depth: int = FINALITY_DEPTH):
+        self.path = path
+        self.max_records = max(1, max_bytes // _RECORD.size)
+        self.finality_depth = finality_depth
+        self._numbers = array("Q")
+        self._timestamps = array("Q")
+        # Byte offset of each record's hash in the file (0 = not stored)
+        self._hash_offsets = array("Q")
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        # Records in the file, superseded ones included
+        self._records = 0
+        self.header_fetches = 0
+        self.reorgs = 0
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    # ----- persistence -----
+
+    def _load(self) -> None:
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) >= len(_MAGIC)
+        self._file = open(self.path, "r+b" if exists else "w+b")
+        if not exists:
+            self._file.write(_MAGIC)
+            self._file.flush()
+            return
+        if self._file.read(len(_MAGIC)) != _MAGIC:
+            logger.warning(f"Block index {self.path} has an unknown format; starting a new one")
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(_MAGIC)
+            self._file.flush()
+            return
+
+        size = os.path.getsize(self.path)
+        usable = len(_MAGIC) + (size - len(_MAGIC)) // _RECORD.size * _RECORD.size
+        if usable != size:
+            # A torn final record from an interrupted write
+            self._file.truncate(usable)
+        if usable == len(_MAGIC):
+            return
+
+        self._remap()
+        latest: Dict[int, tuple] = {}
+        body = memoryview(self._mmap)[len(_MAGIC):usable]
+        for i, (number, timestamp, block_hash) in enumerate(_RECORD.iter_unpack(body)):
+            offset = len(_MAGIC) + i * _RECORD.size + 16
+            latest[number] = (timestamp, offset if block_hash != _NO_HASH else 0)
+        body.release()
+        for number in sorted(latest):
+            timestamp, offset = latest[number]
+            self._numbers.append(number)
+            self._timestamps.append(timestamp)
+            self._hash_offsets.append(offset)
+        self._records = (usable - len(_MAGIC)) // _RECORD.size
+        self._trim()
+
+    def _remap(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _append(self, number: int, timestamp: int, block_hash: bytes) -> int:
+        """Append a record; returns the file offset of its hash (0 if not persisted or no hash)."""
+        if self._file is None:
+            return 0
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(_RECORD.pack(number, timestamp, block_hash))
+        self._file.flush()
+        self._records += 1
+        return offset + 16 if block_hash != _NO_HASH else 0
+
+    def _hash_at(self, i: int) -> Optional[bytes]:
+        offset = self._hash_offsets[i]
+        if not offset:
+            return None
+        if self._mmap is None or offset + 32 > len(self._mmap):
+            self._remap()
+        return bytes(self._mmap[offset:offset + 32])
+
+    def _trim(self) -> None:
+        """Enforce the cap, down to 90% of it so this doesn't run on every add, and compact the file."""
+        evicted = len(self._numbers) > self.max_records
+        start = len(self._numbers) - (self.max_records * 9 // 10 or 1) if evicted else 0
+        if evicted or (self._file is not None and self._records > 2 * len(self._numbers) + 1024):
+            self._keep(start, len(self._numbers))
+
+    def _keep(self, start: int, end: int) -> None:
+        """Keep only the records at positions [start, end), rewriting the file with just those."""
+        if self._file is not None:
+            records = [(self._numbers[i], self._timestamps[i], self._hash_at(i) or _NO_HASH) for i in range(start, end)]
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "wb") as out:
+                    out.write(_MAGIC)
+                    for record in records:
+                        out.write(_RECORD.pack(*record))
+                os.replace(tmp, self.path)
+            except OSError as e:
+                # The old file still backs the kept records; the dropped ones only come back on a restart
+                logger.warning(f"Could not compact block index {self.path}: {e}")
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            else:
+                if self._mmap is not None:
+                    self._mmap.close()
+                    self._mmap = None
+                self._file.close()
+                self._file = open(self.path, "r+b")
+                self._file.seek(0, os.SEEK_END)
+                self._records = len(records)
+                self._numbers = array("Q", (number for number, _, _ in records))
+                self._timestamps = array("Q", (timestamp for _, timestamp, _ in records))
+                self._hash_offsets = array("Q", (len(_MAGIC) + k * _RECORD.size + 16 if block_hash != _NO_HASH else 0
+                                                 for k, (_, _, block_hash) in enumerate(records)))
+                return
+        del self._numbers[end:], self._timestamps[end:], self._hash_offsets[end:]
+        del self._numbers[:start], self._timestamps[:start], self._hash_offsets[:start]
+
+    # ----- index operations -----
+
+    def add(self, number: int, timestamp: int, block_hash: Optional[bytes] = None) -> None:
+        """Record a header; a known block is rewritten to fill in a missing hash or replace a reorged one."""
+        block_hash = bytes(block_hash) if block_hash else _NO_HASH
+        with self._lock:
+            i = bisect_left(self._numbers, number)
+            known = i < len(self._numbers) and self._numbers[i] == number
+            if known and (block_hash == _NO_HASH or self._hash_at(i) == block_hash):
+                return
+            offset = self._append(number, timestamp, block_hash)
+            if known:
+                self._timestamps[i] = timestamp
+                self._hash_offsets[i] = offset
+            else:
+                self._numbers.insert(i, number)
+                self._timestamps.insert(i, timestamp)
+                self._hash_offsets.insert(i, offset)
+            self._trim()
+
+    def block_hash(self, number: int) -> Optional[bytes]:
+        """Stored hash of a block, if known."""
+        with self._lock:
+            i = bisect_left(self._numbers, number)
+            if i == len(self._numbers) or self._numbers[i] != number:
+                return None
+            return self._hash_at(i)
+
+    def timestamp(self, w3, number: int, latest: Optional[int] = None) -> int:
+        """
+        Timestamp of a block, from the index or a header fetch. Given the
+        `latest` block number, a known block that is not final yet is fetched
+        again and verified (see _verified).
+        """
+        with self._lock:
+            i = bisect_left(self._numbers, number)
+            if i < len(self._numbers) and self._numbers[i] == number and (
+                    latest is None or number <= latest - self.finality_depth):
+                return self._timestamps[i]
+        block = w3.eth.get_block(number)
+        self.header_fetches += 1
+        self._verified(number, block.get("hash"))
+        self.add(number, block["timestamp"], block.get("hash"))
+        return block["timestamp"]
+
+    def _verified(self, number: int, block_hash) -> bool:
+        """Compare a fetched hash with the stored one; on a mismatch (a reorg) discard the records from `number` up."""
+        stored = self.block_hash(number)
+        if stored is None or not block_hash or bytes(block_hash) == stored:
+            return True
+        self.reorgs += 1
+        dropped = self.discard_from(number)
+        logger.info(f"Block {number} was reorged; dropped {dropped} block index records from it on")
+        return False
+
+    def _bounds(self, timestamp: int, latest: int) -> tuple:
+        """Tightest known (low, high) block numbers with ts(low) <= timestamp < ts(high)."""
+        with self._lock:
+            i = bisect_right(self._timestamps, timestamp)
+            low = self._numbers[i - 1] if i > 0 else 0
+            high = self._numbers[i] if i < len(self._numbers) else latest
+        return low, min(high, latest)
+
+    def block_at(self, w3, timestamp: int, latest: Optional[int] = None) -> int:
+        """
+        Last block with block.timestamp <= `timestamp` (0 if the timestamp precedes genesis).
+
+        Timestamps after the latest block resolve to the latest block.
+        """
+        if latest is None:
+            latest = w3.eth.block_number
+        # Each non-final block is verified once per lookup
+        verified = set()
+
+        def block_timestamp(number: int) -> int:
+            check = number not in verified
+            verified.add(number)
+            return self.timestamp(w3, number, latest if check else None)
+
+        if block_timestamp(latest) <= timestamp:
+            return latest
+        if block_timestamp(0) > timestamp:
+            return 0
+
+        low, high = self._bounds(timestamp, latest)
+        interpolate = True
+        # Invariant: ts(low) <= timestamp < ts(high)
+        while True:
+            low_ts, high_ts = block_timestamp(low), block_timestamp(high)
+            if not low_ts <= timestamp < high_ts:
+                # A bound came from a reorged record; genesis and the head were verified above
+                low, high = 0, latest
+                continue
+            if high - low <= 1:
+                return low
+            if interpolate and high_ts > low_ts:
+                guess = low + (timestamp - low_ts) * (high - low) // (high_ts - low_ts)
+                guess = min(max(guess, low + 1), high - 1)
+            else:
+                guess = (low + high) // 2
+            width = high - low
+            if block_timestamp(guess) <= timestamp:
+                low = guess
+            else:
+                high = guess
+            # Fall back to bisection for a step whenever interpolation didn't halve the range
+            interpolate = (high - low) * 2 <= width
+
+    def verify(self, w3, number: int) -> bool:
+        """True unless the stored hash for `number` no longer matches the chain (a reorg, whose records are dropped)."""
+        if self.block_hash(number) is None:
+            return True
+        return self._verified(number, w3.eth.get_block(number)["hash"])
+
+    def discard_from(self, number: int) -> int:
+        """Drop every record at or above `number` (after a reorg); returns how many were dropped."""
+        with self._lock:
+            keep = bisect_left(self._numbers, number)
+            dropped = len(self._numbers) - keep
+            if dropped:
+                self._keep(0, keep)
+            return dropped
+
+# One index per network, shared by every tool that takes time ranges
+_indexes: Dict[str, BlockTimestampIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_block_index(network: str) -> BlockTimestampIndex:
+    """Persistent header index for a network, stored in the cache directory."""
+    index = _indexes.get(network)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(network)
+            if index is None:
+                try:
+                    index = BlockTimestampIndex(os.path.join(get_cache_dir(), f"block_index_{network}.bin"))
+                except OSError as e:
+                    logger.warning(f"Block index for {network} is not persistent: {e}")
+                    index = BlockTimestampIndex()
+                _indexes[network] = index
+    return index
@@ -0,0 +1,456 @@
+# utils/block_store.py - Compressed on-disk store of finalized blocks and receipts, shared by every scan
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.helpers import get_cache_dir, logger
+
+# zstd when available, else zlib; both compress against a dictionary learned from the first records
+try:
+    import zstandard
+    CODEC = "zstd"
+except ImportError:
+    zstandard = None
+    CODEC = "zlib"
+
+# Several server processes may share a store (stdio mode starts one per client); without fcntl there is no
+# cross-process locking and a store must not be shared
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Disk budget per chain in MiB (0 disables the store)
+BLOCK_STORE_MB = int(os.environ.get("CELO_MCP_BLOCK_STORE_MB", "512"))
+# Blocks this far below the highest head seen are treated as final and may be stored
+FINALITY_DEPTH = int(os.environ.get("CELO_MCP_FINALITY_DEPTH", "64"))
+
+SEGMENT_BYTES = 64 * 2**20
+DICT_SAMPLES = 256
+DICT_BYTES = 64 * 1024
+
+# Segment layout: 8-byte header, then records of a fixed header followed by the compressed JSON result
+_MAGIC = b"CBLK\x01\x00\x00\x00"
+_RECORD = struct.Struct("<BB32sQI")  # kind, codec, key (block or tx hash), block number, payload length
+KIND_BLOCK = 1
+KIND_RECEIPT = 2
+_ZLIB = 1
+_ZSTD = 2
+_WITH_DICT = 0x80
+
+def _hash_bytes(value: str) -> Optional[bytes]:
+    try:
+        raw = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    except (AttributeError, ValueError):
+        return None
+    return raw if len(raw) == 32 else None
+
+def _block_number(value: Any) -> Optional[int]:
+    """An explicit block number parameter ("0x1a"), or None for tags like "latest"."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith("0x"):
+        try:
+            return int(value, 16)
+        except ValueError:
+            return None
+    return None
+
+class BlockStore:
+    """
+    Append-only store of finalized JSON-RPC results for one chain: full blocks
+    keyed by block hash (plus a number -> hash map) and receipts keyed by
+    transaction hash.
+
+    Records go to segment files read back through mmap; an in-memory index
+    of (segment, offset, length) per key is rebuilt from the record headers on
+    startup. Payloads are compressed with a dictionary trained on the first
+    DICT_SAMPLES records, which suits thousands of small, similar JSON documents
+    far better than compressing each one alone. When the segments outgrow
+    max_bytes the oldest segment is deleted.
+
+    Only blocks at least finality_depth below the highest head seen are stored,
+    so a reorg can't leave stale blocks behind.
+
+    Other processes may append to the same segments: appends, new segments
+    and the dictionary are guarded by an flock on the store's lock file,
+    records go at the real end of the file, and the dictionary is written
+    once and adopted by every process that trains later.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = BLOCK_STORE_MB * 2**20,
+                 finality_depth: int = FINALITY_DEPTH, segment_bytes: int = SEGMENT_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.finality_depth = finality_depth
+        self.segment_bytes = max(1 << 20, min(segment_bytes, max_bytes // 4))
+        self.safe_block = -1
+        # key -> (segment, payload offset, payload length, codec)
+        self._index: Dict[bytes, Tuple[int, int, int, int]] = {}
+        self._numbers: Dict[int, bytes] = {}
+        self._sizes: Dict[int, int] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._active: Optional[int] = None
+        self._file = None
+        self._samples: List[bytes] = []
+        self._zstd_dict = None
+        self._zlib_dict: Optional[bytes] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.evicted_segments = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "store.lock"), "a+b")
+        with self._process_lock():
+            self._load()
+
+    # ----- persistence -----
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.bin")
+
+    def _dict_path(self, codec: str) -> str:
+        return os.path.join(self.directory, f"dictionary.{codec}")
+
+    @contextmanager
+    def _process_lock(self):
+        """Excludes other processes sharing the store while segments or the dictionary are written."""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        for codec in ("zstd", "zlib"):
+            try:
+                with open(self._dict_path(codec), "rb") as f:
+                    self._set_dictionary(codec, f.read())
+            except OSError:
+                pass
+
+        segments = sorted(int(name[8:14]) for name in os.listdir(self.directory)
+                          if name.startswith("segment-") and name.endswith(".bin"))
+        for segment in segments:
+            path = self._segment_path(segment)
+            size = os.path.getsize(path)
+            if size < len(_MAGIC):
+                os.remove(path)
+                continue
+            with open(path, "r+b") as f:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    logger.warning(f"Block store segment {path} has an unknown format; removing it")
+                    f.close()
+                    os.remove(path)
+                    continue
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                offset = len(_MAGIC)
+                while offset + _RECORD.size <= size:
+                    kind, codec, key, number, length = _RECORD.unpack_from(view, offset)
+                    if offset + _RECORD.size + length > size:
+                        break
+                    self._add_to_index(kind, key, number, (segment, offset + _RECORD.size, length, codec))
+                    offset += _RECORD.size + length
+                view.close()
+                if offset != size:
+                    # A torn final record from an interrupted write
+                    f.truncate(offset)
+            self._sizes[segment] = offset
+        if self._sizes:
+            self._open_segment(max(self._sizes))
+
+    def _add_to_index(self, kind: int, key: bytes, number: int, location: Tuple[int, int, int, int]) -> None:
+        self._index[key] = location
+        if kind == KIND_BLOCK:
+            self._numbers[number] = key
+
+    def _open_segment(self, segment: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        path = self._segment_path(segment)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_MAGIC)
+            self._file.flush()
+        self._active = segment
+        self._sizes[segment] = self._file.tell()
+
+    def _evict(self) -> None:
+        """Delete the oldest segments until the store fits in max_bytes (the active segment stays)."""
+        while sum(self._sizes.values()) > self.max_bytes and len(self._sizes) > 1:
+            oldest = min(self._sizes)
+            view = self._maps.pop(oldest, None)
+            if view is not None:
+                view.close()
+            try:
+                os.remove(self._segment_path(oldest))
+            except OSError:
+                pass
+            del self._sizes[oldest]
+            dropped = {key for key, location in self._index.items() if location[0] == oldest}
+            for key in dropped:
+                del self._index[key]
+            for number in [n for n, key in self._numbers.items() if key in dropped]:
+                del self._numbers[number]
+            self.evicted_segments += 1
+
+    # ----- compression -----
+
+    def _set_dictionary(self, codec: str, data: bytes) -> None:
+        if codec == "zstd" and zstandard is not None:
+            self._zstd_dict = zstandard.ZstdCompressionDict(data)
+            self._zstd_compressor = zstandard.ZstdCompressor(level=3, dict_data=self._zstd_dict)
+            self._zstd_decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dict)
+        elif codec == "zlib":
+            self._zlib_dict = data
+
+    def _train(self) -> None:
+        """Build the dictionary from the sampled payloads and persist it; later records use it."""
+        if CODEC == "zstd":
+            try:
+                data = zstandard.train_dictionary(DICT_BYTES, self._samples).as_bytes()
+            except zstandard.ZstdError as e:
+                logger.debug(f"zstd dictionary training failed ({e}); using sample content")
+                data = b"".join(self._samples)[-DICT_BYTES:]
+        else:
+            # zlib's window is 32 KiB: the most recent sample content makes the best preset dictionary
+            data = b"".join(self._samples)[-32768:]
+        with self._process_lock():
+            # Every record on disk must decode with the one dictionary file: adopt one another process trained
+            try:
+                with open(self._dict_path(CODEC), "rb") as f:
+                    data = f.read() or data
+            except OSError:
+                tmp = f"{self._dict_path(CODEC)}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self._dict_path(CODEC))
+        self._set_dictionary(CODEC, data)
+        self._samples = []
+
+    def _compress(self, payload: bytes) -> Tuple[int, bytes]:
+        if CODEC == "zstd":
+            if self._zstd_dict is not None:
+                return _ZSTD | _WITH_DICT, self._zstd_compressor.compress(payload)
+            return _ZSTD, zstandard.ZstdCompressor(level=3).compress(payload)
+        if self._zlib_dict is not None:
+            compressor = zlib.compressobj(6, zdict=self._zlib_dict)
+            return _ZLIB | _WITH_DICT, compressor.compress(payload) + compressor.flush()
+        return _ZLIB, zlib.compress(payload, 6)
+
+    def _decompress(self, codec: int, data: bytes) -> Optional[bytes]:
+        with_dict = codec & _WITH_DICT
+        codec &= ~_WITH_DICT
+        if codec == _ZSTD:
+            if zstandard is None or (with_dict and self._zstd_dict is None):
+                return None
+            if with_dict:
+                return self._zstd_decompressor.decompress(data)
+            return zstandard.ZstdDecompressor().decompress(data)
+        if with_dict:
+            if self._zlib_dict is None:
+                return None
+            decompressor = zlib.decompressobj(zdict=self._zlib_dict)
+            return decompressor.decompress(data) + decompressor.flush()
+        return zlib.decompress(data)
+
+    # ----- records -----
+
+    def put(self, kind: int, key: bytes, number: int, result: Any) -> None:
+        payload = json.dumps(result, separators=(",", ":")).encode()
+        with self._lock:
+            if key in self._index:
+                return
+            codec, data = self._compress(payload)
+            record = _RECORD.pack(kind, codec, key, number, len(data)) + data
+            with self._process_lock():
+                if self._active is None:
+                    self._open_segment(1)
+                # The real end of the file: other processes append to the same segment
+                self._file.seek(0, os.SEEK_END)
+                if self._file.tell() + len(record) > self.segment_bytes:
+                    self._open_segment(self._active + 1)
+                    self._file.seek(0, os.SEEK_END)
+                offset = self._file.tell()
+                self._file.write(record)
+                self._file.flush()
+            self._sizes[self._active] = offset + len(record)
+            self._add_to_index(kind, key, number, (self._active, offset + _RECORD.size, len(data), codec))
+            self.stored += 1
+            self.raw_bytes += len(payload)
+            self.compressed_bytes += len(data)
+            if not codec & _WITH_DICT:
+                self._samples.append(payload)
+                if len(self._samples) >= DICT_SAMPLES:
+                    self._train()
+            self._evict()
+
+    def get_payload(self, key: bytes) -> Optional[bytes]:
+        """The stored result as JSON bytes, without decoding it."""
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            segment, offset, length, codec = location
+            view = self._maps.get(segment)
+            if view is None or offset + length > len(view):
+                if view is not None:
+                    view.close()
+                    del self._maps[segment]
+                try:
+                    with open(self._segment_path(segment), "rb") as f:
+                        view = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except OSError:
+                    # Evicted by another process sharing the store
+                    return None
+            try:
+                payload = self._decompress(codec, view[offset:offset + length])
+            except Exception as e:
+                logger.warning(f"Unreadable block store record in segment {segment}: {e}")
+                payload = None
+        return payload
+
+    def get(self, key: bytes) -> Any:
+        payload = self.get_payload(key)
+        return json.loads(payload) if payload is not None else None
+
+    def observe_head(self, number: int) -> None:
+        self.safe_block = max(self.safe_block, number - self.finality_depth)
+
+    # ----- JSON-RPC -----
+
+    def lookup(self, method: str, params: Any) -> Any:
+        """Stored result for a request, or None; block requests for hashes only are answered from full blocks."""
+        result = None
+        if method in ("eth_getBlockByNumber", "eth_getBlockByHash") and params:
+            if method == "eth_getBlockByNumber":
+                number = _block_number(params[0])
+                key = self._numbers.get(number) if number is not None else None
+            else:
+                key = _hash_bytes(params[0])
+            result = self.get(key) if key else None
+            if result is not None and not (len(params) > 1 and params[1]):
+                result["transactions"] = [tx["hash"] for tx in result["transactions"]]
+        elif method == "eth_getTransactionReceipt" and params:
+            key = _hash_bytes(params[0])
+            result = self.get(key) if key else None
+        elif method == "eth_getBlockReceipts" and params:
+            # Answered only when the block and every one of its receipts are stored
+            number = _block_number(params[0])
+            key = self._numbers.get(number) if number is not None else _hash_bytes(params[0])
+            block = self.get(key) if key else None
+            if block is not None:
+                receipts = [self.get(_hash_bytes(tx["hash"])) for tx in block["transactions"]]
+                result = receipts if None not in receipts else None
+        else:
+            return None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def lookup_raw(self, method: str, params: Any) -> Optional[bytes]:
+        """A stored full block as an undecoded JSON-RPC response body, or None."""
+        if method not in ("eth_getBlockByNumber", "eth_getBlockByHash") or len(params) < 2 or not params[1]:
+            return None
+        if method == "eth_getBlockByNumber":
+            number = _block_number(params[0])
+            key = self._numbers.get(number) if number is not None else None
+        else:
+            key = _hash_bytes(params[0])
+        payload = self.get_payload(key) if key else None
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return b'{"jsonrpc":"2.0","id":0,"result":' + payload + b"}"
+
+    def observe_raw(self, method: str, params: Any, body: bytes) -> None:
+        """observe() for an undecoded body, decoding it only if it may hold a final block not stored yet."""
+        if method == "eth_getBlockByNumber" and params:
+            number = _block_number(params[0])
+            if number is None or number > self.safe_block or number in self._numbers:
+                return
+        try:
+            response = json.loads(body)
+        except ValueError:
+            return
+        self.observe(method, params, response)
+
+    def observe(self, method: str, params: Any, response: Any) -> None:
+        """Learn the head from eth_blockNumber and store full blocks and receipts that are final."""
+        if not isinstance(response, dict) or response.get("result") is None:
+            return
+        result = response["result"]
+        if method == "eth_blockNumber":
+            number = _block_number(result)
+            if number is not None:
+                self.observe_head(number)
+        elif method in ("eth_getBlockByNumber", "eth_getBlockByHash") and isinstance(result, dict):
+            full = len(params) > 1 and params[1] and all(isinstance(tx, dict) for tx in result.get("transactions", []))
+            number, key = _block_number(result.get("number")), _hash_bytes(result.get("hash", ""))
+            if full and key and number is not None and number <= self.safe_block:
+                self.put(KIND_BLOCK, key, number, result)
+        elif method == "eth_getTransactionReceipt" and isinstance(result, dict):
+            number, key = _block_number(result.get("blockNumber")), _hash_bytes(result.get("transactionHash", ""))
+            if key and number is not None and number <= self.safe_block:
+                self.put(KIND_RECEIPT, key, number, result)
+        elif method == "eth_getBlockReceipts" and isinstance(result, list):
+            for receipt in result:
+                self.observe("eth_getTransactionReceipt", None, {"result": receipt})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            disk = sum(self._sizes.values())
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "codec": CODEC,
+                "dictionary": self._zstd_dict is not None if CODEC == "zstd" else self._zlib_dict is not None,
+                "records": len(self._index),
+                "blocks": len(self._numbers),
+                "segments": len(self._sizes),
+                "disk_bytes": disk,
+                "max_bytes": self.max_bytes,
+                "compression_ratio": round(self.raw_bytes / self.compressed_bytes, 2) if self.compressed_bytes else None,
+                "safe_block": self.safe_block,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evicted_segments": self.evicted_segments,
+            }
+
+# One store per chain, identified by chain id and genesis hash so local dev chains don't share one
+_stores: Dict[str, BlockStore] = {}
+_stores_lock = threading.Lock()
+
+def block_store(chain_id: int, genesis_hash: str) -> Optional[BlockStore]:
+    """The store for a chain, or None if the store is disabled or the cache directory is unusable."""
+    if BLOCK_STORE_MB <= 0:
+        return None
+    name = f"{chain_id}-{genesis_hash[2:18] if genesis_hash.startswith('0x') else genesis_hash[:16]}"
+    with _stores_lock:
+        store = _stores.get(name)
+        if store is None:
+            try:
+                store = BlockStore(os.path.join(get_cache_dir(), "blocks", name))
+            except OSError as e:
+                logger.warning(f"Block store for chain {chain_id} unavailable: {e}")
+                return None
+            _stores[name] = store
+    return store
+
+def all_block_store_stats() -> List[Dict[str, Any]]:
+    return [store.stats() for store in list(_stores.values())]
@@ -0,0 +1,249 @@
+# utils/bloom.py - logsBloom tests and a persistent per-block bloom of transaction senders and recipients
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.deadline import DeadlineExceeded
+from utils.helpers import get_cache_dir, logger
+
+BLOOM_BYTES = 256
+# Headers fetched per JSON-RPC batch by the prefilter
+HEADER_BATCH_SIZE = 100
+
+# Size cap in MiB of each network's address bloom index, in memory and on disk (about 3,500 blocks per MiB)
+BLOOM_INDEX_MB = int(os.environ.get("CELO_MCP_BLOOM_INDEX_MB", "32"))
+
+# File layout: 8-byte header, then fixed records appended in arrival order
+_MAGIC = b"CBLM\x01\x00\x00\x00"
+_RECORD = struct.Struct(f"<Q32s{BLOOM_BYTES}s")  # number, block hash, bloom of tx from/to addresses
+
+def _bloom_bits(item: bytes) -> List[int]:
+    """The three bit positions the Ethereum bloom (M3:2048) sets for an item."""
+    from eth_utils import keccak
+
+    digest = keccak(item)
+    return [((digest[i] << 8) | digest[i + 1]) & 2047 for i in (0, 2, 4)]
+
+def _normalize(bloom: Any) -> Optional[bytes]:
+    """A 256-byte bloom from HexBytes/bytes/hex/int (eth-tester drops leading zeros); None if unusable."""
+    if isinstance(bloom, int):
+        bloom = bloom.to_bytes(BLOOM_BYTES, "big") if bloom.bit_length() <= BLOOM_BYTES * 8 else None
+    elif isinstance(bloom, str):
+        bloom = bytes.fromhex(bloom[2:] if bloom.startswith("0x") else bloom)
+    if bloom is None or len(bloom) > BLOOM_BYTES:
+        return None
+    return bytes(bloom).rjust(BLOOM_BYTES, b"\0")
+
+def bloom_contains(bloom: bytes, item: bytes) -> bool:
+    for bit in _bloom_bits(item):
+        # Bit 0 is the lowest-order bit of the last byte
+        if not bloom[BLOOM_BYTES - 1 - bit // 8] & (1 << (bit % 8)):
+            return False
+    return True
+
+def make_bloom(items: Iterable[bytes]) -> bytes:
+    bloom = bytearray(BLOOM_BYTES)
+    for item in items:
+        for bit in _bloom_bits(item):
+            bloom[BLOOM_BYTES - 1 - bit // 8] |= 1 << (bit % 8)
+    return bytes(bloom)
+
+def _address_bytes(address: str) -> bytes:
+    return bytes.fromhex(address[2:] if address.startswith("0x") else address)
+
+def logs_mention(logs_bloom: Any, address: str) -> bool:
+    """
+    Whether a block's logsBloom may hold a log emitted by `address` or with it
+    as a topic. False means certainly not; an unusable bloom answers True.
+    """
+    bloom = _normalize(logs_bloom)
+    if bloom is None:
+        return True
+    raw = _address_bytes(address)
+    return bloom_contains(bloom, raw) or bloom_contains(bloom, raw.rjust(32, b"\0"))
+
+def transaction_bloom(transactions: Iterable[Any]) -> bytes:
+    """Bloom of every sender and recipient in a full block's transactions."""
+    return make_bloom(_address_bytes(address) for tx in transactions
+                      for address in (tx.get("from"), tx.get("to")) if address)
+
+class AddressBloomIndex:
+    """
+    Blooms of the transaction senders and recipients of blocks downloaded
+    before, keyed by block number and checked against the block hash, so a
+    reorged block is never answered from a stale record. Unlike logsBloom,
+    a miss here is exact: the address neither sent nor received a
+    transaction in that block.
+
+    Optionally backed by an append-only file of fixed records. At most
+    `max_bytes` worth of blocks are kept, the highest numbers first since
+    scans start at the head; the file is rewritten with only the live records
+    after an eviction, or once records superseded by reorgs outnumber them.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = BLOOM_INDEX_MB * 2**20):
+        self.path = path
+        self.max_records = max(1, max_bytes // _RECORD.size)
+        self._blooms: Dict[int, Tuple[bytes, bytes]] = {}
+        self._file = None
+        # Records in the file, superseded ones included
+        self._records = 0
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._blooms)
+
+    def _load(self) -> None:
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) >= len(_MAGIC)
+        self._file = open(self.path, "r+b" if exists else "w+b")
+        if not exists:
+            self._file.write(_MAGIC)
+            self._file.flush()
+            return
+        if self._file.read(len(_MAGIC)) != _MAGIC:
+            logger.warning(f"Address bloom index {self.path} has an unknown format; starting a new one")
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(_MAGIC)
+            self._file.flush()
+            return
+        body = self._file.read()
+        usable = len(body) // _RECORD.size * _RECORD.size
+        if usable != len(body):
+            # A torn final record from an interrupted write
+            self._file.truncate(len(_MAGIC) + usable)
+        for number, block_hash, bloom in _RECORD.iter_unpack(body[:usable]):
+            self._blooms[number] = (block_hash, bloom)
+        self._records = usable // _RECORD.size
+        self._file.seek(0, os.SEEK_END)
+        self._trim()
+
+    def add(self, number: int, block_hash: Any, bloom: bytes) -> None:
+        block_hash = bytes(block_hash)
+        with self._lock:
+            if self._blooms.get(number, (None,))[0] == block_hash:
+                return
+            self._blooms[number] = (block_hash, bloom)
+            if self._file is not None:
+                self._file.write(_RECORD.pack(number, block_hash, bloom))
+                self._file.flush()
+                self._records += 1
+            self._trim()
+
+    def _trim(self) -> None:
+        """Enforce the cap, down to 90% of it so this doesn't run on every add, and compact the file."""
+        evicted = len(self._blooms) > self.max_records
+        if evicted:
+            keep = sorted(self._blooms)[-(self.max_records * 9 // 10 or 1):]
+            self._blooms = {number: self._blooms[number] for number in keep}
+        if self._file is not None and (evicted or self._records > 2 * len(self._blooms) + 1024):
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as out:
+                out.write(_MAGIC)
+                for number in sorted(self._blooms):
+                    out.write(_RECORD.pack(number, *self._blooms[number]))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not compact address bloom index {self.path}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._file.close()
+        self._file = open(self.path, "r+b")
+        self._file.seek(0, os.SEEK_END)
+        self._records = len(self._blooms)
+
+    def get(self, number: int, block_hash: Any) -> Optional[bytes]:
+        """The stored bloom if it was built from this very block (same hash), else None."""
+        entry = self._blooms.get(number)
+        if entry is None or entry[0] != bytes(block_hash):
+            return None
+        return entry[1]
+
+class BloomPrefilter:
+    """
+    Decides which blocks of a descending scan need their full bodies, from
+    headers fetched HEADER_BATCH_SIZE at a time in one JSON-RPC batch.
+
+    A block is a candidate when the address bloom of an earlier download says
+    the address sent or received a transaction there, or, for blocks not seen
+    before, when logsBloom mentions the address. The logsBloom test misses
+    transactions that emit no log naming the address, such as plain transfers
+    of native CELO between accounts, which is why callers opt in.
+    """
+
+    def __init__(self, w3, address: str, lowest: int, blooms: AddressBloomIndex, on_header=None):
+        self.w3 = w3
+        self.address = address
+        self.lowest = lowest
+        self.blooms = blooms
+        self.on_header = on_header
+        self._candidates: Dict[int, bool] = {}
+        self.headers_fetched = 0
+        self.known_blocks = 0
+        self.skipped = 0
+
+    def _fetch_headers(self, top: int) -> None:
+        numbers = list(range(top, max(self.lowest, top - HEADER_BATCH_SIZE + 1) - 1, -1))
+        try:
+            with self.w3.batch_requests() as batch:
+                for number in numbers:
+                    batch.add(self.w3.eth.get_block(number, full_transactions=False))
+                headers = batch.execute()
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # No headers, no filtering: every block in the range gets downloaded
+            logger.debug(f"Header batch for blocks {numbers[-1]}-{numbers[0]} failed: {e}")
+            self._candidates.update((number, True) for number in numbers)
+            return
+        self.headers_fetched += len(headers)
+        raw = _address_bytes(self.address)
+        for number, header in zip(numbers, headers):
+            if self.on_header is not None:
+                self.on_header(header)
+            known = self.blooms.get(number, header["hash"])
+            if known is not None:
+                self.known_blocks += 1
+                self._candidates[number] = bloom_contains(known, raw)
+            else:
+                self._candidates[number] = logs_mention(header.get("logsBloom"), self.address)
+
+    def is_candidate(self, number: int) -> bool:
+        if number not in self._candidates:
+            self._fetch_headers(number)
+        candidate = self._candidates.pop(number)
+        if not candidate:
+            self.skipped += 1
+        return candidate
+
+    def stats(self) -> Dict[str, int]:
+        return {"headers_fetched": self.headers_fetched, "known_blocks": self.known_blocks, "skipped_blocks": self.skipped}
+
+# One index per network, shared by every scan
+_indexes: Dict[str, AddressBloomIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_address_blooms(network: str) -> AddressBloomIndex:
+    """Persistent address bloom index for a network, stored in the cache directory."""
+    index = _indexes.get(network)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(network)
+            if index is None:
+                try:
+                    index = AddressBloomIndex(os.path.join(get_cache_dir(), f"address_blooms_{network}.bin"))
+                except OSError as e:
+                    logger.warning(f"Address bloom index for {network} is not persistent: {e}")
+                    index = AddressBloomIndex()
+                _indexes[network] = index
+    return index
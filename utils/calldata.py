@@ -0,0 +1,164 @@
+# utils/calldata.py - Fast raw calldata encoders/decoders for fixed ERC-20 and Aave signatures
+from typing import Iterable, List, Optional
+
+# Function selectors (first 4 bytes of keccak256 of the canonical signature)
+TRANSFER = bytes.fromhex("a9059cbb")           # transfer(address,uint256)
+BALANCE_OF = bytes.fromhex("70a08231")         # balanceOf(address)
+APPROVE = bytes.fromhex("095ea7b3")            # approve(address,uint256)
+SUPPLY = bytes.fromhex("617ba037")             # supply(address,uint256,address,uint16)
+WITHDRAW = bytes.fromhex("69328dec")           # withdraw(address,uint256,address)
+SET_COLLATERAL = bytes.fromhex("5a3b74b9")     # setUserUseReserveAsCollateral(address,bool)
+BORROW = bytes.fromhex("a415bcad")             # borrow(address,uint256,uint256,uint16,address)
+REPAY = bytes.fromhex("573ade81")              # repay(address,uint256,uint256,address)
+
+WORD = 32
+UINT256_MAX = 2**256 - 1
+
+def _address_bytes(address: str) -> bytes:
+    """20 raw bytes of a 0x-prefixed hex address (checksum is not validated)."""
+    raw = bytes.fromhex(address[2:] if address[:2] in ("0x", "0X") else address)
+    if len(raw) != 20:
+        raise ValueError(f"Invalid address: {address}")
+    return raw
+
+_ADDRESS_PAD = bytes(12)
+
+def _write_address(buf: bytearray, offset: int, address: str) -> None:
+    buf[offset:offset + 12] = _ADDRESS_PAD
+    buf[offset + 12:offset + WORD] = _address_bytes(address)
+
+def _write_uint(buf: bytearray, offset: int, value: int) -> None:
+    # to_bytes raises OverflowError for negative values or values above 2**256 - 1
+    buf[offset:offset + WORD] = value.to_bytes(WORD, "big")
+
+def _buffer(size: int, buf: Optional[bytearray], offset: int) -> bytearray:
+    """
+    Return `buf` if it has room for `size` bytes at `offset`, else a fresh buffer.
+
+    Every encoder writes all of its words (including address padding), so a reused
+    buffer does not need to be cleared first.
+    """
+    if buf is None:
+        return bytearray(offset + size)
+    if len(buf) < offset + size:
+        raise ValueError(f"Buffer too small: need {offset + size} bytes, have {len(buf)}")
+    return buf
+
+def encode_balance_of(owner: str, buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """balanceOf(owner) - 36 bytes."""
+    buf = _buffer(36, buf, offset)
+    buf[offset:offset + 4] = BALANCE_OF
+    _write_address(buf, offset + 4, owner)
+    return buf
+
+def encode_transfer(to: str, amount: int, buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """transfer(to, amount) - 68 bytes."""
+    buf = _buffer(68, buf, offset)
+    buf[offset:offset + 4] = TRANSFER
+    _write_address(buf, offset + 4, to)
+    _write_uint(buf, offset + 36, amount)
+    return buf
+
+def encode_approve(spender: str, amount: int, buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """approve(spender, amount) - 68 bytes."""
+    buf = _buffer(68, buf, offset)
+    buf[offset:offset + 4] = APPROVE
+    _write_address(buf, offset + 4, spender)
+    _write_uint(buf, offset + 36, amount)
+    return buf
+
+def encode_supply(asset: str, amount: int, on_behalf_of: str, referral_code: int = 0,
+                  buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """supply(asset, amount, onBehalfOf, referralCode) - 132 bytes."""
+    if not 0 <= referral_code < 2**16:
+        raise ValueError("referral_code must fit in uint16")
+    buf = _buffer(132, buf, offset)
+    buf[offset:offset + 4] = SUPPLY
+    _write_address(buf, offset + 4, asset)
+    _write_uint(buf, offset + 36, amount)
+    _write_address(buf, offset + 68, on_behalf_of)
+    _write_uint(buf, offset + 100, referral_code)
+    return buf
+
+def encode_withdraw(asset: str, amount: int, to: str, buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """withdraw(asset, amount, to) - 100 bytes."""
+    buf = _buffer(100, buf, offset)
+    buf[offset:offset + 4] = WITHDRAW
+    _write_address(buf, offset + 4, asset)
+    _write_uint(buf, offset + 36, amount)
+    _write_address(buf, offset + 68, to)
+    return buf
+
+def encode_set_collateral(asset: str, use_as_collateral: bool, buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """setUserUseReserveAsCollateral(asset, useAsCollateral) - 68 bytes."""
+    buf = _buffer(68, buf, offset)
+    buf[offset:offset + 4] = SET_COLLATERAL
+    _write_address(buf, offset + 4, asset)
+    _write_uint(buf, offset + 36, 1 if use_as_collateral else 0)
+    return buf
+
+def encode_borrow(asset: str, amount: int, interest_rate_mode: int, referral_code: int, on_behalf_of: str,
+                  buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """borrow(asset, amount, interestRateMode, referralCode, onBehalfOf) - 164 bytes."""
+    if not 0 <= referral_code < 2**16:
+        raise ValueError("referral_code must fit in uint16")
+    buf = _buffer(164, buf, offset)
+    buf[offset:offset + 4] = BORROW
+    _write_address(buf, offset + 4, asset)
+    _write_uint(buf, offset + 36, amount)
+    _write_uint(buf, offset + 68, interest_rate_mode)
+    _write_uint(buf, offset + 100, referral_code)
+    _write_address(buf, offset + 132, on_behalf_of)
+    return buf
+
+def encode_repay(asset: str, amount: int, interest_rate_mode: int, on_behalf_of: str,
+                 buf: Optional[bytearray] = None, offset: int = 0) -> bytearray:
+    """repay(asset, amount, interestRateMode, onBehalfOf) - 132 bytes."""
+    buf = _buffer(132, buf, offset)
+    buf[offset:offset + 4] = REPAY
+    _write_address(buf, offset + 4, asset)
+    _write_uint(buf, offset + 36, amount)
+    _write_uint(buf, offset + 68, interest_rate_mode)
+    _write_address(buf, offset + 100, on_behalf_of)
+    return buf
+
+def encode_balance_of_batch(owners: Iterable[str]) -> List[memoryview]:
+    """
+    Encode balanceOf for many owners into one contiguous buffer.
+
+    Returns zero-copy 36-byte views into the shared buffer, one per owner.
+    """
+    owners = list(owners)
+    buf = bytearray(36 * len(owners))
+    view = memoryview(buf)
+    calls = []
+    for i, owner in enumerate(owners):
+        offset = 36 * i
+        buf[offset:offset + 4] = BALANCE_OF
+        _write_address(buf, offset + 4, owner)
+        calls.append(view[offset:offset + 36])
+    return calls
+
+def encode_transfer_batch(transfers: Iterable[tuple]) -> List[memoryview]:
+    """Encode transfer(to, amount) for many (to, amount) pairs into one contiguous buffer."""
+    transfers = list(transfers)
+    buf = bytearray(68 * len(transfers))
+    view = memoryview(buf)
+    calls = []
+    for i, (to, amount) in enumerate(transfers):
+        offset = 68 * i
+        buf[offset:offset + 4] = TRANSFER
+        _write_address(buf, offset + 4, to)
+        _write_uint(buf, offset + 36, amount)
+        calls.append(view[offset:offset + 68])
+    return calls
+
+def decode_uint256(data, offset: int = 0) -> int:
+    """Decode the uint256 word at `offset` of ABI return data without intermediate copies."""
+    if len(data) < offset + WORD:
+        raise ValueError(f"Return data too short for uint256: {len(data)} bytes")
+    return int.from_bytes(memoryview(data)[offset:offset + WORD], "big")
+
+def decode_bool(data, offset: int = 0) -> bool:
+    """Decode the bool word at `offset` of ABI return data."""
+    return decode_uint256(data, offset) != 0
@@ -0,0 +1,269 @@
+# utils/contracts.py - Shared contract ABIs and a registry of precompiled contract objects
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+# ERC-20 ABI covering every token function used by the tools
+ERC20_ABI = [
+    {
+        "constant": False,
+        "inputs": [
+            {"name": "_to", "type": "address"},
+            {"name": "_value", "type": "uint256"}
+        ],
+        "name": "transfer",
+        "outputs": [{"name": "success", "type": "bool"}],
+        "payable": False,
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [{"name": "_owner", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "constant": False,
+        "inputs": [
+            {"name": "_spender", "type": "address"},
+            {"name": "_value", "type": "uint256"}
+        ],
+        "name": "approve",
+        "outputs": [{"name": "", "type": "bool"}],
+        "payable": False,
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [
+            {"name": "_owner", "type": "address"},
+            {"name": "_spender", "type": "address"}
+        ],
+        "name": "allowance",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [],
+        "name": "symbol",
+        "outputs": [{"name": "", "type": "string"}],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [],
+        "name": "decimals",
+        "outputs": [{"name": "", "type": "uint8"}],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# ABI for the Aave LendingPool contract
+LENDING_POOL_ABI = [
+    # Supply function
+    {
+        "inputs": [
+            {"internalType": "address", "name": "asset", "type": "address"},
+            {"internalType": "uint256", "name": "amount", "type": "uint256"},
+            {"internalType": "address", "name": "onBehalfOf", "type": "address"},
+            {"internalType": "uint16", "name": "referralCode", "type": "uint16"}
+        ],
+        "name": "supply",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    # Withdraw function
+    {
+        "inputs": [
+            {"internalType": "address", "name": "asset", "type": "address"},
+            {"internalType": "uint256", "name": "amount", "type": "uint256"},
+            {"internalType": "address", "name": "to", "type": "address"}
+        ],
+        "name": "withdraw",
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    # Set user use reserve as collateral function
+    {
+        "inputs": [
+            {"internalType": "address", "name": "asset", "type": "address"},
+            {"internalType": "bool", "name": "useAsCollateral", "type": "bool"}
+        ],
+        "name": "setUserUseReserveAsCollateral",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    # Borrow function
+    {
+        "inputs": [
+            {"internalType": "address", "name": "asset", "type": "address"},
+            {"internalType": "uint256", "name": "amount", "type": "uint256"},
+            {"internalType": "uint256", "name": "interestRateMode", "type": "uint256"},
+            {"internalType": "uint16", "name": "referralCode", "type": "uint16"},
+            {"internalType": "address", "name": "onBehalfOf", "type": "address"}
+        ],
+        "name": "borrow",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    # Repay function
+    {
+        "inputs": [
+            {"internalType": "address", "name": "asset", "type": "address"},
+            {"internalType": "uint256", "name": "amount", "type": "uint256"},
+            {"internalType": "uint256", "name": "interestRateMode", "type": "uint256"},
+            {"internalType": "address", "name": "onBehalfOf", "type": "address"}
+        ],
+        "name": "repay",
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    }
+]
+
+def _canonical_type(param: Dict) -> str:
+    """Canonical ABI type string for an input/output entry, expanding tuples."""
+    abi_type = param["type"]
+    if abi_type.startswith("tuple"):
+        inner = ",".join(_canonical_type(c) for c in param["components"])
+        return f"({inner}){abi_type[len('tuple'):]}"
+    return abi_type
+
+class PrecompiledFunction:
+    """A contract function whose selector, argument encoder and result decoder are resolved once."""
+
+    __slots__ = ("name", "signature", "selector", "input_types", "output_types", "_encoder", "_decoder", "_stream")
+
+    def __init__(self, abi_entry: Dict):
+        from eth_abi.abi import default_codec
+        from eth_utils import keccak
+
+        self.name = abi_entry["name"]
+        self.input_types = tuple(_canonical_type(p) for p in abi_entry.get("inputs", []))
+        self.output_types = tuple(_canonical_type(p) for p in abi_entry.get("outputs", []))
+        self.signature = f"{self.name}({','.join(self.input_types)})"
+        self.selector = keccak(text=self.signature)[:4]
+        self._encoder = default_codec._registry.get_tuple_encoder(*self.input_types)
+        self._decoder = default_codec._registry.get_tuple_decoder(*self.output_types)
+        self._stream = default_codec.stream_class
+
+    def encode(self, *args) -> bytes:
+        """Build calldata (selector + encoded arguments)."""
+        if not self.input_types:
+            return self.selector
+        return self.selector + self._encoder(args)
+
+    def decode(self, data: bytes) -> Any:
+        """Decode return data; single-output functions return the bare value."""
+        values = self._decoder(self._stream(bytes(data)))
+        return values[0] if len(values) == 1 else values
+
+class ContractRegistry:
+    """
+    Parses each ABI once and caches Web3 connections and contract instances.
+
+    Contract instances are cached per (rpc_url, address, abi name) so tools don't
+    rebuild them on every call, and hot read paths can skip web3's contract
+    machinery entirely with precompiled encoders via call().
+    """
+
+    def __init__(self):
+        self._abis: Dict[str, List[Dict]] = {}
+        self._functions: Dict[Tuple[str, str], PrecompiledFunction] = {}
+        self._web3: Dict[str, Any] = {}
+        self._contracts: Dict[Tuple[str, str, str], Any] = {}
+        self._endpoint_groups: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def register_abi(self, name: str, abi: List[Dict]) -> None:
+        """Register an ABI under a short name (e.g. 'erc20')."""
+        self._abis[name] = abi
+
+    def abi(self, name: str) -> List[Dict]:
+        return self._abis[name]
+
+    def function(self, abi_name: str, fn_name: str) -> PrecompiledFunction:
+        """Get the precompiled function for an ABI, building it on first use."""
+        key = (abi_name, fn_name)
+        fn = self._functions.get(key)
+        if fn is None:
+            entry = next(e for e in self._abis[abi_name] if e.get("type") == "function" and e.get("name") == fn_name)
+            fn = PrecompiledFunction(entry)
+            self._functions[key] = fn
+        return fn
+
+    def encode(self, abi_name: str, fn_name: str, *args) -> bytes:
+        """Encode calldata for a registered function."""
+        return self.function(abi_name, fn_name).encode(*args)
+
+    def register_endpoints(self, urls: List[str]) -> None:
+        """Declare RPC URLs that serve the same chain, so each can fail over to the others."""
+        for url in urls:
+            group = self._endpoint_groups.setdefault(url, [url])
+            group.extend(u for u in urls if u not in group)
+
+    def endpoints(self, rpc_url: str) -> List[str]:
+        """`rpc_url` followed by its registered alternates."""
+        return self._endpoint_groups.get(rpc_url, [rpc_url])
+
+    def get_web3(self, rpc_url: str):
+        """
+        Get a shared Web3 instance for an RPC URL.
+
+        `rpc_url` is the primary endpoint (it receives nonce lookups and broadcasts);
+        reads are balanced across it and any alternates registered for it. When
+        CELO_MCP_RPC_PROXY is set, all traffic goes through that record/replay
+        server instead (see utils/rpc_replay.py).
+        """
+        w3 = self._web3.get(rpc_url)
+        if w3 is None:
+            from web3 import Web3
+            from utils.rpc import MultiEndpointProvider
+            from utils.rpc_replay import PROXY_ENV, proxied_url
+            proxy = os.environ.get(PROXY_ENV)
+            urls = [proxied_url(proxy, rpc_url)] if proxy else self.endpoints(rpc_url)
+            with self._lock:
+                w3 = self._web3.get(rpc_url)
+                if w3 is None:
+                    w3 = Web3(MultiEndpointProvider(urls))
+                    self._web3[rpc_url] = w3
+        return w3
+
+    def get_contract(self, rpc_url: str, address: str, abi_name: str):
+        """Get a cached web3 contract instance for (rpc_url, address, abi)."""
+        key = (rpc_url, address.lower(), abi_name)
+        contract = self._contracts.get(key)
+        if contract is None:
+            from web3 import Web3
+            w3 = self.get_web3(rpc_url)
+            contract = w3.eth.contract(address=Web3.to_checksum_address(address), abi=self._abis[abi_name])
+            with self._lock:
+                self._contracts.setdefault(key, contract)
+        return contract
+
+    def call(self, w3, address: str, abi_name: str, fn_name: str, *args, block_identifier: Any = "latest") -> Any:
+        """eth_call a view function using the precompiled encoder and decoder."""
+        fn = self.function(abi_name, fn_name)
+        raw = w3.eth.call({"to": address, "data": fn.encode(*args)}, block_identifier=block_identifier)
+        return fn.decode(raw)
+
+# Create a single shared registry
+contracts = ContractRegistry()
+contracts.register_abi("erc20", ERC20_ABI)
+contracts.register_abi("lending_pool", LENDING_POOL_ABI)
@@ -0,0 +1,148 @@
+# utils/deadline.py - Per-call deadlines and cooperative cancellation, enforced by the RPC layer
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional, Set, Tuple
+
+# Time budget for one tool call in seconds (0 disables); see utils/workers.py
+DEFAULT_TOOL_TIMEOUT = float(os.environ.get("CELO_MCP_TOOL_TIMEOUT", "300"))
+# Longest wait for a broadcast transaction to be mined
+RECEIPT_TIMEOUT = float(os.environ.get("CELO_MCP_RECEIPT_TIMEOUT", "120"))
+
+class DeadlineExceeded(TimeoutError):
+    """The call ran out of time or was cancelled; no further RPCs will be sent for it."""
+
+    def __init__(self, message: str, cancelled: bool = False):
+        super().__init__(message)
+        self.cancelled = cancelled
+
+class CallBudget:
+    """
+    Deadline plus cancellation flag for one tool call.
+
+    A nested budget (see deadline()) can only shorten its parent's deadline,
+    and shares its cancellation flag, so cancelling the call stops every scope.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CallBudget"] = None):
+        own = time.monotonic() + timeout if timeout else None
+        inherited = parent.deadline if parent else None
+        self.deadline = min((d for d in (own, inherited) if d is not None), default=None)
+        self._cancelled = parent._cancelled if parent else threading.Event()
+        # Events of threads blocked in wait_futures(), woken on cancel
+        self._waiters: Set[threading.Event] = parent._waiters if parent else set()
+
+    def cancel(self) -> None:
+        """Thread-safe; the next check() on any thread running the call raises."""
+        self._cancelled.set()
+        for waiter in list(self._waiters):
+            waiter.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise DeadlineExceeded("Call cancelled", cancelled=True)
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def sleep(self, seconds: float) -> None:
+        """time.sleep that returns early (raising) on cancellation or at the deadline."""
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._cancelled.wait(max(0.0, remaining))
+        else:
+            self._cancelled.wait(seconds)
+        self.check()
+
+_budget_var: contextvars.ContextVar[Optional[CallBudget]] = contextvars.ContextVar("call_budget", default=None)
+
+def current_budget() -> Optional[CallBudget]:
+    return _budget_var.get()
+
+def set_budget(budget: Optional[CallBudget]) -> contextvars.Token:
+    return _budget_var.set(budget)
+
+def check_deadline() -> None:
+    """Raise DeadlineExceeded if the current call is cancelled or out of time."""
+    budget = _budget_var.get()
+    if budget is not None:
+        budget.check()
+
+def pause(seconds: float) -> None:
+    """time.sleep that is cut short (raising DeadlineExceeded) by the current call's cancellation or deadline."""
+    budget = _budget_var.get()
+    if budget is None:
+        time.sleep(seconds)
+    else:
+        budget.sleep(seconds)
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[CallBudget]:
+    """Run a block under a tighter deadline than the enclosing call's (None/0: no extra limit)."""
+    budget = CallBudget(seconds, parent=_budget_var.get())
+    token = _budget_var.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget_var.reset(token)
+
+def wait_futures(futures: Iterable[Future], timeout: Optional[float] = None) -> Tuple[Set[Future], Set[Future]]:
+    """
+    concurrent.futures.wait(return_when=FIRST_COMPLETED) that raises DeadlineExceeded
+    as soon as the current call is cancelled or out of time, abandoning the futures.
+    """
+    futures = list(futures)
+    budget = _budget_var.get()
+    if budget is None:
+        return wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+
+    until = None if timeout is None else time.monotonic() + timeout
+    wake = threading.Event()
+    for future in futures:
+        future.add_done_callback(lambda _: wake.set())
+    budget._waiters.add(wake)
+    try:
+        while True:
+            wake.clear()
+            budget.check()
+            done = {future for future in futures if future.done()}
+            now = time.monotonic()
+            if done or (until is not None and now >= until):
+                return done, set(futures) - done
+            limits = [t for t in (budget.remaining(), None if until is None else until - now) if t is not None]
+            wake.wait(max(0.0, min(limits)) if limits else None)
+    finally:
+        budget._waiters.discard(wake)
+
+def wait_for_receipt(w3, tx_hash: Any, timeout: float = RECEIPT_TIMEOUT, poll_interval: float = 0.5) -> Any:
+    """
+    Poll for a transaction receipt for at most `timeout` seconds (less if the call's
+    deadline is sooner). Cancellation stops polling at once.
+
+    Errors name the transaction hash, since it was already broadcast and may still be mined.
+    """
+    from web3.exceptions import TransactionNotFound
+
+    tx_hex = tx_hash.hex() if hasattr(tx_hash, "hex") else str(tx_hash)
+    with deadline(timeout) as budget:
+        try:
+            while True:
+                try:
+                    return w3.eth.get_transaction_receipt(tx_hash)
+                except TransactionNotFound:
+                    budget.sleep(poll_interval)
+        except DeadlineExceeded as e:
+            reason = "waiting was cancelled" if e.cancelled else "it was not mined in time"
+            raise DeadlineExceeded(f"Transaction {tx_hex} was broadcast but {reason}; "
+                                   "it may still confirm, check it on the explorer", cancelled=e.cancelled)
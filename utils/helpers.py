@@ -1,16 +1,166 @@
 # utils/helpers.py - Helper functions for Celo MCP Server
+import atexit
+import contextvars
 import json
 import logging
+import multiprocessing
+import os
+import queue
+import random
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Any, Dict
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='mcp_debug.log',
-    filemode='a'
-)
-logger = logging.getLogger("celo_explorer")
+# Logging configuration (overridable through the environment)
+LOG_FILE = os.environ.get("CELO_MCP_LOG_FILE") or \
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp_debug.log")
+LOG_LEVEL = os.environ.get("CELO_MCP_LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("CELO_MCP_LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get("CELO_MCP_LOG_BACKUPS", 5))
+DEBUG_SAMPLE_RATE = float(os.environ.get("CELO_MCP_DEBUG_SAMPLE_RATE", "0.1"))
+
+# Correlation fields attached to every record logged while handling a tool call
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+tool_name_var: contextvars.ContextVar = contextvars.ContextVar("tool_name", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id", "tool"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including correlation fields and any `extra=` values."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in ("request_id", "tool"):
+            if getattr(record, field, None):
+                entry[field] = getattr(record, field)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class _ContextFilter(logging.Filter):
+    """Copy correlation fields onto the record in the logging thread, before it is queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.tool = tool_name_var.get()
+        return True
+
+class _DebugSampler(logging.Filter):
+    """Keep a random fraction of DEBUG records; everything at INFO and above passes."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or random.random() < self.rate:
+            return True
+        self.dropped += 1
+        return False
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Hand records to the listener thread; drop (and count) them rather than block when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now, while args and exc_info are still valid
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _SizeAndDailyRotatingFileHandler(RotatingFileHandler):
+    """Rotate when the file exceeds maxBytes or the UTC day changes, keeping backupCount old files."""
+
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, **kwargs)
+        self._day = time.gmtime().tm_yday
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if time.gmtime(record.created).tm_yday != self._day:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self) -> None:
+        self._day = time.gmtime().tm_yday
+        super().doRollover()
+
+_debug_sampler = _DebugSampler(DEBUG_SAMPLE_RATE)
+
+def _setup_logging() -> logging.Logger:
+    """
+    Route the server's logger through a bounded queue to a listener thread.
+
+    Tool handlers only pay for an in-memory enqueue; formatting and disk I/O
+    happen on the listener thread, which writes rotated JSON lines to LOG_FILE.
+    """
+    server_logger = logging.getLogger("celo_explorer")
+    if server_logger.handlers:
+        return server_logger
+
+    file_handler: logging.Handler
+    if multiprocessing.parent_process() is not None:
+        # Analytics worker processes (utils/analytics.py) leave the file and its rotation to the server
+        file_handler = logging.StreamHandler()
+    else:
+        try:
+            file_handler = _SizeAndDailyRotatingFileHandler(
+                LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        except OSError:
+            # Never log to stdout: it carries the stdio transport
+            file_handler = logging.StreamHandler()
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=10000)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(_debug_sampler)
+    queue_handler.addFilter(_ContextFilter())
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    server_logger.addHandler(queue_handler)
+    server_logger.setLevel(LOG_LEVEL)
+    # Keep records out of the root logger's synchronous stderr handler
+    server_logger.propagate = False
+    return server_logger
+
+logger = _setup_logging()
+
+def logging_stats() -> Dict[str, Any]:
+    """Where logs go and how many records were shed (queue full, or DEBUG not sampled)."""
+    handler = next((h for h in logger.handlers if isinstance(h, _NonBlockingQueueHandler)), None)
+    return {
+        "file": LOG_FILE,
+        "level": logging.getLevelName(logger.level),
+        "debug_sample_rate": DEBUG_SAMPLE_RATE,
+        "queued": handler.queue.qsize() if handler else 0,
+        "dropped_queue_full": handler.dropped if handler else 0,
+        "dropped_debug_sampled": _debug_sampler.dropped,
+    }
 
 def format_json_response(data: Dict[str, Any], pretty: bool = True) -> str:
     """Format JSON data as a readable string."""
@@ -31,4 +181,10 @@ def format_celo_amount(amount: float, symbol: str = "CELO") -> str:
     if amount > 1:
         return f"{amount:.4f} {symbol}"
     else:
-        return f"{amount:.6f} {symbol}"
\ No newline at end of file
+        return f"{amount:.6f} {symbol}"
+
+def get_cache_dir() -> str:
+    """Directory for persistent caches (CELO_MCP_CACHE_DIR, else ~/.cache/celo-explorer-mcp); created on first use."""
+    path = os.environ.get("CELO_MCP_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "celo-explorer-mcp")
+    os.makedirs(path, exist_ok=True)
+    return path
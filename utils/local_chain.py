@@ -0,0 +1,357 @@
+# utils/local_chain.py - Local eth-tester chain with mock ERC-20 tokens and an Aave-like pool, served over HTTP
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Sequence, Union
+
+from utils.helpers import logger
+from utils.multicall import function_selector
+
+# ----- a minimal EVM assembler -----
+#
+# The mocks are written directly in EVM assembly so the fixture needs no
+# Solidity compiler. A program is a list of opcode names, ints (pushed with the
+# smallest PUSHn), ("label", name), ("ref", name) (PUSH2 of a label offset) and
+# ("sel", signature) (PUSH4 of a function selector).
+
+_OPCODES = {
+    "STOP": 0x00, "ADD": 0x01, "SUB": 0x03, "LT": 0x10, "GT": 0x11, "EQ": 0x14, "ISZERO": 0x15,
+    "NOT": 0x19, "SHL": 0x1B, "SHR": 0x1C, "SHA3": 0x20, "ADDRESS": 0x30, "CALLER": 0x33,
+    "CALLDATALOAD": 0x35, "CODECOPY": 0x39, "POP": 0x50, "MLOAD": 0x51, "MSTORE": 0x52,
+    "SLOAD": 0x54, "SSTORE": 0x55, "JUMP": 0x56, "JUMPI": 0x57, "GAS": 0x5A, "JUMPDEST": 0x5B,
+    "DUP1": 0x80, "DUP2": 0x81, "DUP3": 0x82, "SWAP1": 0x90, "SWAP2": 0x91,
+    "LOG3": 0xA3, "CALL": 0xF1, "RETURN": 0xF3, "REVERT": 0xFD,
+}
+
+Op = Union[str, int, tuple]
+
+def _push(value: int) -> bytes:
+    data = value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big")
+    return bytes([0x5F + len(data)]) + data
+
+def assemble(program: Sequence[Op]) -> bytes:
+    """Assemble a program into bytecode, resolving label references in a second pass."""
+    def size(op: Op) -> int:
+        if isinstance(op, str):
+            return 1
+        if isinstance(op, int):
+            return len(_push(op))
+        return {"label": 1, "ref": 3, "sel": 5}[op[0]]
+
+    labels, offset = {}, 0
+    for op in program:
+        if isinstance(op, tuple) and op[0] == "label":
+            labels[op[1]] = offset
+        offset += size(op)
+
+    code = bytearray()
+    for op in program:
+        if isinstance(op, str):
+            code.append(_OPCODES[op])
+        elif isinstance(op, int):
+            code += _push(op)
+        elif op[0] == "label":
+            code.append(_OPCODES["JUMPDEST"])
+        elif op[0] == "ref":
+            code += b"\x61" + labels[op[1]].to_bytes(2, "big")
+        else:
+            code += b"\x63" + function_selector(op[1])
+    return bytes(code)
+
+def initcode(runtime: bytes) -> bytes:
+    """Constructor that returns `runtime` as the deployed code."""
+    header = bytes([0x61]) + len(runtime).to_bytes(2, "big") + b"\x80\x61\x00\x0d\x60\x00\x39\x60\x00\xf3"
+    return header + runtime
+
+# ----- assembly macros -----
+
+def _arg(i: int) -> List[Op]:
+    return [4 + 32 * i, "CALLDATALOAD"]
+
+def _hash2(a: List[Op], b: List[Op]) -> List[Op]:
+    """keccak256(a ‖ b), the slot for a two-key mapping."""
+    return a + [0, "MSTORE"] + b + [32, "MSTORE", 64, 0, "SHA3"]
+
+def _return_top() -> List[Op]:
+    return [0, "MSTORE", 32, 0, "RETURN"]
+
+def _revert_if() -> List[Op]:
+    return [("ref", "revert"), "JUMPI"]
+
+def _dispatch(functions: Dict[str, str]) -> List[Op]:
+    program: List[Op] = [0, "CALLDATALOAD", 0xE0, "SHR"]
+    for signature, label in functions.items():
+        program += ["DUP1", ("sel", signature), "EQ", ("ref", label), "JUMPI"]
+    return program + [("label", "revert"), 0, "DUP1", "REVERT"]
+
+def _move_balance(sender: List[Op], recipient: List[Op], amount: List[Op]) -> List[Op]:
+    """balance[sender] -= amount (reverting if short); balance[recipient] += amount; emit Transfer."""
+    transfer_topic = int("ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef", 16)
+    return (sender + ["SLOAD"] + amount + ["DUP2", "DUP2", "GT"] + _revert_if() +
+            ["SWAP1", "SUB"] + sender + ["SSTORE"] +
+            recipient + ["SLOAD"] + amount + ["ADD"] + recipient + ["SSTORE"] +
+            amount + [0, "MSTORE"] + recipient + sender + [transfer_topic, 32, 0, "LOG3"])
+
+def _token_call(token: List[Op], signature: str, args: List[List[Op]]) -> List[Op]:
+    """Call a token function with word-sized args (built at memory 0x80); revert if it fails."""
+    program: List[Op] = [("sel", signature), 0xE0, "SHL", 0x80, "MSTORE"]
+    for i, arg in enumerate(args):
+        program += arg + [0x84 + 32 * i, "MSTORE"]
+    program += [32, 0, 4 + 32 * len(args), 0x80, 0] + token + ["GAS", "CALL", "ISZERO"] + _revert_if()
+    return program
+
+def mock_erc20_runtime(symbol: str, decimals: int) -> bytes:
+    """
+    ERC-20 with open minting: balanceOf, transfer, approve, allowance, transferFrom,
+    mint, decimals, symbol and name. Balances live at slot = holder address and
+    allowances at keccak256(owner ‖ spender).
+    """
+    encoded_symbol = symbol.encode()
+    assert len(encoded_symbol) <= 32
+    return_symbol = [0x20, 0, "MSTORE", len(encoded_symbol), 32, "MSTORE",
+                     int.from_bytes(encoded_symbol.ljust(32, b"\0"), "big"), 64, "MSTORE", 96, 0, "RETURN"]
+    program = _dispatch({
+        "balanceOf(address)": "balanceOf",
+        "transfer(address,uint256)": "transfer",
+        "approve(address,uint256)": "approve",
+        "allowance(address,address)": "allowance",
+        "transferFrom(address,address,uint256)": "transferFrom",
+        "mint(address,uint256)": "mint",
+        "decimals()": "decimals",
+        "symbol()": "symbol",
+        "name()": "symbol",
+    })
+    program += [("label", "balanceOf")] + _arg(0) + ["SLOAD"] + _return_top()
+    program += [("label", "transfer")] + _move_balance(["CALLER"], _arg(0), _arg(1)) + [1] + _return_top()
+    program += [("label", "approve")] + _hash2(["CALLER"], _arg(0)) + _arg(1) + ["SWAP1", "SSTORE", 1] + _return_top()
+    program += [("label", "allowance")] + _hash2(_arg(0), _arg(1)) + ["SLOAD"] + _return_top()
+    program += ([("label", "transferFrom")] + _hash2(_arg(0), ["CALLER"]) + ["DUP1", "SLOAD"] + _arg(2) +
+                ["DUP2", "DUP2", "GT"] + _revert_if() + ["SWAP1", "SUB", "SWAP1", "SSTORE"] +
+                _move_balance(_arg(0), _arg(1), _arg(2)) + [1] + _return_top())
+    program += ([("label", "mint")] + _arg(0) + ["SLOAD"] + _arg(1) + ["ADD"] + _arg(0) + ["SSTORE"] +
+                [1] + _return_top())
+    program += [("label", "decimals"), decimals] + _return_top()
+    program += [("label", "symbol")] + return_symbol
+    return assemble(program)
+
+def mock_pool_runtime() -> bytes:
+    """
+    Aave v3 Pool stand-in: supply, withdraw, borrow, repay and
+    setUserUseReserveAsCollateral move real mock-token balances and track per
+    (user, asset) collateral at keccak256(user ‖ asset), debt at +1 and the
+    collateral flag at +2. There are no prices or health checks.
+    """
+    max_uint = 2**256 - 1
+    program = _dispatch({
+        "supply(address,uint256,address,uint16)": "supply",
+        "withdraw(address,uint256,address)": "withdraw",
+        "borrow(address,uint256,uint256,uint16,address)": "borrow",
+        "repay(address,uint256,uint256,address)": "repay",
+        "setUserUseReserveAsCollateral(address,bool)": "setCollateral",
+    })
+    # supply: pull the tokens, then collateral[onBehalfOf][asset] += amount
+    program += ([("label", "supply")] +
+                _token_call(_arg(0), "transferFrom(address,address,uint256)", [["CALLER"], ["ADDRESS"], _arg(1)]) +
+                _hash2(_arg(2), _arg(0)) + ["DUP1", "SLOAD"] + _arg(1) + ["ADD", "SWAP1", "SSTORE", "STOP"])
+    # withdraw: amount = collateral when amount is uint256 max; revert if more than supplied
+    program += ([("label", "withdraw")] + _hash2(["CALLER"], _arg(0)) + ["DUP1", "SLOAD"] + _arg(1) +
+                ["DUP1", max_uint, "EQ", "ISZERO", ("ref", "withdraw_amount"), "JUMPI", "POP", "DUP1",
+                 ("label", "withdraw_amount"), "DUP2", "DUP2", "GT"] + _revert_if() +
+                ["DUP1", "SWAP2", "SUB", "DUP3", "SSTORE", "SWAP1", "POP"] +
+                _token_call(_arg(0), "transfer(address,uint256)", [_arg(2), ["DUP1"]]) + _return_top())
+    # borrow: debt[onBehalfOf][asset] += amount, then send the tokens
+    program += ([("label", "borrow")] + _hash2(_arg(4), _arg(0)) + [1, "ADD", "DUP1", "SLOAD"] + _arg(1) +
+                ["ADD", "SWAP1", "SSTORE"] +
+                _token_call(_arg(0), "transfer(address,uint256)", [["CALLER"], _arg(1)]) + ["STOP"])
+    # repay: amount is capped at the debt (so uint256 max repays everything), then pull the tokens
+    program += ([("label", "repay")] + _hash2(_arg(3), _arg(0)) + [1, "ADD", "DUP1", "SLOAD"] + _arg(1) +
+                ["DUP2", "DUP2", "GT", "ISZERO", ("ref", "repay_amount"), "JUMPI", "POP", "DUP1",
+                 ("label", "repay_amount"), "DUP1", "SWAP2", "SUB", "DUP3", "SSTORE", "SWAP1", "POP"] +
+                _token_call(_arg(0), "transferFrom(address,address,uint256)", [["CALLER"], ["ADDRESS"], ["DUP1"]]) +
+                _return_top())
+    program += ([("label", "setCollateral")] + _hash2(["CALLER"], _arg(0)) + [2, "ADD"] + _arg(1) +
+                ["SWAP1", "SSTORE", "STOP"])
+    return assemble(program)
+
+# ----- the chain -----
+
+def _revert_error(e: Exception) -> Dict[str, Any]:
+    """
+    A revert as a node reports it: code 3 with the revert data. eth-tester keeps
+    the data only for panics; an Error(string) reason and any other payload
+    (custom errors) survive only in the message, as the string or a bytes repr.
+    """
+    import ast
+    from eth_abi import encode
+
+    message = str(e.args[0]) if e.args else str(e)
+    data = getattr(e, "data", None)
+    prefix = "execution reverted: "
+    if data is None and message.startswith(prefix):
+        reason = message[len(prefix):]
+        if reason.startswith(("b'", 'b"')):
+            data = "0x" + ast.literal_eval(reason).hex()
+            message = "execution reverted"
+        else:
+            data = "0x08c379a0" + encode(["string"], [reason]).hex()
+    error = {"code": 3, "message": message}
+    if data and data != "0x":
+        error["data"] = data
+    return error
+
+class LocalChain:
+    """
+    In-process eth-tester chain, served as JSON-RPC over HTTP, with a mock
+    CELO token (18 decimals), a mock USDC (6 decimals) and a mock pool.
+
+    Accounts are derived from fixed keys so runs are reproducible; each is
+    funded with native currency and both tokens, and the pool holds USDC
+    liquidity to lend. `latency` seconds are added to every HTTP response to
+    approximate a remote node. eth-tester has no eth_getBlockReceipts; with
+    `block_receipts` it is answered from the block's per-transaction receipts.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8545, accounts: int = 4, latency: float = 0.0,
+                 block_receipts: bool = False):
+        from eth_account import Account
+        from eth_utils import keccak
+        from web3 import EthereumTesterProvider, Web3
+
+        self.w3 = Web3(EthereumTesterProvider())
+        self._request = self.w3.provider.request_func(self.w3, self.w3.middleware_onion)
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.block_receipts = block_receipts
+        self.keys = ["0x" + keccak(text=f"celo-local-{i}").hex() for i in range(accounts)]
+        self.addresses = [Account.from_key(key).address for key in self.keys]
+        self.contracts: Dict[str, str] = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _deploy(self, runtime: bytes) -> str:
+        w3 = self.w3
+        tx_hash = w3.eth.send_transaction({"from": w3.eth.accounts[0], "data": initcode(runtime), "gas": 3_000_000})
+        return w3.eth.wait_for_transaction_receipt(tx_hash)["contractAddress"]
+
+    def _mint(self, token: str, to: str, amount: int) -> None:
+        from eth_abi import encode
+        w3 = self.w3
+        data = function_selector("mint(address,uint256)") + encode(["address", "uint256"], [to, amount])
+        w3.eth.wait_for_transaction_receipt(w3.eth.send_transaction({"from": w3.eth.accounts[0], "to": token, "data": data}))
+
+    def deploy(self) -> Dict[str, str]:
+        """Deploy the mocks and fund every account; returns the contract addresses."""
+        w3 = self.w3
+        celo = self._deploy(mock_erc20_runtime("CELO", 18))
+        usdc = self._deploy(mock_erc20_runtime("USDC", 6))
+        pool = self._deploy(mock_pool_runtime())
+        self._mint(usdc, pool, 10**12 * 10**6)
+        for address in self.addresses:
+            w3.eth.wait_for_transaction_receipt(w3.eth.send_transaction(
+                {"from": w3.eth.accounts[0], "to": address, "value": 1000 * 10**18}))
+            self._mint(celo, address, 10**6 * 10**18)
+            self._mint(usdc, address, 10**6 * 10**6)
+        self.contracts = {"LENDING_POOL": pool, "CELO_TOKEN": celo, "USDC_TOKEN": usdc}
+        return self.contracts
+
+    def profile(self) -> Dict[str, Any]:
+        """The 'local' profile for utils/profiles.py."""
+        return {
+            "name": "local",
+            "chain_id": self.w3.eth.chain_id,
+            "rpc_urls": [self.url],
+            "explorer_tx_url": "",
+            "aave": dict(self.contracts),
+        }
+
+    def start(self) -> "LocalChain":
+        if not self.contracts:
+            self.deploy()
+        threading.Thread(target=self._httpd.serve_forever, name="local-chain", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _get_block_receipts(self, block_id: Any) -> Dict[str, Any]:
+        block = self._request("eth_getBlockByNumber", [block_id, False])
+        if block.get("result") is None:
+            return block
+        return {"result": [self._request("eth_getTransactionReceipt", [tx_hash])["result"]
+                           for tx_hash in block["result"]["transactions"]]}
+
+    def _call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        from web3 import Web3
+        try:
+            with self._lock:
+                if request["method"] == "eth_getBlockReceipts" and self.block_receipts:
+                    raw = self._get_block_receipts(request.get("params", [])[0])
+                else:
+                    raw = self._request(request["method"], request.get("params", []))
+            response = {k: v for k, v in json.loads(Web3.to_json(raw)).items() if k in ("result", "error")}
+        except Exception as e:
+            # Surface EVM reverts the way nodes do, so simulate_transaction can report them
+            if getattr(e, "data", None) is not None or "revert" in str(e).lower():
+                response = {"error": _revert_error(e)}
+            else:
+                response = {"error": {"code": -32000, "message": str(e)}}
+        return dict(response, jsonrpc="2.0", id=request.get("id"))
+
+    def _handler(self):
+        chain = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if isinstance(payload, list):
+                    result: Any = [chain._call(request) for request in payload]
+                else:
+                    result = chain._call(payload)
+                if chain.latency:
+                    time.sleep(chain.latency)
+                body = json.dumps(result).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    from utils.profiles import PROFILE_ENV, save_profile
+
+    parser = argparse.ArgumentParser(description="Run a local chain with mock Aave contracts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--accounts", type=int, default=4, help="Funded accounts to create")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--block-receipts", action="store_true", help="Answer eth_getBlockReceipts")
+    parser.add_argument("--profile-file", default=None, help="Where to write the 'local' profile")
+    args = parser.parse_args()
+
+    chain = LocalChain(args.host, args.port, args.accounts, args.latency, args.block_receipts).start()
+    path = save_profile(chain.profile(), args.profile_file)
+    logger.info(f"Local chain on {chain.url} with contracts {chain.contracts}")
+    print(f"Local chain on {chain.url}; profile written to {path}")
+    print(f"  export {PROFILE_ENV}=local")
+    for address, key in zip(chain.addresses, chain.keys):
+        print(f"  account {address}  key {key}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        chain.stop()
+
+if __name__ == "__main__":
+    main()
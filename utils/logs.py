@@ -0,0 +1,151 @@
+# utils/logs.py - eth_getLogs with adaptive range splitting and parallel range fetching
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.helpers import logger
+from utils.metrics import propagate_context
+
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# JSON-RPC errors that mean "ask for a smaller range", across geth, Erigon and hosted providers. Only
+# error responses from a node are matched: a transport timeout or a gas error is not a range problem.
+_RANGE_ERROR_CODES = {-32005}  # Infura "limit exceeded"
+_RANGE_ERRORS = re.compile("|".join((
+    r"query returned more than \d+ results",           # geth, Infura
+    r"log response size exceeded",                     # Alchemy
+    r"response size should not greater than",          # BSC-style nodes
+    r"block range (is )?too (large|wide)",             # Erigon, Ankr, BlockPI
+    r"range is too large",
+    r"exceed(ed|s)? (the )?maximum block range",       # Polygon Bor, Chainstack
+    r"is limited to a [\d,]+ (block )?range",          # QuickNode
+    r"too many (blocks|logs|results)",
+    r"query timeout exceeded",                         # the node gave up on the query, not the connection
+)), re.IGNORECASE)
+
+# Alchemy/Infura suggest a working range, e.g. "this block range should work: [0x1, 0x2f]"
+_SUGGESTED_RANGE = re.compile(r"\[(0x[0-9a-fA-F]+),\s*(0x[0-9a-fA-F]+)\]")
+
+def address_topic(address: str) -> str:
+    """Left-pad an address to a 32-byte log topic."""
+    return "0x" + "0" * 24 + address.lower()[2:]
+
+def topic_address(topic: Any) -> str:
+    """Recover the address from an indexed address topic."""
+    if isinstance(topic, (bytes, bytearray)):
+        return "0x" + bytes(topic)[-20:].hex()
+    return "0x" + topic[-40:].lower()
+
+def is_erc20_transfer(log: Dict) -> bool:
+    """
+    Whether a Transfer log is ERC-20's: three topics and the value as 32 bytes
+    of data. ERC-721 Transfer shares topic0 but indexes the token id as a
+    fourth topic and has no data.
+    """
+    data = log.get("data") or b""
+    size = len(data) if isinstance(data, (bytes, bytearray)) else (len(data) - 2) // 2
+    return len(log.get("topics", [])) == 3 and size == 32
+
+def _rpc_error(error: Exception) -> Optional[Dict]:
+    """The JSON-RPC error object behind an exception, or None for transport and other failures."""
+    response = getattr(error, "rpc_response", None)
+    if isinstance(response, dict) and isinstance(response.get("error"), dict):
+        return response["error"]
+    if error.args and isinstance(error.args[0], dict):
+        return error.args[0]
+    return None
+
+def _is_range_error(error: Exception) -> bool:
+    rpc_error = _rpc_error(error)
+    if rpc_error is None:
+        return False
+    return rpc_error.get("code") in _RANGE_ERROR_CODES or bool(_RANGE_ERRORS.search(str(rpc_error.get("message", ""))))
+
+def _split_ranges(from_block: int, to_block: int, chunk_size: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + chunk_size - 1, to_block)) for start in range(from_block, to_block + 1, chunk_size)]
+
+# Ranges of one get_logs call run on several threads and share its stats
+_stats_lock = threading.Lock()
+
+def _count(stats: Dict, key: str) -> None:
+    with _stats_lock:
+        stats[key] += 1
+
+def _fetch_range(w3, log_filter: Dict, from_block: int, to_block: int, stats: Dict) -> List[Dict]:
+    """Fetch one range, bisecting it whenever the node refuses it as too large."""
+    pending = [(from_block, to_block)]
+    logs: List[Dict] = []
+    while pending:
+        start, end = pending.pop()
+        try:
+            _count(stats, "calls")
+            logs.extend(w3.eth.get_logs(dict(log_filter, fromBlock=start, toBlock=end)))
+        except Exception as e:
+            if not _is_range_error(e) or start == end:
+                raise
+            _count(stats, "splits")
+            suggested = _SUGGESTED_RANGE.search(str(e))
+            if suggested:
+                hint_end = int(suggested.group(2), 16)
+                if start <= hint_end < end:
+                    pending.extend([(hint_end + 1, end), (start, hint_end)])
+                    continue
+            middle = (start + end) // 2
+            pending.extend([(middle + 1, end), (start, middle)])
+    return logs
+
+def get_logs(w3, from_block: int, to_block: int, topics: Sequence[Any], addresses: Optional[Sequence[str]] = None,
+             chunk_size: int = 50_000, max_workers: int = 4, stats: Optional[Dict] = None) -> List[Dict]:
+    """
+    eth_getLogs over [from_block, to_block] in parallel chunks.
+
+    Chunks that the node rejects as too large (result limits, range limits or
+    timeouts) are split in half, or at the node's suggested boundary, until they
+    succeed. Results are returned in (blockNumber, logIndex) order.
+    """
+    log_filter: Dict[str, Any] = {"topics": list(topics)}
+    if addresses:
+        log_filter["address"] = list(addresses) if len(addresses) > 1 else addresses[0]
+
+    stats = stats if stats is not None else {}
+    stats.setdefault("calls", 0)
+    stats.setdefault("splits", 0)
+
+    ranges = _split_ranges(from_block, to_block, chunk_size)
+    if len(ranges) == 1 or max_workers <= 1:
+        results = [_fetch_range(w3, log_filter, start, end, stats) for start, end in ranges]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ranges))) as pool:
+            fetch = propagate_context(_fetch_range)
+            futures = [pool.submit(fetch, w3, log_filter, start, end, stats) for start, end in ranges]
+            results = [f.result() for f in futures]
+
+    logs = [log for chunk in results for log in chunk]
+    logs.sort(key=lambda log: (log["blockNumber"], log["logIndex"]))
+    logger.info(f"eth_getLogs {from_block}-{to_block}: {len(logs)} logs in {stats['calls']} calls ({stats['splits']} splits)")
+    return logs
+
+def get_transfer_logs(w3, address: str, from_block: int, to_block: int, tokens: Optional[Sequence[str]] = None,
+                      **kwargs) -> List[Dict]:
+    """
+    ERC-20 Transfer logs sent or received by `address`, optionally limited to token contracts.
+
+    Runs one query with the address as sender (topic1) and one as recipient
+    (topic2); self-transfers matching both are returned once. ERC-721
+    transfers, which share the event signature, are left out.
+    """
+    topic = address_topic(address)
+    sent = get_logs(w3, from_block, to_block, [TRANSFER_TOPIC, topic], tokens, **kwargs)
+    received = get_logs(w3, from_block, to_block, [TRANSFER_TOPIC, None, topic], tokens, **kwargs)
+
+    seen = set()
+    merged = []
+    for log in sent + received:
+        key = (bytes(log["transactionHash"]), log["logIndex"])
+        if key not in seen and is_erc20_transfer(log):
+            seen.add(key)
+            merged.append(log)
+    merged.sort(key=lambda log: (log["blockNumber"], log["logIndex"]))
+    return merged
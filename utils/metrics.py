@@ -0,0 +1,287 @@
+# utils/metrics.py - Per-tool and per-RPC-method latency histograms and counters
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.helpers import logger, request_id_var, tool_name_var
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of latencies in microseconds.
+
+    Values are bucketed with 16 linear sub-buckets per power of two, so any
+    recorded value is reported within ~6% regardless of magnitude, with
+    constant memory and O(1) recording.
+    """
+
+    SUB_BUCKETS = 16
+    _SHIFT = 4  # log2(SUB_BUCKETS)
+
+    def __init__(self):
+        self.counts: List[int] = []
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        if value < cls.SUB_BUCKETS:
+            return value
+        exponent = value.bit_length() - 1
+        sub = (value >> (exponent - cls._SHIFT)) - cls.SUB_BUCKETS
+        return cls.SUB_BUCKETS + (exponent - cls._SHIFT) * cls.SUB_BUCKETS + sub
+
+    @classmethod
+    def _bucket_value(cls, index: int) -> int:
+        """Midpoint of a bucket's value range."""
+        if index < cls.SUB_BUCKETS:
+            return index
+        exponent = (index - cls.SUB_BUCKETS) // cls.SUB_BUCKETS + cls._SHIFT
+        sub = (index - cls.SUB_BUCKETS) % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        width = 1 << (exponent - cls._SHIFT)
+        return sub * width + width // 2
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total_us += value
+        self.max_us = max(self.max_us, value)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency in milliseconds at percentile `p` (0-100)."""
+        if not self.count:
+            return None
+        rank = max(1, int(round(p / 100 * self.count)))
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= rank:
+                return min(self._bucket_value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_us / self.count / 1000, 2) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_us / 1000 if self.count else None,
+        }
+
+class ToolCallStats:
+    """Counters for one in-flight tool call, reachable from the RPC layer through a contextvar."""
+
+    __slots__ = ("rpc_calls", "rpc_bytes", "cache_hits")
+
+    def __init__(self):
+        self.rpc_calls = 0
+        self.rpc_bytes = 0
+        self.cache_hits = 0
+
+_current_call: contextvars.ContextVar[Optional[ToolCallStats]] = contextvars.ContextVar("tool_call_stats", default=None)
+
+class MetricsRegistry:
+    """Aggregated metrics for tools and RPC methods."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self.rpc: Dict[str, Dict[str, Any]] = {}
+        self.loop_lag = LatencyHistogram()
+
+    @staticmethod
+    def _new_entry() -> Dict[str, Any]:
+        return {"latency": LatencyHistogram(), "calls": 0, "errors": 0,
+                "rpc_calls": 0, "rpc_bytes": 0, "cache_hits": 0}
+
+    def record_tool(self, name: str, seconds: float, stats: ToolCallStats, error: bool) -> None:
+        with self._lock:
+            entry = self.tools.setdefault(name, self._new_entry())
+            entry["latency"].record(seconds)
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["rpc_calls"] += stats.rpc_calls
+            entry["rpc_bytes"] += stats.rpc_bytes
+            entry["cache_hits"] += stats.cache_hits
+
+    def record_rpc(self, method: str, seconds: float, cached: bool, error: bool, nbytes: int = 0) -> None:
+        with self._lock:
+            entry = self.rpc.setdefault(method, self._new_entry())
+            entry["latency"].record(seconds)
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["cache_hits"] += int(cached)
+            entry["rpc_bytes"] += nbytes
+            call = _current_call.get()
+            if call is not None:
+                if cached:
+                    call.cache_hits += 1
+                else:
+                    call.rpc_calls += 1
+                    call.rpc_bytes += nbytes
+
+    def record_loop_lag(self, seconds: float) -> None:
+        with self._lock:
+            self.loop_lag.record(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            def render(entries: Dict[str, Dict[str, Any]], rpc: bool) -> Dict[str, Any]:
+                out = {}
+                for name, entry in sorted(entries.items()):
+                    row = dict(entry["latency"].summary(), calls=entry["calls"], errors=entry["errors"],
+                               cache_hits=entry["cache_hits"], bytes=entry["rpc_bytes"])
+                    if not rpc:
+                        row["rpc_calls"] = entry["rpc_calls"]
+                    out[name] = row
+                return out
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "tools": render(self.tools, rpc=False),
+                "rpc_methods": render(self.rpc, rpc=True),
+                "event_loop_lag": self.loop_lag.summary(),
+            }
+
+    def prometheus(self) -> str:
+        """Metrics in Prometheus text exposition format (summaries with p50/p95/p99 quantiles)."""
+        snapshot = self.snapshot()
+        lines = []
+        for family, label, rows in (("celo_mcp_tool", "tool", snapshot["tools"]),
+                                    ("celo_mcp_rpc", "method", snapshot["rpc_methods"])):
+            lines.append(f"# TYPE {family}_latency_seconds summary")
+            for name, row in rows.items():
+                for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                    if row[key] is not None:
+                        lines.append(f'{family}_latency_seconds{{{label}="{name}",quantile="{quantile}"}} {row[key] / 1000:.6f}')
+                lines.append(f'{family}_latency_seconds_count{{{label}="{name}"}} {row["count"]}')
+            for counter, key in (("calls", "calls"), ("errors", "errors"), ("cache_hits", "cache_hits"), ("bytes", "bytes")):
+                lines.append(f"# TYPE {family}_{counter}_total counter")
+                for name, row in rows.items():
+                    lines.append(f'{family}_{counter}_total{{{label}="{name}"}} {row[key]}')
+        lag = snapshot["event_loop_lag"]
+        lines.append("# TYPE celo_mcp_event_loop_lag_seconds summary")
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+            if lag[key] is not None:
+                lines.append(f'celo_mcp_event_loop_lag_seconds{{quantile="{quantile}"}} {lag[key] / 1000:.6f}')
+        lines.append(f"celo_mcp_event_loop_lag_seconds_count {lag['count']}")
+        lines.append("# TYPE celo_mcp_tool_rpc_calls_total counter")
+        for name, row in snapshot["tools"].items():
+            lines.append(f'celo_mcp_tool_rpc_calls_total{{tool="{name}"}} {row["rpc_calls"]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Atomically write the Prometheus text dump to a file (e.g. for node_exporter's textfile collector)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+# Create a single shared registry
+metrics = MetricsRegistry()
+
+def _is_error_result(result: Any) -> bool:
+    """Tools report most failures as return values rather than exceptions."""
+    if not isinstance(result, str):
+        return False
+    head = result[:200]
+    return head.startswith(("Error", "Invalid", "Unknown", "Web3 library not installed")) or '"success": false' in head
+
+class LoopLagMonitor:
+    """
+    Samples event-loop lag: how late a periodic sleep wakes up. Sustained lag
+    means something is blocking the loop (synchronous I/O or CPU work in a tool).
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def ensure_started(self) -> None:
+        """Start sampling on the running loop (once per loop)."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            self._loop = loop
+            loop.create_task(self._run(loop))
+
+    async def _run(self, loop: asyncio.AbstractEventLoop) -> None:
+        while self._loop is loop:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            metrics.record_loop_lag(max(0.0, loop.time() - started - self.interval))
+
+loop_lag_monitor = LoopLagMonitor()
+
+def instrument_tools(mcp) -> None:
+    """Wrap mcp.tool so every tool registered afterwards records latency, RPC usage and errors."""
+    original_tool = mcp.tool
+
+    def tool(*args, **kwargs):
+        register = original_tool(*args, **kwargs)
+
+        def decorator(fn: Callable):
+            name = kwargs.get("name") or fn.__name__
+
+            @functools.wraps(fn)
+            async def wrapper(*call_args, **call_kwargs):
+                loop_lag_monitor.ensure_started()
+                stats = ToolCallStats()
+                token = _current_call.set(stats)
+                # Correlation ID for every log record written while handling this call
+                request_token = request_id_var.set(uuid.uuid4().hex[:12])
+                tool_token = tool_name_var.set(name)
+                started = time.perf_counter()
+                error = True
+                try:
+                    result = await fn(*call_args, **call_kwargs)
+                    error = _is_error_result(result)
+                    return result
+                finally:
+                    elapsed = time.perf_counter() - started
+                    metrics.record_tool(name, elapsed, stats, error)
+                    logger.debug("tool call finished", extra={"duration_ms": round(elapsed * 1000, 1),
+                                                             "rpc_calls": stats.rpc_calls, "error": error})
+                    tool_name_var.reset(tool_token)
+                    request_id_var.reset(request_token)
+                    _current_call.reset(token)
+
+            return register(wrapper)
+        return decorator
+
+    mcp.tool = tool
+
+    dump_path = os.environ.get("CELO_MCP_METRICS_FILE")
+    if dump_path:
+        interval = float(os.environ.get("CELO_MCP_METRICS_INTERVAL", "15"))
+
+        def dump_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    metrics.dump(dump_path)
+                except OSError as e:
+                    logger.warning(f"Could not write metrics to {dump_path}: {e}")
+
+        threading.Thread(target=dump_loop, name="metrics-dump", daemon=True).start()
+
+def propagate_context(fn: Callable) -> Callable:
+    """Bind `fn` to a copy of the caller's context so pool threads attribute RPCs to the calling tool."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
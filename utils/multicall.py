@@ -0,0 +1,45 @@
+# utils/multicall.py - Multicall3 batching helpers for read-only contract calls
+from typing import Any, List, Sequence, Tuple
+
+# Multicall3 is deployed at the same address on Celo mainnet and Alfajores
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# aggregate3((address,bool,bytes)[]) and getBlockNumber() selectors
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+GET_BLOCK_NUMBER_SELECTOR = bytes.fromhex("42cbb15c")
+# getEthBalance(address) and getCurrentBlockTimestamp()
+GET_ETH_BALANCE_SELECTOR = bytes.fromhex("4d2301cc")
+GET_CURRENT_BLOCK_TIMESTAMP_SELECTOR = bytes.fromhex("0f28c97d")
+
+def aggregate3(w3, calls: Sequence[Tuple[str, bytes, bool]], block_identifier: Any = "latest") -> List[Tuple[bool, bytes]]:
+    """
+    Execute several read-only calls in a single eth_call through Multicall3.
+
+    Each call is a (target, calldata, allow_failure) tuple. Returns a list of
+    (success, return_data) tuples in the same order as the calls.
+    """
+    from eth_abi import decode, encode
+
+    if not calls:
+        return []
+
+    payload = AGGREGATE3_SELECTOR + encode(
+        ["(address,bool,bytes)[]"],
+        [[(target, allow_failure, bytes(calldata)) for target, calldata, allow_failure in calls]]
+    )
+    raw = w3.eth.call({"to": MULTICALL3_ADDRESS, "data": payload}, block_identifier=block_identifier)
+    return [(bool(success), bytes(data)) for success, data in decode(["(bool,bytes)[]"], raw)[0]]
+
+def encode_call(selector: bytes, arg_types: Sequence[str] = (), args: Sequence[Any] = ()) -> bytes:
+    """Build calldata from a 4-byte selector and ABI argument types."""
+    from eth_abi import encode
+
+    if not arg_types:
+        return bytes(selector)
+    return bytes(selector) + encode(list(arg_types), list(args))
+
+def function_selector(signature: str) -> bytes:
+    """Compute the 4-byte selector for a canonical function signature like 'balanceOf(address)'."""
+    from eth_utils import keccak
+
+    return keccak(text=signature)[:4]
@@ -0,0 +1,91 @@
+# utils/profiles.py - Network and contract profiles for the Aave tools, selected by environment
+import json
+import os
+from typing import Any, Dict
+
+from utils.helpers import get_cache_dir
+
+# Environment variables: the profile name, and an optional JSON file of extra or overriding profiles
+PROFILE_ENV = "CELO_MCP_PROFILE"
+PROFILE_FILE_ENV = "CELO_MCP_PROFILE_FILE"
+
+DEFAULT_PROFILE = "mainnet"
+
+# Built-in profiles. The first RPC URL is the primary (nonces and broadcasts),
+# the rest are read and failover alternates.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "mainnet": {
+        "name": "mainnet",
+        "chain_id": 42220,
+        "rpc_urls": [
+            "https://celo-mainnet.g.alchemy.com/v2/IJbweBVOnwnTeoaIg10-jGVFe8aPfaH5",
+            "https://forno.celo.org",
+        ],
+        "explorer_tx_url": "https://celoscan.io/tx/0x",
+        "aave": {
+            "LENDING_POOL": "0x3E59A31363E2ad014dcbc521c4a0d5757d9f3402",  # Aave lending pool
+            "CELO_TOKEN": "0x471EcE3750Da237f93B8E339c536989b8978a438",    # CELO token address
+            "USDC_TOKEN": "0xcebA9300f2b948710d2653dD7B07f33A8B32118C",    # USDC token address
+        },
+    },
+    # Contract addresses are filled in by the profile file utils/local_chain.py writes
+    "local": {
+        "name": "local",
+        "chain_id": None,
+        "rpc_urls": ["http://127.0.0.1:8545"],
+        "explorer_tx_url": "",
+        "aave": None,
+    },
+}
+
+_REQUIRED_CONTRACTS = ("LENDING_POOL", "CELO_TOKEN", "USDC_TOKEN")
+
+def profile_file() -> str:
+    """Profile file path (CELO_MCP_PROFILE_FILE, else profiles.json in the cache directory)."""
+    return os.environ.get(PROFILE_FILE_ENV) or os.path.join(get_cache_dir(), "profiles.json")
+
+def load_profile(name: str = None) -> Dict[str, Any]:
+    """
+    Resolve a profile by name (default: CELO_MCP_PROFILE, else mainnet).
+
+    Entries in the profile file are merged over the built-in profile of the
+    same name, so a file only needs the fields it changes.
+    """
+    name = name or os.environ.get(PROFILE_ENV) or DEFAULT_PROFILE
+    profiles = {key: dict(value) for key, value in PROFILES.items()}
+
+    path = profile_file()
+    if os.path.exists(path):
+        with open(path) as f:
+            for key, overrides in json.load(f).items():
+                profiles.setdefault(key, {"name": key}).update(overrides)
+
+    if name not in profiles:
+        raise ValueError(f"Unknown profile '{name}'. Available: {', '.join(sorted(profiles))}")
+    profile = profiles[name]
+    aave = profile.get("aave") or {}
+    missing = [key for key in _REQUIRED_CONTRACTS if not aave.get(key)]
+    if missing or not profile.get("rpc_urls"):
+        raise ValueError(f"Profile '{name}' is missing {', '.join(missing) or 'rpc_urls'}; "
+                         f"add it to {path} (for 'local', run: python -m utils.local_chain)")
+    return profile
+
+def save_profile(profile: Dict[str, Any], path: str = None) -> str:
+    """Add or replace a profile in the profile file; returns the file path."""
+    path = path or profile_file()
+    profiles = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            profiles = json.load(f)
+    profiles[profile["name"]] = profile
+    with open(path, "w") as f:
+        json.dump(profiles, f, indent=2)
+    return path
+
+_active: Dict[str, Any] = {}
+
+def active_profile() -> Dict[str, Any]:
+    """The profile selected for this process, resolved once."""
+    if not _active:
+        _active.update(load_profile())
+    return _active
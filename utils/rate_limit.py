@@ -0,0 +1,230 @@
+# utils/rate_limit.py - Per-endpoint token bucket and AIMD concurrency limit, with 429 detection and backoff
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from utils.deadline import current_budget, pause
+from utils.helpers import logger
+
+# Requests/second per endpoint (0: unlimited until the endpoint answers 429, then learned)
+DEFAULT_RATE = float(os.environ.get("CELO_MCP_RPC_RATE", "0"))
+# Starting and maximum in-flight requests per endpoint
+DEFAULT_CONCURRENCY = int(os.environ.get("CELO_MCP_RPC_CONCURRENCY", "8"))
+MAX_CONCURRENCY = int(os.environ.get("CELO_MCP_RPC_MAX_CONCURRENCY", "64"))
+# Retries of a rate-limited request on the same endpoint before failing over
+RATE_LIMIT_RETRIES = int(os.environ.get("CELO_MCP_RPC_RETRIES", "4"))
+
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 8.0
+
+class RateLimited(Exception):
+    """An endpoint kept answering 429 (or a JSON-RPC rate-limit error) through every retry."""
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens/second, holding at most `burst`.
+
+    A cost above `burst` (a large JSON-RPC batch) is admitted once the bucket
+    is full and leaves it in debt, so later takes wait until it is repaid;
+    otherwise it could never be admitted.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens and return 0.0, or take nothing and return the seconds until they accrue."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            needed = min(cost, self.burst)
+            if self.tokens >= needed:
+                self.tokens -= cost
+                return 0.0
+            return (needed - self.tokens) / self.rate
+
+class EndpointLimiter:
+    """
+    Admission control for one RPC endpoint, shared by every provider using it.
+
+    - Token bucket: at most `rate` requests/second. Without a configured rate
+      the bucket is off until the endpoint answers 429; it is then set to half
+      the rate being sent, and grows back by about 1 request/second for every
+      second of clean responses (AIMD on rate).
+    - Concurrency window: in-flight requests are capped at `limit`, which grows
+      by 1/limit per fast success, halves on a 429 and shrinks 10% when latency
+      climbs well above the best seen (AIMD on concurrency).
+    - A Retry-After pauses every request to the endpoint for that long.
+    """
+
+    MIN_LIMIT = 1.0
+    MIN_RATE = 1.0
+    # Latency beyond TOLERANCE x baseline + SLACK counts as congestion
+    LATENCY_TOLERANCE = 2.0
+    LATENCY_SLACK = 0.05
+    # Concurrent 429s from one burst are one signal: decrease at most this often
+    DECREASE_INTERVAL = 0.2
+    # How often throttled waiters re-check for cancellation
+    WAIT_SLICE = 0.1
+
+    def __init__(self, url: str, rate: float = DEFAULT_RATE, limit: int = DEFAULT_CONCURRENCY,
+                 max_limit: int = MAX_CONCURRENCY):
+        self.url = url
+        self.max_rate = rate or None
+        self.bucket = TokenBucket(rate) if rate else None
+        self.limit = float(max(1, limit))
+        self.max_limit = max(1, max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.base_latency: Optional[float] = None
+        self.rate_limited = 0
+        self.throttled = 0
+        self._sent = deque(maxlen=4096)
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, cost: int = 1) -> None:
+        """Block until a request (or a batch of `cost`) may be sent; raises if the call is cancelled."""
+        budget = current_budget()
+        with self._cond:
+            waited = False
+            while True:
+                if budget is not None:
+                    budget.check()
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= int(self.limit):
+                    wait = self.WAIT_SLICE
+                else:
+                    wait = self.bucket.take(cost) if self.bucket is not None else 0.0
+                if not wait:
+                    self.in_flight += 1
+                    self._sent.append((now, cost))
+                    return
+                if not waited:
+                    waited = True
+                    self.throttled += 1
+                self._cond.wait(min(wait, self.WAIT_SLICE))
+
+    def release(self, latency: Optional[float] = None, rate_limited: bool = False,
+                retry_after: Optional[float] = None, cost: int = 1) -> None:
+        """
+        Return the slot; `latency` is given for successes, `rate_limited` for 429s.
+        A successful batch of `cost` requests grows the rate as much as that many
+        single successes; its latency says nothing about congestion.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                self.rate_limited += 1
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                if now - self._last_decrease >= self.DECREASE_INTERVAL:
+                    self._last_decrease = now
+                    self.limit = max(self.MIN_LIMIT, self.limit / 2)
+                    sending = self.bucket.rate if self.bucket is not None else self._recent_rate(now)
+                    rate = max(self.MIN_RATE, sending / 2)
+                    if self.bucket is None:
+                        self.bucket = TokenBucket(rate)
+                    self.bucket.rate = rate
+                    self.bucket.burst = max(1.0, rate)
+                    logger.warning(f"RPC endpoint {self.url} rate limited; now {rate:.1f} req/s, "
+                                   f"{int(self.limit)} in flight" + (f", paused {retry_after:.1f}s" if retry_after else ""))
+            elif latency is not None and cost > 1:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                if self.bucket is not None:
+                    self._grow_rate(cost)
+            elif latency is not None:
+                if self.base_latency is None or latency < self.base_latency:
+                    self.base_latency = latency
+                else:
+                    # Drift up slowly, so an endpoint that got permanently slower gets a new baseline
+                    self.base_latency += 0.01 * (latency - self.base_latency)
+                congested = latency > self.LATENCY_TOLERANCE * self.base_latency + self.LATENCY_SLACK
+                if congested and now - self._last_decrease >= self.DECREASE_INTERVAL:
+                    self._last_decrease = now
+                    self.limit = max(self.MIN_LIMIT, self.limit * 0.9)
+                elif not congested:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                    if self.bucket is not None:
+                        self._grow_rate(1)
+            self._cond.notify_all()
+
+    def _grow_rate(self, successes: int) -> None:
+        """Additive increase: about 1 request/second per second of clean responses."""
+        rate = self.bucket.rate
+        for _ in range(successes):
+            rate += 1 / rate
+        self.bucket.rate = min(rate, self.max_rate) if self.max_rate else rate
+        self.bucket.burst = max(1.0, self.bucket.rate)
+
+    def _recent_rate(self, now: float) -> float:
+        """Requests sent in the last second, counting each request of a batch."""
+        return float(sum(cost for sent, cost in self._sent if now - sent <= 1.0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "rate_limit_rps": round(self.bucket.rate, 1) if self.bucket is not None else None,
+                "concurrency_limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "rate_limited": self.rate_limited,
+                "throttled": self.throttled,
+            }
+
+_limiters: Dict[str, EndpointLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def endpoint_limiter(url: str) -> EndpointLimiter:
+    limiter = _limiters.get(url)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.setdefault(url, EndpointLimiter(url))
+    return limiter
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header: delta seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def rate_limit_delay(error: Exception) -> Optional[float]:
+    """For an HTTP 429 error, the Retry-After delay (0.0 if none given); None for any other error."""
+    response = getattr(error, "response", None)
+    if response is None or getattr(response, "status_code", None) != 429:
+        return None
+    return retry_after_seconds(response.headers.get("Retry-After")) or 0.0
+
+def is_rate_limit_response(response: Any) -> bool:
+    """JSON-RPC errors some providers send with HTTP 200 instead of a 429."""
+    if not isinstance(response, dict) or not isinstance(response.get("error"), dict):
+        return False
+    error = response["error"]
+    message = str(error.get("message", "")).lower()
+    return error.get("code") == 429 or "rate limit" in message or "too many requests" in message
+
+def backoff(attempt: int, retry_after: Optional[float] = None) -> None:
+    """Sleep before retry `attempt` (0-based): Retry-After if given, else full-jitter exponential backoff."""
+    if retry_after:
+        delay = retry_after + random.uniform(0, BACKOFF_BASE)
+    else:
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    pause(delay)
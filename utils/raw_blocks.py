@@ -0,0 +1,98 @@
+# utils/raw_blocks.py - Full blocks parsed straight from JSON-RPC bodies, formatted by web3 only where needed
+import json
+from typing import Any, Dict, List, Optional
+
+# orjson parses bodies about twice as fast as json; optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _loads(body: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except ValueError:
+            # e.g. a bare integer too large even for a double; json parses it exactly
+            pass
+    return json.loads(body)
+
+class RawBlock:
+    """
+    A full block as plain dicts, lists and strings, straight from the parser.
+
+    web3's result formatting (checksummed addresses, HexBytes, AttributeDict,
+    applied to every field of every transaction) costs around 20x the parse
+    of a full block, and a scan compares only `from` and `to` of most
+    transactions. Here addresses are compared as lowercase hex strings, and
+    only the header and matching transactions are formatted, into the same
+    objects w3.eth.get_block would have returned.
+
+    orjson reads integers beyond 64 bits as floats; nodes send quantities as
+    hex strings, but dev chains may not, so anything formatted from a float
+    is re-parsed with json first.
+    """
+
+    def __init__(self, response: Any, body: Optional[bytes] = None):
+        self._body = body
+        self._block = self._result(response)
+        self._exact_block: Optional[Dict[str, Any]] = None
+        self.transactions: List[Dict[str, Any]] = self._block.get("transactions") or []
+
+    @staticmethod
+    def _result(response: Any) -> Dict[str, Any]:
+        from web3.exceptions import BlockNotFound, Web3RPCError
+
+        if "error" in response:
+            raise Web3RPCError(str(response["error"]), rpc_response=response)
+        if response.get("result") is None:
+            raise BlockNotFound("Block not found")
+        return response["result"]
+
+    def _exact(self) -> Dict[str, Any]:
+        """The block re-parsed with json, for exact integers."""
+        if self._body is None or orjson is None:
+            return self._block
+        if self._exact_block is None:
+            self._exact_block = self._result(json.loads(self._body))
+        return self._exact_block
+
+    def header(self):
+        """The block without its transactions, formatted as by w3.eth.get_block."""
+        from web3._utils.method_formatters import block_result_formatter
+        from web3.datastructures import AttributeDict
+
+        block = self._block
+        if any(isinstance(value, float) for value in block.values()):
+            block = self._exact()
+        return AttributeDict.recursive(block_result_formatter(
+            {key: value for key, value in block.items() if key != "transactions"}))
+
+    def involving(self, address: str, start: int = 0) -> List[int]:
+        """Positions of the transactions, from `start` on, sent from or to an address."""
+        address = address.lower()
+        return [i for i in range(start, len(self.transactions))
+                if (self.transactions[i].get("from") or "").lower() == address or
+                (self.transactions[i].get("to") or "").lower() == address]
+
+    def materialize(self, position: int):
+        """The transaction at a position, formatted as by w3.eth.get_block(..., True)."""
+        from web3._utils.method_formatters import transaction_result_formatter
+        from web3.datastructures import AttributeDict
+
+        tx = self.transactions[position]
+        if any(isinstance(value, float) for value in tx.values()):
+            tx = self._exact()["transactions"][position]
+        return AttributeDict.recursive(transaction_result_formatter(tx))
+
+def fetch_block(w3, number: int) -> RawBlock:
+    """
+    A full block by number, parsed without web3's formatting. Providers with
+    make_raw_request (utils/rpc.py) hand over the undecoded body; any other
+    provider's decoded response is used as is.
+    """
+    params = [hex(number), True]
+    if hasattr(w3.provider, "make_raw_request"):
+        body = w3.provider.make_raw_request("eth_getBlockByNumber", params)
+        return RawBlock(_loads(body), body)
+    return RawBlock(w3.provider.make_request("eth_getBlockByNumber", params))
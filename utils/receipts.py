@@ -0,0 +1,89 @@
+# utils/receipts.py - Receipts for several transactions of one block in a single call
+from typing import Any, Dict, List, Optional, Sequence
+
+from utils.deadline import DeadlineExceeded
+from utils.helpers import logger
+
+# Whether eth_getBlockReceipts works, per provider (absent until first tried)
+_block_receipts_support: Dict[str, bool] = {}
+
+# How nodes word "no such method": geth, erigon, nethermind, and -32601 from the JSON-RPC spec
+_UNSUPPORTED_MARKERS = ("-32601", "method not found", "does not exist", "not available", "not supported",
+                        "unsupported", "unknown rpc")
+
+def _hash_key(tx_hash: Any) -> str:
+    """Lowercase 0x-prefixed hex for a hash given as bytes, HexBytes or str."""
+    if isinstance(tx_hash, str):
+        tx_hash = tx_hash.lower()
+        return tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash
+    return "0x" + bytes(tx_hash).hex()
+
+def _is_unsupported(error: Exception) -> bool:
+    from web3.exceptions import MethodUnavailable
+    if isinstance(error, MethodUnavailable):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _UNSUPPORTED_MARKERS)
+
+def block_receipts_supported(w3) -> Optional[bool]:
+    """What feature detection found for this provider: True, False, or None if not tried yet."""
+    return _block_receipts_support.get(str(w3.provider))
+
+def _batched_receipts(w3, tx_hashes: List[Any]) -> List[Any]:
+    """One JSON-RPC batch of eth_getTransactionReceipt; one call per hash if the endpoint refuses batches."""
+    try:
+        with w3.batch_requests() as batch:
+            for tx_hash in tx_hashes:
+                batch.add(w3.eth.get_transaction_receipt(tx_hash))
+            return list(batch.execute())
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.debug(f"Batched receipts failed ({e}); fetching {len(tx_hashes)} one by one")
+    receipts = []
+    for tx_hash in tx_hashes:
+        try:
+            receipts.append(w3.eth.get_transaction_receipt(tx_hash))
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            receipts.append(None)
+    return receipts
+
+def get_receipts(w3, block_number: int, tx_hashes: Sequence[Any]) -> List[Optional[Any]]:
+    """
+    Receipts for transactions of one block, in the order given (None where unavailable).
+
+    A single transaction costs one eth_getTransactionReceipt. Several use one
+    eth_getBlockReceipts when the node supports it; nodes without it are
+    detected on the first try and get one batch of per-transaction receipts
+    from then on.
+    """
+    tx_hashes = list(tx_hashes)
+    if not tx_hashes:
+        return []
+    if len(tx_hashes) == 1:
+        try:
+            return [w3.eth.get_transaction_receipt(tx_hashes[0])]
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            return [None]
+
+    provider = str(w3.provider)
+    if _block_receipts_support.get(provider, True):
+        try:
+            block_receipts = w3.eth.get_block_receipts(block_number)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if _is_unsupported(e):
+                logger.info(f"{provider} has no eth_getBlockReceipts; batching per-transaction receipts")
+                _block_receipts_support[provider] = False
+            else:
+                logger.debug(f"eth_getBlockReceipts failed for block {block_number}: {e}")
+        else:
+            _block_receipts_support[provider] = True
+            by_hash = {_hash_key(receipt["transactionHash"]): receipt for receipt in block_receipts}
+            return [by_hash.get(_hash_key(tx_hash)) for tx_hash in tx_hashes]
+    return _batched_receipts(w3, tx_hashes)
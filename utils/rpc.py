@@ -0,0 +1,428 @@
+# utils/rpc.py - Multi-endpoint JSON-RPC provider with latency-aware routing, hedging and circuit breaking
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from web3.providers import HTTPProvider, JSONBaseProvider
+
+from utils.block_store import BlockStore, block_store
+from utils.deadline import DeadlineExceeded, check_deadline, current_budget, wait_futures
+from utils.helpers import logger
+from utils.metrics import metrics
+from utils.rate_limit import (RATE_LIMIT_RETRIES, RateLimited, backoff, endpoint_limiter,
+                              is_rate_limit_response, rate_limit_delay)
+from utils.rpc_cache import BlockAwareCache
+
+# Methods that must all go to the same node: nonces and broadcasts have to agree
+# with each other, and a tx sent to one node may not have propagated to another yet
+PINNED_METHODS = frozenset({
+    "eth_sendRawTransaction",
+    "eth_sendTransaction",
+    "eth_getTransactionCount",
+})
+
+# Requests the on-disk block store answers, or learns the head from
+_BLOCK_STORE_METHODS = frozenset({"eth_blockNumber", "eth_getBlockByNumber", "eth_getBlockByHash",
+                                  "eth_getTransactionReceipt", "eth_getBlockReceipts"})
+
+# A broadcast, or the first sight of its receipt, means "latest" state has moved on
+_STATE_CHANGING = frozenset({"eth_sendRawTransaction", "eth_sendTransaction", "eth_getTransactionReceipt"})
+
+class EndpointStats:
+    """Health and latency bookkeeping for one RPC endpoint, shared by every provider using it."""
+
+    # EWMA smoothing factor; ~the last 10 requests dominate
+    ALPHA = 0.2
+    FAILURE_THRESHOLD = 3
+    BASE_COOLDOWN = 5.0
+    MAX_COOLDOWN = 60.0
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.cooldown = self.BASE_COOLDOWN
+        self.half_open = False
+        self._latencies = deque(maxlen=200)
+        self._p95: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def available(self, now: float) -> bool:
+        """Closed, or open with the cooldown elapsed (half-open: one trial request)."""
+        with self._lock:
+            if self.open_until == 0.0:
+                return True
+            if now >= self.open_until:
+                # Grant one trial; if it is never sent, another is granted after the next cooldown
+                self.half_open = True
+                self.open_until = now + self.cooldown
+                return True
+            return False
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.ewma_latency = latency if self.ewma_latency is None else \
+                self.ALPHA * latency + (1 - self.ALPHA) * self.ewma_latency
+            self.ewma_error_rate *= (1 - self.ALPHA)
+            self.consecutive_failures = 0
+            if self.open_until:
+                logger.info(f"RPC endpoint {self.url} recovered; closing circuit")
+            self.open_until = 0.0
+            self.half_open = False
+            self.cooldown = self.BASE_COOLDOWN
+            self._latencies.append(latency)
+            if self.requests % 10 == 0:
+                self._p95 = None
+
+    def record_failure(self, latency: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.ewma_error_rate = self.ALPHA + (1 - self.ALPHA) * self.ewma_error_rate
+            if self.half_open or self.consecutive_failures >= self.FAILURE_THRESHOLD:
+                if self.half_open:
+                    self.cooldown = min(self.cooldown * 2, self.MAX_COOLDOWN)
+                self.open_until = time.monotonic() + self.cooldown
+                self.half_open = False
+                logger.warning(f"RPC endpoint {self.url} failing; circuit open for {self.cooldown:.0f}s")
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of recent successful latencies (None until there are enough samples)."""
+        with self._lock:
+            if len(self._latencies) < 20:
+                return None
+            if self._p95 is None:
+                ordered = sorted(self._latencies)
+                self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+            return self._p95
+
+    def score(self) -> float:
+        """Lower is better: expected latency inflated by the recent error rate."""
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.0
+        return latency * (1 + 4 * self.ewma_error_rate) + self.ewma_error_rate
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "url": self.url,
+            "state": "open" if self.open_until else "closed",
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "p95_latency_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.ewma_error_rate, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+# Stats are per URL and shared, so every provider sees the same view of endpoint health
+_stats: Dict[str, EndpointStats] = {}
+_stats_lock = threading.Lock()
+
+def endpoint_stats(url: str) -> EndpointStats:
+    stats = _stats.get(url)
+    if stats is None:
+        with _stats_lock:
+            stats = _stats.setdefault(url, EndpointStats(url))
+    return stats
+
+def all_endpoint_stats() -> List[Dict[str, Any]]:
+    return [dict(stats.snapshot(), limiter=endpoint_limiter(stats.url).snapshot()) for stats in list(_stats.values())]
+
+# Response caches are shared by providers over the same set of endpoints (i.e. the same chain)
+_caches: Dict[frozenset, BlockAwareCache] = {}
+
+def response_cache(endpoint_urls: List[str]) -> BlockAwareCache:
+    key = frozenset(endpoint_urls)
+    with _stats_lock:
+        return _caches.setdefault(key, BlockAwareCache())
+
+def all_cache_stats() -> List[Dict[str, Any]]:
+    return [dict(cache.stats(), endpoints=sorted(urls)) for urls, cache in list(_caches.items())]
+
+# Shared worker pool for hedged requests, and for reads a cancelled call may abandon
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rpc")
+
+class MultiEndpointProvider(JSONBaseProvider):
+    """
+    Routes JSON-RPC requests across several equivalent endpoints.
+
+    - Reads go to the endpoint with the best EWMA latency/error score; if no answer
+      arrives within that endpoint's p95 latency, the request is hedged to the
+      next-best endpoint and the first successful response wins
+    - Transport failures fail over to the next endpoint immediately
+    - Endpoints that fail repeatedly are skipped until a cooldown passes (circuit breaker)
+    - Nonce lookups and broadcasts stay on one pinned endpoint (the primary while it is healthy)
+    - Reads go through a block-aware response cache shared by providers for the same endpoints,
+      and finalized blocks and receipts through a compressed on-disk store per chain
+    - Each endpoint has a shared token bucket and adaptive concurrency limit;
+      429s are retried with backoff (honouring Retry-After) before failing over
+    - A call stops waiting on reads, and sends nothing new, once its tool call is
+      cancelled or past its deadline (utils/deadline.py)
+    """
+
+    def __init__(self, endpoint_urls: List[str], request_timeout: float = 10.0, hedge: bool = True,
+                 min_hedge_delay: float = 0.05, default_hedge_delay: float = 1.0, explore_rate: float = 0.05,
+                 cache: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        if not endpoint_urls:
+            raise ValueError("At least one endpoint is required")
+        self.endpoint_urls = list(dict.fromkeys(endpoint_urls))
+        self.primary = self.endpoint_urls[0]
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.explore_rate = explore_rate
+        # Failover replaces web3's per-endpoint retries, which would hold a dead endpoint for seconds
+        self._providers = {
+            url: HTTPProvider(url, request_kwargs={"timeout": request_timeout}, exception_retry_configuration=None)
+            for url in self.endpoint_urls
+        }
+        self._pinned = self.primary
+        self.cache = response_cache(self.endpoint_urls) if cache else None
+        # Resolved on first use: the store is chosen by chain id and genesis hash
+        self._block_store: Optional[BlockStore] = None
+        self._block_store_retry_at = 0.0 if cache else float("inf")
+        self._block_store_lock = threading.Lock()
+
+    def __str__(self) -> str:
+        return f"MultiEndpointProvider({', '.join(self.endpoint_urls)})"
+
+    def _ranked(self) -> List[str]:
+        """Available endpoints, best score first; all endpoints if every circuit is open."""
+        now = time.monotonic()
+        available = [url for url in self.endpoint_urls if endpoint_stats(url).available(now)]
+        if not available:
+            return list(self.endpoint_urls)
+        ranked = sorted(available, key=lambda url: endpoint_stats(url).score())
+        # Occasionally lead with another endpoint so a demoted one can show it has recovered
+        if len(ranked) > 1 and random.random() < self.explore_rate:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def _send(self, url: str, method: str, params: Any, raw: bool = False) -> Tuple[Any, int]:
+        """
+        One request to one endpoint; returns (response, bytes on the wire).
+        With raw=True the response is the undecoded body.
+
+        Waits for the endpoint's limiter first. Rate-limit answers (HTTP 429 or a
+        JSON-RPC rate-limit error) are retried here with backoff, honouring
+        Retry-After, and raise RateLimited when retries run out so the caller
+        can fail over; they don't count against the circuit breaker.
+        """
+        provider = self._providers[url]
+        stats = endpoint_stats(url)
+        limiter = endpoint_limiter(url)
+        request_data = provider.encode_rpc_request(method, params)
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            limiter.acquire()
+            started = time.perf_counter()
+            try:
+                raw_response = provider._make_request(method, request_data)
+                # Only an error body can be a rate-limit answer; raw callers parse the rest themselves
+                response = raw_response if raw and b'"error"' not in raw_response \
+                    else provider.decode_rpc_response(raw_response)
+            except Exception as e:
+                retry_after = rate_limit_delay(e)
+                limiter.release(rate_limited=retry_after is not None, retry_after=retry_after)
+                if retry_after is None:
+                    stats.record_failure(time.perf_counter() - started)
+                    raise
+            else:
+                if not is_rate_limit_response(response):
+                    latency = time.perf_counter() - started
+                    limiter.release(latency)
+                    stats.record_success(latency)
+                    return raw_response if raw else response, len(request_data) + len(raw_response)
+                retry_after = None
+                limiter.release(rate_limited=True)
+            if attempt == RATE_LIMIT_RETRIES:
+                break
+            backoff(attempt, retry_after)
+        raise RateLimited(f"{url} is rate limiting {method} ({RATE_LIMIT_RETRIES + 1} attempts)")
+
+    def _send_pinned(self, method: str, params: Any, raw: bool = False) -> Tuple[Any, int]:
+        # Stay on the pinned endpoint while it works; move (and stay) elsewhere only when it fails
+        if self._pinned != self.primary and endpoint_stats(self.primary).available(time.monotonic()):
+            self._pinned = self.primary
+        candidates = [self._pinned] + [url for url in self._ranked() if url != self._pinned]
+        last_error: Optional[Exception] = None
+        for url in candidates:
+            try:
+                response = self._send(url, method, params, raw)
+                self._pinned = url
+                return response
+            except Exception as e:
+                if method == "eth_sendRawTransaction" and not _is_connection_error(e):
+                    # The node may have accepted the broadcast; resending elsewhere is unsafe
+                    raise
+                last_error = e
+        raise last_error
+
+    def _get_block_store(self) -> Optional[BlockStore]:
+        if self._block_store is not None or time.monotonic() < self._block_store_retry_at:
+            return self._block_store
+        # Non-blocking: the identity lookups below come back through make_request on this thread
+        if not self._block_store_lock.acquire(blocking=False):
+            return None
+        try:
+            self._block_store_retry_at = float("inf")
+            chain_id = self.make_request("eth_chainId", [])["result"]
+            chain_id = chain_id if isinstance(chain_id, int) else int(chain_id, 16)
+            genesis = self.make_request("eth_getBlockByNumber", ["0x0", False])["result"]["hash"]
+            self._block_store = block_store(chain_id, genesis)
+        except DeadlineExceeded:
+            self._block_store_retry_at = 0.0
+            raise
+        except Exception as e:
+            logger.debug(f"Block store unavailable for {self}: {e}")
+            self._block_store_retry_at = time.monotonic() + 60
+        finally:
+            self._block_store_lock.release()
+        return self._block_store
+
+    def make_request(self, method: str, params: Any) -> Any:
+        started = time.perf_counter()
+        sent = []
+
+        store = self._get_block_store() if method in _BLOCK_STORE_METHODS else None
+        if store is not None:
+            result = store.lookup(method, params)
+            if result is not None:
+                metrics.record_rpc(method, time.perf_counter() - started, cached=True, error=False)
+                return {"jsonrpc": "2.0", "id": 0, "result": result}
+
+        def fetch():
+            # Nothing new goes on the wire once the calling tool is cancelled or out of time
+            check_deadline()
+            response, nbytes = self._send_pinned(method, params) if method in PINNED_METHODS else self._route(method, params)
+            sent.append(nbytes)
+            return response
+
+        try:
+            if self.cache is not None and method not in PINNED_METHODS:
+                response = self.cache.get_or_fetch(method, params, fetch)
+            else:
+                response = fetch()
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            metrics.record_rpc(method, time.perf_counter() - started, cached=False, error=True)
+            raise
+        metrics.record_rpc(method, time.perf_counter() - started, cached=not sent,
+                           error=isinstance(response, dict) and "error" in response, nbytes=sum(sent))
+        if store is not None and sent:
+            store.observe(method, params, response)
+        # Our own writes change state before the TTL runs out; don't serve reads from before them
+        if self.cache is not None and sent and method in _STATE_CHANGING and isinstance(response, dict) \
+                and response.get("result"):
+            self.cache.invalidate_head()
+        return response
+
+    def make_raw_request(self, method: str, params: Any) -> bytes:
+        """
+        make_request for callers that parse the response body themselves
+        (utils/raw_blocks.py): returns it undecoded. Full blocks come from the
+        block store when it has them; the in-memory response cache, which holds
+        decoded responses, is bypassed.
+        """
+        started = time.perf_counter()
+        store = self._get_block_store() if method in _BLOCK_STORE_METHODS else None
+        if store is not None:
+            body = store.lookup_raw(method, params)
+            if body is not None:
+                metrics.record_rpc(method, time.perf_counter() - started, cached=True, error=False)
+                return body
+
+        check_deadline()
+        try:
+            body, nbytes = self._send_pinned(method, params, raw=True) if method in PINNED_METHODS \
+                else self._route(method, params, raw=True)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            metrics.record_rpc(method, time.perf_counter() - started, cached=False, error=True)
+            raise
+        metrics.record_rpc(method, time.perf_counter() - started, cached=False, error=b'"error"' in body, nbytes=nbytes)
+        if store is not None:
+            store.observe_raw(method, params, body)
+        return body
+
+    def _route(self, method: str, params: Any, raw: bool = False) -> Tuple[Any, int]:
+        if len(self.endpoint_urls) == 1:
+            if current_budget() is None:
+                return self._send_pinned(method, params, raw)
+            # Wait from here so a cancelled call returns at once; the request finishes on the pool
+            future = _executor.submit(self._send_pinned, method, params, raw)
+            wait_futures([future])
+            return future.result()
+
+        ranked = self._ranked()
+        last_error: Optional[Exception] = None
+        while ranked:
+            url = ranked.pop(0)
+            future = _executor.submit(self._send, url, method, params, raw)
+            hedge_future = None
+            if self.hedge and ranked:
+                delay = endpoint_stats(url).p95()
+                delay = max(delay, self.min_hedge_delay) if delay is not None else self.default_hedge_delay
+                done, _ = wait_futures([future], timeout=delay)
+                if not done:
+                    hedge_url = ranked.pop(0)
+                    logger.debug(f"Hedging {method} from {url} to {hedge_url} after {delay * 1000:.0f}ms")
+                    hedge_future = _executor.submit(self._send, hedge_url, method, params, raw)
+
+            outstanding = [f for f in (future, hedge_future) if f is not None]
+            while outstanding:
+                done, _ = wait_futures(outstanding)
+                for finished in done:
+                    outstanding.remove(finished)
+                    try:
+                        return finished.result()
+                    except Exception as e:
+                        last_error = e
+        raise last_error
+
+    def make_batch_request(self, requests: List[Any]) -> Any:
+        """
+        Send a JSON-RPC batch to the best endpoint, failing over on transport errors.
+        The batch counts as len(requests) against the endpoint's limiter, and 429s
+        are retried with backoff as in _send.
+        """
+        check_deadline()
+        last_error: Optional[Exception] = None
+        for url in self._ranked():
+            stats = endpoint_stats(url)
+            limiter = endpoint_limiter(url)
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                limiter.acquire(cost=len(requests))
+                started = time.perf_counter()
+                try:
+                    response = self._providers[url].make_batch_request(requests)
+                except Exception as e:
+                    retry_after = rate_limit_delay(e)
+                    limiter.release(rate_limited=retry_after is not None, retry_after=retry_after)
+                    last_error = e
+                    if retry_after is None:
+                        stats.record_failure(time.perf_counter() - started)
+                        break
+                    if attempt < RATE_LIMIT_RETRIES:
+                        backoff(attempt, retry_after)
+                    continue
+                limiter.release(time.perf_counter() - started, cost=len(requests))
+                stats.record_success(time.perf_counter() - started)
+                metrics.record_rpc("batch", time.perf_counter() - started, cached=False, error=not isinstance(response, list))
+                return response
+        metrics.record_rpc("batch", 0.0, cached=False, error=True)
+        raise last_error
+
+def _is_connection_error(error: Exception) -> bool:
+    import requests
+    return isinstance(error, (requests.exceptions.ConnectionError, ConnectionError))
@@ -0,0 +1,234 @@
+# utils/rpc_cache.py - Block-height-aware JSON-RPC response cache with request coalescing
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.block_store import FINALITY_DEPTH
+from utils.deadline import DeadlineExceeded, wait_futures
+
+# Methods whose result is fully determined by (params, block)
+BLOCK_SCOPED_METHODS = {
+    # method: index of the block parameter (None when the method has none and reads the head)
+    "eth_call": 1,
+    "eth_getBalance": 1,
+    "eth_getCode": 1,
+    "eth_getStorageAt": 2,
+    "eth_getBlockByNumber": 0,
+    "eth_getBlockTransactionCountByNumber": 0,
+    "eth_getBlockReceipts": 0,
+    "eth_blockNumber": None,
+    "eth_gasPrice": None,
+    "eth_getLogs": None,
+}
+
+# Results that never change once they exist
+IMMUTABLE_METHODS = {"eth_chainId", "net_version", "eth_getBlockByHash", "eth_getTransactionReceipt",
+                     "eth_getTransactionByHash"}
+
+# Looked up by transaction hash: final only once the block that includes them is
+_BY_TRANSACTION_HASH = {"eth_getTransactionReceipt", "eth_getTransactionByHash"}
+
+_BLOCK_TAGS = ("latest", "safe", "finalized", "earliest")
+
+def _block_number(value: Any) -> Optional[int]:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith("0x") and len(value) < 66:
+        return int(value, 16)
+    return None
+
+class BlockAwareCache:
+    """
+    Read-through cache for JSON-RPC responses keyed by (method, params, block).
+
+    Requests against "latest" (or with no block) are keyed by the current head
+    when head tracking is live (set_head called recently, e.g. from a newHeads
+    subscription), so a new block invalidates them. Without head tracking they
+    expire after a short TTL. Requests for block hashes, and for block numbers
+    at least `finality_depth` below the highest head seen (from set_head or
+    eth_blockNumber), as the block store does, are kept until evicted; nearer
+    blocks can still be reorged, or not yet exist on a lagging endpoint, and
+    are treated like "latest". "pending" and null results are never cached.
+
+    Concurrent identical requests are coalesced into a single upstream call.
+    """
+
+    def __init__(self, ttl: float = 1.0, max_entries: int = 10000, head_stale_after: float = 30.0,
+                 finality_depth: int = FINALITY_DEPTH):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.head_stale_after = head_stale_after
+        self.finality_depth = finality_depth
+        self.head: Optional[int] = None
+        self.safe_block = -1
+        # Part of the key of head-scoped entries; invalidate_head bumps it so responses still in flight land unreachable
+        self._generation = 0
+        self._head_seen_at = 0.0
+        # key -> (response, head tag or None, expires_at or None)
+        self._entries: "OrderedDict[Tuple, Tuple[Any, Optional[int], Optional[float]]]" = OrderedDict()
+        self._inflight: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.uncacheable = 0
+        self.miss_time = 0.0
+        self.by_method: Dict[str, Dict[str, int]] = {}
+
+    def set_head(self, number: int) -> None:
+        """Record a new chain head; entries keyed by an older head become unreachable and are dropped."""
+        with self._lock:
+            self._head_seen_at = time.monotonic()
+            self.safe_block = max(self.safe_block, number - self.finality_depth)
+            if self.head is not None and number <= self.head:
+                return
+            self.head = number
+            stale = [key for key, (_, head, _) in self._entries.items() if head is not None and head < number]
+            for key in stale:
+                del self._entries[key]
+
+    def invalidate_head(self) -> None:
+        """
+        Drop every entry that depends on the head, TTL-scoped or keyed by the
+        current head, e.g. after a transaction this process sent was mined.
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, (_, head, expires_at) in self._entries.items()
+                     if head is not None or expires_at is not None]
+            for key in stale:
+                del self._entries[key]
+
+    def head_tracking(self) -> bool:
+        return self.head is not None and time.monotonic() - self._head_seen_at < self.head_stale_after
+
+    def _final(self, block: Any) -> bool:
+        number = _block_number(block)
+        return number is not None and number <= self.safe_block
+
+    def _scope(self, method: str, params: Any) -> Optional[str]:
+        """Classify a request: 'fixed', 'head' (depends on the chain head) or None if it must not be cached."""
+        if method in IMMUTABLE_METHODS:
+            return "fixed"
+        if method not in BLOCK_SCOPED_METHODS:
+            return None
+        index = BLOCK_SCOPED_METHODS[method]
+        if method == "eth_getLogs":
+            log_filter = params[0] if params else {}
+            if "blockHash" in log_filter:
+                return "fixed"
+            if "pending" in (log_filter.get("fromBlock"), log_filter.get("toBlock")):
+                return None
+            return "fixed" if self._final(log_filter.get("toBlock", "latest")) else "head"
+        block = params[index] if index is not None and len(params) > index else "latest"
+        if isinstance(block, dict):
+            # EIP-1898 block parameter
+            if "blockHash" in block:
+                return "fixed"
+            block = block.get("blockNumber", "latest")
+        if block == "pending":
+            return None
+        if index is None or block in _BLOCK_TAGS:
+            return "head"
+        if isinstance(block, str) and len(block) == 66:
+            # A block hash
+            return "fixed"
+        return "fixed" if self._final(block) else "head"
+
+    def _count(self, method: str, outcome: str) -> None:
+        counts = self.by_method.setdefault(method, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def get_or_fetch(self, method: str, params: Any, fetch: Callable[[], Any]) -> Any:
+        scope = self._scope(method, params)
+        if scope is None:
+            self.uncacheable += 1
+            return fetch()
+
+        now = time.monotonic()
+        with self._lock:
+            head_live = scope == "head" and self.head_tracking()
+            head_tag = self.head if head_live else None
+            generation = self._generation if scope == "head" else 0
+        key = (method, json.dumps(params, sort_keys=True, default=str), head_tag, generation)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, _, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self._count(method, "hits")
+                    return response
+                del self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+                self.hits += 1
+                self._count(method, "hits")
+
+        if not owner:
+            # Share the owner's request, but stop waiting when our own call is cancelled or out of time
+            wait_futures([future])
+            try:
+                return future.result()
+            except DeadlineExceeded:
+                # It was the owner's call that gave up, not ours
+                return fetch()
+
+        started = time.perf_counter()
+        try:
+            response = fetch()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self.misses += 1
+            self._count(method, "misses")
+            self.miss_time += time.perf_counter() - started
+            # Errors and null results (blocks, receipts or transactions that don't exist yet) are not cached
+            result = response.get("result") if isinstance(response, dict) and "error" not in response else None
+            if method == "eth_blockNumber" and result is not None:
+                self.safe_block = max(self.safe_block, (_block_number(result) or 0) - self.finality_depth)
+            if result is not None:
+                expires_at = now + self.ttl if scope == "head" and not head_live else None
+                if method in _BY_TRANSACTION_HASH and not (isinstance(result, dict) and self._final(result.get("blockNumber"))):
+                    # Pending, or in a block that can still be reorged
+                    expires_at = now + self.ttl
+                self._entries[key] = (response, head_tag, expires_at)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(response)
+        return response
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "head": self.head,
+            "safe_block": self.safe_block,
+            "head_tracking": self.head_tracking(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "uncacheable": self.uncacheable,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "avg_miss_latency_ms": round(self.miss_time / self.misses * 1000, 1) if self.misses else None,
+            "by_method": {m: dict(c) for m, c in self.by_method.items()},
+        }
@@ -0,0 +1,272 @@
+# utils/rpc_replay.py - JSON-RPC and Dune API record/replay server for offline benchmarks
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+from utils.helpers import logger
+from utils.rate_limit import TokenBucket
+
+# Environment variable that routes every RPC endpoint through a record/replay server
+PROXY_ENV = "CELO_MCP_RPC_PROXY"
+
+DUNE_UPSTREAM = "https://api.dune.com"
+
+# Broadcasts embed signatures that need not be byte-identical between runs
+_MATCH_BY_METHOD = {"eth_sendRawTransaction"}
+
+def proxied_url(proxy: str, upstream: str) -> str:
+    """URL on the record/replay server that stands in for `upstream`."""
+    return f"{proxy.rstrip('/')}/rpc?upstream={quote(upstream, safe='')}"
+
+class Cassette:
+    """
+    Recorded responses, stored as JSON lines.
+
+    Identical requests recorded several times (eth_blockNumber, balances before
+    and after a transaction) are replayed in recording order, and the last
+    recorded response is repeated once they run out.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[Tuple, List[Any]] = defaultdict(list)
+        self._by_method: Dict[Tuple, List[Any]] = defaultdict(list)
+        self._cursor: Dict[Tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if path:
+            try:
+                with open(path) as f:
+                    for line in f:
+                        if line.strip():
+                            self._index(json.loads(line))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def rpc_key(upstream: str, method: str, params: Any) -> Tuple:
+        return ("rpc", upstream, method, json.dumps(params, sort_keys=True))
+
+    @staticmethod
+    def http_key(path: str) -> Tuple:
+        return ("http", path)
+
+    def _index(self, record: Dict[str, Any]) -> None:
+        if record["kind"] == "rpc":
+            key = self.rpc_key(record["upstream"], record["method"], record["params"])
+            self._by_method[("rpc", record["upstream"], record["method"])].append(record)
+        else:
+            key = self.http_key(record["path"])
+        self._entries[key].append(record)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._index(record)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def lookup(self, key: Tuple, fallback: Optional[Tuple] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key not in self._entries and fallback is not None and fallback in self._by_method:
+                key, entries = fallback, self._by_method[fallback]
+            else:
+                entries = self._entries.get(key)
+            if not entries:
+                return None
+            position = self._cursor[key]
+            self._cursor[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+class ReplayServer:
+    """
+    Local HTTP server that records or replays JSON-RPC and Dune API traffic.
+
+    RPC requests arrive at /rpc?upstream=<url> (see proxied_url); Dune requests
+    arrive at their usual /api/v1/... paths, so DuneClient only needs its
+    base_url pointed here. In "record" mode requests are forwarded upstream and
+    the responses appended to the cassette; in "replay" mode they are answered
+    from the cassette, and unrecorded requests get a JSON-RPC error (or 404).
+
+    Every response is delayed by `latency` seconds plus up to `jitter` seconds,
+    to approximate a remote node. With `rate_limit` (requests/second, bursts of
+    `burst`), requests beyond it get HTTP 429 with a Retry-After header, like a
+    public RPC provider; a JSON-RPC batch costs one token per request.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str = "replay", host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, dune_upstream: str = DUNE_UPSTREAM,
+                 rate_limit: float = 0.0, burst: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'")
+        self.cassette = cassette
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.dune_upstream = dune_upstream
+        self.requests = 0
+        self.misses = 0
+        self.rate_limited = 0
+        self.bucket = TokenBucket(rate_limit, burst or None) if rate_limit else None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="rpc-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def _throttle(self, cost: int = 1) -> Optional[int]:
+        """Retry-After seconds if this request is over the rate limit, else None."""
+        if self.bucket is None:
+            return None
+        wait = self.bucket.take(cost)
+        if not wait:
+            return None
+        self.rate_limited += 1
+        return max(1, math.ceil(wait))
+
+    def _delay(self) -> None:
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    # ----- JSON-RPC -----
+
+    def _rpc_call(self, upstream: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        method, params = request.get("method"), request.get("params", [])
+        key = Cassette.rpc_key(upstream, method, params)
+        if self.mode == "record":
+            import requests
+            response = requests.post(upstream, json=dict(request, id=1), timeout=30).json()
+            record = {"kind": "rpc", "upstream": upstream, "method": method, "params": params}
+            record.update({k: response[k] for k in ("result", "error") if k in response})
+            self.cassette.add(record)
+        else:
+            fallback = ("rpc", upstream, method) if method in _MATCH_BY_METHOD else None
+            record = self.cassette.lookup(key, fallback)
+            if record is None:
+                self.misses += 1
+                logger.warning(f"Replay miss: {method} {json.dumps(params)[:200]} ({upstream})")
+                record = {"error": {"code": -32000, "message": f"not recorded: {method}"}}
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        response.update({k: record[k] for k in ("result", "error") if k in record})
+        return response
+
+    # ----- Dune API -----
+
+    def _http_get(self, path: str, headers: Dict[str, str]) -> Tuple[int, bytes]:
+        key = Cassette.http_key(path)
+        if self.mode == "record":
+            import requests
+            forwarded = {k: v for k, v in headers.items() if k.lower() in ("x-dune-api-key", "accept")}
+            upstream = requests.get(self.dune_upstream + path, headers=forwarded, timeout=60)
+            self.cassette.add({"kind": "http", "path": path, "status": upstream.status_code, "body": upstream.text})
+            return upstream.status_code, upstream.content
+        record = self.cassette.lookup(key)
+        if record is None:
+            self.misses += 1
+            logger.warning(f"Replay miss: GET {path}")
+            return 404, json.dumps({"error": f"not recorded: {path}"}).encode()
+        return record["status"], record["body"].encode()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                server.requests += 1
+                url = urlsplit(self.path)
+                upstream = parse_qs(url.query).get("upstream", [""])[0]
+                if url.path != "/rpc" or not upstream:
+                    self._reply(404, b'{"error": "expected /rpc?upstream=<url>"}')
+                    return
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    retry_after = server._throttle(len(payload) if isinstance(payload, list) else 1)
+                    if retry_after is not None:
+                        self._reply(429, b'{"error": "rate limited"}', {"Retry-After": str(retry_after)})
+                        return
+                    if isinstance(payload, list):
+                        result: Any = [server._rpc_call(upstream, request) for request in payload]
+                    else:
+                        result = server._rpc_call(upstream, payload)
+                except Exception as e:
+                    self._reply(502, json.dumps({"error": str(e)}).encode())
+                    return
+                server._delay()
+                self._reply(200, json.dumps(result).encode())
+
+            def do_GET(self):
+                server.requests += 1
+                retry_after = server._throttle()
+                if retry_after is not None:
+                    self._reply(429, b'{"error": "rate limited"}', {"Retry-After": str(retry_after)})
+                    return
+                try:
+                    status, body = server._http_get(self.path, dict(self.headers))
+                except Exception as e:
+                    status, body = 502, json.dumps({"error": str(e)}).encode()
+                server._delay()
+                self._reply(status, body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay Celo JSON-RPC and Dune API traffic")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", required=True, help="JSON lines file to record to / replay from")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per response")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/second before answering 429 (0: off)")
+    parser.add_argument("--burst", type=float, default=0.0, help="Requests allowed in a burst (default: one second's worth)")
+    args = parser.parse_args()
+
+    server = ReplayServer(Cassette(args.cassette), args.mode, args.host, args.port, args.latency, args.jitter,
+                          rate_limit=args.rate_limit, burst=args.burst)
+    print(f"{args.mode} server on {server.url} ({len(server.cassette)} recorded responses)")
+    print(f"  export {PROXY_ENV}={server.url}")
+    print(f"  export DUNE_BASE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# utils/scan_state.py - Continuation cursors for paginated block scans, with short-lived server-side scan state
+import base64
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# How long the state behind a cursor is kept; an expired cursor still works, it just refetches more
+SCAN_STATE_TTL = float(os.environ.get("CELO_MCP_SCAN_STATE_TTL", "600"))
+MAX_SCAN_STATES = 256
+
+_CURSOR_VERSION = 1
+
+def encode_cursor(fields: Dict[str, Any]) -> str:
+    """An opaque, URL-safe cursor carrying `fields`."""
+    payload = json.dumps(dict(fields, v=_CURSOR_VERSION), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """The fields of a cursor from encode_cursor; ValueError if it is malformed."""
+    try:
+        fields = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("not a cursor returned by this server")
+    if not isinstance(fields, dict) or fields.get("v") != _CURSOR_VERSION:
+        raise ValueError("not a cursor returned by this server")
+    return fields
+
+class ScanStateCache:
+    """
+    Work a scan has done that its next page can reuse (a part-returned block,
+    prefilter headers), keyed by an unguessable id carried in the cursor.
+
+    Entries are taken, not read: a page consumes its state, and the next page
+    gets a fresh one. Cursors carry enough to resume without their state, so an
+    entry lost to expiry, eviction or a restart only costs refetching.
+    """
+
+    def __init__(self, ttl: float = SCAN_STATE_TTL, max_entries: int = MAX_SCAN_STATES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, state: Dict[str, Any]) -> str:
+        state_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._entries[state_id] = (time.monotonic() + self.ttl, state)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return state_id
+
+    def take(self, state_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.pop(state_id, None) if state_id else None
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+# Shared by every scan tool
+scan_states = ScanStateCache()
@@ -0,0 +1,155 @@
+# utils/simulation.py - Pre-flight transaction simulation for write tools
+from typing import Any, Dict, Optional
+
+from utils.helpers import format_json_response, logger
+
+# Standard Solidity revert payloads
+ERROR_STRING_SELECTOR = bytes.fromhex("08c379a0")  # Error(string)
+PANIC_SELECTOR = bytes.fromhex("4e487b71")         # Panic(uint256)
+
+# Aave v3 error codes (Errors.sol) relevant to supply/withdraw/borrow/repay
+AAVE_ERROR_CODES = {
+    "26": "Invalid amount (must be greater than 0)",
+    "27": "Reserve is not active",
+    "28": "Reserve is frozen",
+    "29": "Reserve is paused",
+    "30": "Borrowing is not enabled for this asset",
+    "32": "Not enough available balance to withdraw",
+    "33": "Invalid interest rate mode",
+    "34": "Collateral balance is zero",
+    "35": "Health factor would fall below the liquidation threshold",
+    "36": "Not enough collateral to cover the new borrow",
+    "39": "No debt of the selected type to repay",
+    "40": "An explicit amount is required to repay on behalf of another address",
+    "42": "No outstanding variable debt",
+    "43": "Underlying balance is zero",
+    "50": "Borrow cap exceeded",
+    "51": "Supply cap exceeded",
+    "57": "LTV validation failed",
+}
+
+# Aave v3.4+ replaced the string codes with custom errors
+AAVE_CUSTOM_ERRORS = {
+    "InvalidAmount()": AAVE_ERROR_CODES["26"],
+    "ReserveInactive()": AAVE_ERROR_CODES["27"],
+    "ReserveFrozen()": AAVE_ERROR_CODES["28"],
+    "ReservePaused()": AAVE_ERROR_CODES["29"],
+    "BorrowingNotEnabled()": AAVE_ERROR_CODES["30"],
+    "NotEnoughAvailableUserBalance()": AAVE_ERROR_CODES["32"],
+    "InvalidInterestRateModeSelected()": AAVE_ERROR_CODES["33"],
+    "CollateralBalanceIsZero()": AAVE_ERROR_CODES["34"],
+    "HealthFactorLowerThanLiquidationThreshold()": AAVE_ERROR_CODES["35"],
+    "CollateralCannotCoverNewBorrow()": AAVE_ERROR_CODES["36"],
+    "NoDebtOfSelectedType()": AAVE_ERROR_CODES["39"],
+    "NoExplicitAmountToRepayOnBehalf()": AAVE_ERROR_CODES["40"],
+    "UnderlyingBalanceZero()": AAVE_ERROR_CODES["43"],
+    "BorrowCapExceeded()": AAVE_ERROR_CODES["50"],
+    "SupplyCapExceeded()": AAVE_ERROR_CODES["51"],
+    "LtvValidationFailed()": AAVE_ERROR_CODES["57"],
+}
+
+PANIC_CODES = {
+    0x01: "assertion failed",
+    0x11: "arithmetic overflow or underflow",
+    0x12: "division by zero",
+    0x32: "array index out of bounds",
+}
+
+# Transaction fields eth_call understands; nonce and chainId are dropped
+CALL_FIELDS = ("from", "to", "value", "data", "gas", "gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+_custom_error_selectors: Dict[bytes, str] = {}
+
+def _custom_errors() -> Dict[bytes, str]:
+    """Map Aave custom error selectors to messages (computed once)."""
+    if not _custom_error_selectors:
+        from eth_utils import keccak
+        for signature, message in AAVE_CUSTOM_ERRORS.items():
+            _custom_error_selectors[keccak(text=signature)[:4]] = message
+    return _custom_error_selectors
+
+def decode_revert_reason(data: Any) -> Optional[str]:
+    """Decode revert data (bytes or hex string) into a readable reason."""
+    from eth_abi import decode
+
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data[2:] if data.startswith("0x") else data
+        try:
+            data = bytes.fromhex(data)
+        except ValueError:
+            return None
+    data = bytes(data)
+    if len(data) < 4:
+        return None
+
+    selector, payload = data[:4], data[4:]
+    try:
+        if selector == ERROR_STRING_SELECTOR:
+            reason = decode(["string"], payload)[0]
+            if reason in AAVE_ERROR_CODES:
+                return f"{AAVE_ERROR_CODES[reason]} (Aave error {reason})"
+            return reason
+        if selector == PANIC_SELECTOR:
+            code = decode(["uint256"], payload)[0]
+            return f"Panic: {PANIC_CODES.get(code, hex(code))}"
+    except Exception:
+        return None
+
+    return _custom_errors().get(selector, f"Custom error 0x{selector.hex()}")
+
+def simulate_transaction(w3, tx: Dict[str, Any], block_identifier: Any = "pending") -> Optional[str]:
+    """
+    Run a built transaction through eth_call before it is signed.
+
+    Returns None if the call succeeds, or a human-readable revert reason if it
+    would revert. Errors that are not reverts (e.g. RPC failures) are logged and
+    treated as a pass, so simulation never blocks a transaction on its own.
+    """
+    from web3.exceptions import ContractLogicError
+
+    call = {k: tx[k] for k in CALL_FIELDS if k in tx}
+    try:
+        w3.eth.call(call, block_identifier=block_identifier)
+        return None
+    except ContractLogicError as e:
+        return decode_revert_reason(getattr(e, "data", None)) or _clean_message(getattr(e, "message", None) or str(e))
+    except ValueError as e:
+        # Some nodes report reverts as plain JSON-RPC errors
+        error = e.args[0] if e.args else None
+        if isinstance(error, dict) and "revert" in str(error.get("message", "")).lower():
+            return decode_revert_reason(error.get("data")) or _clean_message(error.get("message"))
+        logger.warning(f"Transaction simulation skipped: {e}")
+        return None
+    except Exception as e:
+        # Providers that bypass web3's error formatting (e.g. eth-tester) raise their own types
+        if "revert" in str(e).lower():
+            return decode_revert_reason(getattr(e, "data", None)) or _clean_message(str(e))
+        logger.warning(f"Transaction simulation skipped: {e}")
+        return None
+
+def simulation_failure(w3, tx: Dict[str, Any], label: str) -> Optional[str]:
+    """
+    Simulate a write tool's transaction before it is signed, so a reverting
+    transaction fails without spending gas. Returns the tool's response for a
+    transaction that would revert (e.g. "Borrow transaction would fail: ..."),
+    or None if it can be signed and sent.
+    """
+    revert_reason = simulate_transaction(w3, tx)
+    if not revert_reason:
+        return None
+    return format_json_response({
+        "success": False,
+        "error": f"{label} would fail: {revert_reason}",
+        "simulated": True
+    })
+
+def _clean_message(message: Optional[str]) -> str:
+    if not message:
+        return "execution reverted"
+    prefix = "execution reverted: "
+    reason = message[len(prefix):] if message.startswith(prefix) else message
+    if reason in AAVE_ERROR_CODES:
+        return f"{AAVE_ERROR_CODES[reason]} (Aave error {reason})"
+    return reason
@@ -0,0 +1,432 @@
+# utils/subscriptions.py - eth_subscribe (newHeads/logs) service with per-address activity buffers
+import asyncio
+import itertools
+import json
+import random
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from utils.helpers import logger
+from utils.logs import TRANSFER_TOPIC, address_topic, get_logs, is_erc20_transfer
+
+def _hex(value: Any) -> str:
+    """0x-prefixed hex for HexBytes/bytes values; strings pass through."""
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return value
+
+def _hex_to_int(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    return int(value, 16) if value else 0
+
+class SubscriptionService:
+    """
+    Keeps a persistent WebSocket to a Celo node and records activity for watched addresses.
+
+    - newHeads: each new block is fetched once (over HTTP) and its transactions are
+      matched against the watched addresses
+    - logs: ERC-20 Transfer events with a watched address as sender or recipient
+    - newPendingTransactions (optional): pending txs from/to watched addresses
+
+    On reconnect, blocks and logs missed while disconnected are backfilled from the
+    last processed block, so the buffers have no gaps. Entries for blocks a reorg
+    removes (a `removed` log, or a head at or below the last one) are dropped and
+    those blocks are processed again.
+
+    The read loop only dispatches: responses resolve their requests at once,
+    and notifications are queued for a separate task, in arrival order, so a
+    slow block fetch or backfill never holds up a request such as watch()'s
+    eth_subscribe.
+    """
+
+    def __init__(self, ws_url: str, w3_factory: Callable[[], Any], buffer_size: int = 200,
+                 max_backfill_blocks: int = 500, track_pending: bool = False):
+        self.ws_url = ws_url
+        self._w3_factory = w3_factory
+        self.buffer_size = buffer_size
+        self.max_backfill_blocks = max_backfill_blocks
+        self.track_pending = track_pending
+
+        self.activity: Dict[str, Deque[Dict]] = {}
+        self.pending: Dict[str, Deque[Dict]] = {}
+        self.watch_started: Dict[str, int] = {}
+        # Highest block with an entry evicted from a full buffer; blocks up to it are incomplete
+        self.evicted_through: Dict[str, int] = {}
+        self.last_block: Optional[int] = None
+        self.connected = False
+        self.reconnects = 0
+        self.head_listeners: List[Callable[[int], None]] = []
+
+        self._seen: Dict[str, Dict[str, None]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._responses: Dict[int, asyncio.Future] = {}
+        self._subscriptions: Dict[str, str] = {}
+        self._log_subscription_ids: List[str] = []
+
+    # ----- public API -----
+
+    def start(self) -> None:
+        """Start the background connection task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self.connected = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def watch(self, address: str) -> None:
+        """Start recording activity for an address."""
+        key = address.lower()
+        if key in self.activity:
+            return
+        self.activity[key] = deque(maxlen=self.buffer_size)
+        self.pending[key] = deque(maxlen=self.buffer_size)
+        self._seen[key] = {}
+        self.watch_started[key] = self.last_block + 1 if self.last_block is not None else None
+        if self.connected:
+            await self._resubscribe_logs()
+
+    async def unwatch(self, address: str) -> bool:
+        key = address.lower()
+        if key not in self.activity:
+            return False
+        for store in (self.activity, self.pending, self._seen, self.watch_started, self.evicted_through):
+            store.pop(key, None)
+        if self.connected:
+            await self._resubscribe_logs()
+        return True
+
+    def is_watched(self, address: str) -> bool:
+        return address.lower() in self.activity
+
+    def covers(self, address: str, from_block: int, to_block: int) -> bool:
+        """True if activity for `address` has been recorded for every block from `from_block` to `to_block`."""
+        key = address.lower()
+        started = self.watch_started.get(key)
+        if not self.connected or started is None:
+            return False
+        if self.last_block is None or self.last_block < to_block:
+            # The caller's head is ahead of the last block processed here
+            return False
+        if key in self.evicted_through:
+            # Entries are appended in arrival order, not block order (a backfill adds
+            # logs before blocks), so the evicted block numbers bound what is complete
+            started = max(started, self.evicted_through[key] + 1)
+        return started <= from_block
+
+    def recent_activity(self, address: str, limit: int = 50) -> List[Dict]:
+        """Most recent first; an in-memory lookup with no RPC."""
+        buffer = self.activity.get(address.lower())
+        if not buffer:
+            return []
+        return list(itertools.islice(reversed(buffer), limit))
+
+    def pending_activity(self, address: str) -> List[Dict]:
+        return list(reversed(self.pending.get(address.lower(), ())))
+
+    # ----- connection handling -----
+
+    async def _run(self) -> None:
+        import websockets
+
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, max_size=None, ping_interval=20) as ws:
+                    self._ws = ws
+                    events: asyncio.Queue = asyncio.Queue()
+                    loop = asyncio.get_running_loop()
+                    reader = loop.create_task(self._read_loop(ws, events))
+                    handler = None
+                    try:
+                        await self._on_connected()
+                        backoff = 1.0
+                        # Notifications that arrived during the reconnect backfill wait in the queue until now
+                        handler = loop.create_task(self._handle_events(events))
+                        await reader
+                    finally:
+                        reader.cancel()
+                        if handler is not None:
+                            handler.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Subscription connection to {self.ws_url} lost: {e}")
+            finally:
+                self.connected = False
+                self._ws = None
+                self._subscriptions.clear()
+                self._log_subscription_ids = []
+                for future in self._responses.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("WebSocket closed"))
+                self._responses.clear()
+
+            self.reconnects += 1
+            await asyncio.sleep(backoff + random.uniform(0, backoff / 2))
+            backoff = min(backoff * 2, 30.0)
+
+    async def _on_connected(self) -> None:
+        head_id = await self._request("eth_subscribe", ["newHeads"])
+        self._subscriptions[head_id] = "newHeads"
+        if self.track_pending:
+            try:
+                pending_id = await self._request("eth_subscribe", ["newPendingTransactions"])
+                self._subscriptions[pending_id] = "pending"
+            except Exception as e:
+                logger.info(f"Pending transaction subscription unavailable: {e}")
+        await self._resubscribe_logs()
+        self.connected = True
+
+        # Backfill anything missed while disconnected (or since the first watch)
+        head = _hex_to_int(await self._request("eth_blockNumber", []))
+        if self.last_block is not None and head > self.last_block:
+            await self._backfill(self.last_block + 1, head)
+        elif self.last_block is None:
+            self.last_block = head
+            for key, started in self.watch_started.items():
+                if started is None:
+                    self.watch_started[key] = head + 1
+
+    async def _resubscribe_logs(self) -> None:
+        for sub_id in self._log_subscription_ids:
+            self._subscriptions.pop(sub_id, None)
+            try:
+                await self._request("eth_unsubscribe", [sub_id])
+            except Exception:
+                pass
+        self._log_subscription_ids = []
+
+        if not self.activity:
+            return
+        topics = [address_topic(a) for a in self.activity]
+        # One subscription for watched senders, one for watched recipients
+        for filter_topics in ([TRANSFER_TOPIC, topics], [TRANSFER_TOPIC, None, topics]):
+            sub_id = await self._request("eth_subscribe", ["logs", {"topics": filter_topics}])
+            self._subscriptions[sub_id] = "logs"
+            self._log_subscription_ids.append(sub_id)
+
+    async def _request(self, method: str, params: list, timeout: float = 15.0) -> Any:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._responses[request_id] = future
+        await self._ws.send(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._responses.pop(request_id, None)
+
+    async def _read_loop(self, ws, events: asyncio.Queue) -> None:
+        async for raw in ws:
+            message = json.loads(raw)
+            if "id" in message and message["id"] in self._responses:
+                future = self._responses[message["id"]]
+                if not future.done():
+                    if "error" in message:
+                        future.set_exception(ValueError(message["error"]))
+                    else:
+                        future.set_result(message.get("result"))
+                continue
+
+            if message.get("method") != "eth_subscription":
+                continue
+            params = message.get("params", {})
+            kind = self._subscriptions.get(params.get("subscription"))
+            if kind is not None:
+                events.put_nowait((kind, params.get("result")))
+
+    async def _handle_events(self, events: asyncio.Queue) -> None:
+        # Events lost when the connection drops are covered by the reconnect backfill from last_block
+        while True:
+            kind, result = await events.get()
+            try:
+                if kind == "newHeads":
+                    await self._on_head(result)
+                elif kind == "logs":
+                    self._on_log(result)
+                elif kind == "pending":
+                    await self._on_pending(result)
+            except Exception as e:
+                logger.warning(f"Error handling {kind} notification: {e}")
+
+    # ----- event handling -----
+
+    async def _on_head(self, head: Dict) -> None:
+        number = _hex_to_int(head.get("number"))
+        if self.last_block is not None and number <= self.last_block:
+            # A reorg replaced this block (and any after it)
+            self._drop_blocks(number)
+        if self.last_block is not None and number > self.last_block + 1:
+            # Heads can be skipped under load; fill the hole from HTTP
+            await self._backfill(self.last_block + 1, number - 1)
+        if self.activity:
+            await self._process_block(number)
+        self.last_block = number
+        for listener in self.head_listeners:
+            try:
+                listener(number)
+            except Exception as e:
+                logger.warning(f"Head listener failed: {e}")
+
+    async def _backfill(self, from_block: int, to_block: int) -> None:
+        if to_block < from_block:
+            return
+        from_block = max(from_block, to_block - self.max_backfill_blocks + 1)
+        logger.info(f"Backfilling blocks {from_block}-{to_block} for watched addresses")
+
+        if self.activity:
+            w3 = self._w3_factory()
+            topics = [address_topic(a) for a in self.activity]
+            for filter_topics in ([TRANSFER_TOPIC, topics], [TRANSFER_TOPIC, None, topics]):
+                logs = await asyncio.to_thread(get_logs, w3, from_block, to_block, filter_topics)
+                for log in logs:
+                    self._on_log(log)
+            for number in range(from_block, to_block + 1):
+                await self._process_block(number)
+
+        self.last_block = max(self.last_block or 0, to_block)
+
+    async def _process_block(self, number: int) -> None:
+        w3 = self._w3_factory()
+        block = await asyncio.to_thread(w3.eth.get_block, number, True)
+        timestamp = block.get("timestamp")
+        for tx in block["transactions"]:
+            sender = (tx.get("from") or "").lower()
+            recipient = (tx.get("to") or "").lower()
+            for key in {sender, recipient} & self.activity.keys():
+                tx_hash = _hex(tx["hash"])
+                self._record(key, f"tx:{tx_hash}", {
+                    "type": "transaction",
+                    "hash": tx_hash,
+                    "block_number": number,
+                    "timestamp": timestamp,
+                    "from": tx.get("from"),
+                    "to": tx.get("to") or "Contract Creation",
+                    "value_wei": str(tx.get("value", 0)),
+                })
+                self._drop_pending(key, tx_hash)
+
+    def _on_log(self, log: Dict) -> None:
+        block_number = _hex_to_int(log.get("blockNumber"))
+        if log.get("removed"):
+            # Its block was reorged out; the replacement arrives as a new head
+            self._drop_blocks(block_number)
+            return
+        topics = [_hex(t) for t in log.get("topics", [])]
+        if not topics or not topics[0].lower().endswith(TRANSFER_TOPIC[2:]) or not is_erc20_transfer(log):
+            return
+        sender = "0x" + topics[1][-40:].lower()
+        recipient = "0x" + topics[2][-40:].lower()
+        tx_hash = _hex(log["transactionHash"])
+        log_index = _hex_to_int(log.get("logIndex"))
+        data = _hex(log.get("data")) or "0x"
+        for key in {sender, recipient} & self.activity.keys():
+            self._record(key, f"log:{tx_hash}:{log_index}", {
+                "type": "token_transfer",
+                "hash": tx_hash,
+                "log_index": log_index,
+                "block_number": block_number,
+                "token": log.get("address"),
+                "from": sender,
+                "to": recipient,
+                "value_raw": str(_hex_to_int(data) if data != "0x" else 0),
+            })
+
+    async def _on_pending(self, tx_hash: str) -> None:
+        if not self.activity:
+            return
+        w3 = self._w3_factory()
+        tx = await asyncio.to_thread(w3.eth.get_transaction, tx_hash)
+        for key in {(tx.get("from") or "").lower(), (tx.get("to") or "").lower()} & self.activity.keys():
+            self.pending[key].append({
+                "type": "pending_transaction",
+                "hash": tx_hash,
+                "from": tx.get("from"),
+                "to": tx.get("to"),
+                "value_wei": str(tx.get("value", 0)),
+            })
+
+    def _drop_pending(self, key: str, tx_hash: str) -> None:
+        buffer = self.pending.get(key)
+        if buffer:
+            kept = [p for p in buffer if p["hash"] != tx_hash]
+            if len(kept) != len(buffer):
+                buffer.clear()
+                buffer.extend(kept)
+
+    def _record(self, key: str, dedupe_key: str, entry: Dict) -> None:
+        seen = self._seen[key]
+        if dedupe_key in seen:
+            return
+        seen[dedupe_key] = None
+        # Insertion-ordered, so the oldest keys go first once the set outgrows the buffer
+        while len(seen) > self.buffer_size * 2:
+            del seen[next(iter(seen))]
+        buffer = self.activity[key]
+        if len(buffer) == buffer.maxlen:
+            evicted = buffer[0]["block_number"]
+            self.evicted_through[key] = max(self.evicted_through.get(key, evicted), evicted)
+        buffer.append(entry)
+
+    @staticmethod
+    def _dedupe_key(entry: Dict) -> str:
+        if entry["type"] == "token_transfer":
+            return f"log:{entry['hash']}:{entry['log_index']}"
+        return f"tx:{entry['hash']}"
+
+    def _drop_blocks(self, from_block: int) -> None:
+        """Forget entries from `from_block` on, so those blocks are recorded again when reprocessed."""
+        for key, buffer in self.activity.items():
+            dropped = [entry for entry in buffer if entry["block_number"] >= from_block]
+            if not dropped:
+                continue
+            kept = [entry for entry in buffer if entry["block_number"] < from_block]
+            buffer.clear()
+            buffer.extend(kept)
+            for entry in dropped:
+                self._seen[key].pop(self._dedupe_key(entry), None)
+        if self.last_block is not None and self.last_block >= from_block:
+            self.last_block = from_block - 1
+
+    def stats(self) -> Dict:
+        return {
+            "ws_url": self.ws_url,
+            "connected": self.connected,
+            "last_block": self.last_block,
+            "reconnects": self.reconnects,
+            "watched_addresses": len(self.activity),
+        }
+
+# One service per network, created on first use
+_services: Dict[str, SubscriptionService] = {}
+
+def get_subscription_service(network: str, ws_url: str, rpc_url: str) -> SubscriptionService:
+    """Get (and start) the shared subscription service for a network."""
+    service = _services.get(network)
+    if service is None:
+        from utils.contracts import contracts
+        service = SubscriptionService(ws_url, lambda: contracts.get_web3(rpc_url))
+        # New heads invalidate cached "latest" reads for this chain
+        cache = getattr(contracts.get_web3(rpc_url).provider, "cache", None)
+        if cache is not None:
+            service.head_listeners.append(cache.set_head)
+        _services[network] = service
+    service.start()
+    return service
+
+def find_subscription_service(network: str) -> Optional[SubscriptionService]:
+    """Return the service for a network if one has been started, without creating it."""
+    return _services.get(network)
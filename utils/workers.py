@@ -0,0 +1,157 @@
+# utils/workers.py - Run tool handlers on a bounded worker pool so blocking RPC calls don't stall the event loop
+import asyncio
+import atexit
+import contextvars
+import functools
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from utils.deadline import DEFAULT_TOOL_TIMEOUT, CallBudget, set_budget
+from utils.helpers import logger
+
+# Worker threads for tool calls (CELO_MCP_MAX_WORKERS, or --max-concurrency in server.py)
+DEFAULT_MAX_WORKERS = int(os.environ.get("CELO_MCP_MAX_WORKERS", "8"))
+
+_max_workers = DEFAULT_MAX_WORKERS
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_thread_state = threading.local()
+_thread_loops: list = []
+
+def set_max_workers(count: int) -> None:
+    """Set how many tool calls may run at once; takes effect before the first call."""
+    global _max_workers
+    if _pool is not None:
+        logger.warning("Worker pool already started; max workers unchanged")
+        return
+    _max_workers = max(1, count)
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix="tool")
+    return _pool
+
+def on_main_loop(fn: Callable) -> Callable:
+    """Mark a tool that must run on the server's event loop (e.g. it starts long-lived tasks there)."""
+    fn._celo_main_loop = True
+    return fn
+
+class _LoopBoundContext:
+    """
+    Proxy for an MCP Context used from a worker thread.
+
+    Coroutine methods (report_progress, info, ...) are scheduled on the server
+    loop that owns the session's streams; everything else passes through.
+    """
+
+    def __init__(self, ctx: Any, loop: asyncio.AbstractEventLoop):
+        self._ctx = ctx
+        self._loop = loop
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._ctx, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            future = asyncio.run_coroutine_threadsafe(attr(*args, **kwargs), self._loop)
+            return await asyncio.wrap_future(future)
+        return call
+
+def _run_in_thread_loop(fn: Callable, args: tuple, kwargs: dict, handle: dict) -> Any:
+    """
+    Run a tool coroutine to completion on this worker thread's own event loop.
+
+    handle["cancel"] is set to a thread-safe canceller for the task, so a call
+    cancelled on the server loop (client went away) is cancelled here too.
+    """
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        _thread_state.loop = loop
+        _thread_loops.append(loop)
+    task = loop.create_task(fn(*args, **kwargs))
+    handle["cancel"] = lambda: loop.call_soon_threadsafe(task.cancel)
+    if handle.get("cancelled"):
+        task.cancel()
+    return loop.run_until_complete(task)
+
+@atexit.register
+def _close_thread_loops() -> None:
+    # Worker threads have been joined by now (the pool's own exit hook runs first)
+    for loop in _thread_loops:
+        if not loop.is_running():
+            loop.close()
+
+def run_tools_in_workers(mcp) -> None:
+    """
+    Wrap mcp.tool so every tool registered afterwards runs on a worker thread.
+
+    The tools call web3 synchronously; on the event loop one slow RPC would
+    stall every other client's requests. Each call runs on one of at most
+    `max workers` threads (excess calls queue), with the caller's contextvars,
+    so metrics and log correlation still work. Each call gets a CallBudget
+    (CELO_MCP_TOOL_TIMEOUT) that is cancelled with it, so the RPC layer stops
+    and the thread is freed as soon as the client goes away. Tools marked with
+    on_main_loop stay on the server loop.
+    """
+    original_tool = mcp.tool
+
+    def tool(*args, **kwargs):
+        register = original_tool(*args, **kwargs)
+
+        def decorator(fn: Callable):
+            if getattr(fn, "_celo_main_loop", False):
+                return register(fn)
+
+            @functools.wraps(fn)
+            async def wrapper(*call_args, **call_kwargs):
+                loop = asyncio.get_running_loop()
+                ctx = call_kwargs.get("ctx")
+                if ctx is not None:
+                    call_kwargs["ctx"] = _LoopBoundContext(ctx, loop)
+                budget = CallBudget(DEFAULT_TOOL_TIMEOUT)
+                context = contextvars.copy_context()
+                context.run(set_budget, budget)
+                handle: dict = {}
+                try:
+                    return await loop.run_in_executor(
+                        _get_pool(), functools.partial(context.run, _run_in_thread_loop, fn, call_args, call_kwargs, handle))
+                except asyncio.CancelledError:
+                    budget.cancel()
+                    handle["cancelled"] = True
+                    if "cancel" in handle:
+                        handle["cancel"]()
+                    raise
+
+            return register(wrapper)
+        return decorator
+
+    mcp.tool = tool
+
+def client_key(ctx: Any) -> str:
+    """
+    Stable identifier for the MCP client session behind a tool call.
+
+    Signing sessions are bound to it so one client of a shared (HTTP) server
+    cannot use another client's session IDs. Calls without a context (stdio
+    scripts, tests) share the "local" key.
+    """
+    try:
+        session = ctx.session if ctx is not None else None
+    except ValueError:
+        # Context created outside a request
+        session = None
+    if session is None:
+        return "local"
+    key = getattr(session, "_celo_client_key", None)
+    if key is None:
+        key = uuid.uuid4().hex
+        session._celo_client_key = key
+    return key